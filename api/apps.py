@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class ApiConfig(AppConfig):
     name = 'api'
+
+    def ready(self):
+        from . import signals  # noqa: F401  (registers Order rollup receivers)
+        from . import instrumentation  # noqa: F401  (hooks DB connections before any is opened)
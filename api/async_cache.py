@@ -0,0 +1,100 @@
+"""
+Async access to the default cache and Redis for the async views
+(api/async_views.py).
+
+Django's async cache methods only wrap django-redis in sync_to_async, so
+this talks to the same Redis through redis.asyncio and reuses the
+django-redis client for key names and value encoding: entries written here
+and through django.core.cache are interchangeable.
+"""
+import asyncio
+import weakref
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+
+from . import instrumentation
+
+_clients = weakref.WeakKeyDictionary()
+
+
+def client():
+    # redis.asyncio connections belong to the event loop that opened them
+    loop = asyncio.get_running_loop()
+    conn = _clients.get(loop)
+    if conn is None:
+        location = settings.CACHES["default"]["LOCATION"]
+        if isinstance(location, (list, tuple)):
+            location = location[0]  # primary, as django-redis writes to the first server
+        conn = _clients[loop] = instrumentation.InstrumentedAsyncRedis.from_url(location)
+    return conn
+
+
+async def close():
+    """Close this event loop's client (tests and one-off loops)."""
+    conn = _clients.pop(asyncio.get_running_loop(), None)
+    if conn is not None:
+        await conn.aclose()
+
+
+def closes_client(view):
+    """
+    For async views that use client(). Under WSGI (runserver, the test
+    client) Django runs every async view in an event loop of its own, closed
+    with the request, so that loop's client is closed before it goes instead
+    of leaking its connections. Under ASGI the loop, and its client, stay.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        try:
+            return await view(request, *args, **kwargs)
+        finally:
+            if not isinstance(request, ASGIRequest):
+                await close()
+    return wrapper
+
+
+def _key(key):
+    return cache.client.make_key(key)
+
+
+async def get(key, default=None):
+    value = await client().get(_key(key))
+    if value is None:
+        instrumentation.record_cache(misses=1)
+        return default
+    instrumentation.record_cache(hits=1)
+    return cache.client.decode(value)
+
+
+async def get_many(keys) -> dict:
+    keys = list(keys)
+    if not keys:
+        return {}
+    values = await client().mget([_key(key) for key in keys])
+    found = {key: cache.client.decode(value) for key, value in zip(keys, values) if value is not None}
+    instrumentation.record_cache(hits=len(found), misses=len(keys) - len(found))
+    return found
+
+
+async def set(key, value, timeout):
+    await client().set(_key(key), cache.client.encode(value), ex=timeout)
+
+
+async def set_many(data: dict, timeout):
+    if not data:
+        return
+    pipe = client().pipeline(transaction=False)
+    for key, value in data.items():
+        pipe.set(_key(key), cache.client.encode(value), ex=timeout)
+    await pipe.execute()
+
+
+async def add(key, value, timeout) -> bool:
+    return bool(await client().set(_key(key), cache.client.encode(value), ex=timeout, nx=True))
+
+
+async def delete(key):
+    await client().delete(_key(key))
@@ -0,0 +1,121 @@
+"""
+Async views for the read-heavy endpoints, for running under ASGI (uvicorn).
+
+A GET here never holds a worker thread while it waits on Redis: cache
+reads and live dashboard counters go through redis.asyncio, and row
+lookups use the async ORM. Responses are rendered with DRF's JSONRenderer
+(dashboards are sent as the cached JSON, as in the sync views), so bodies
+are byte-for-byte what the sync views return.
+
+Anything that is not a plain GET (writes, OPTIONS, dashboard series) is
+handed to the sync DRF view in api/views.py.
+"""
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+
+from . import hot_dashboards, views
+from .async_cache import closes_client
+from .dashboard_cache import aget_dashboard, aget_dashboards
+from .db_routing import replica_reads
+from .models import Restaurant, Customer, Order
+from .serializers import RestaurantSerializer, CustomerSerializer, OrderSerializer
+
+_renderer = JSONRenderer()
+
+
+def _json(data, status=status.HTTP_200_OK):
+    return HttpResponse(_renderer.render(data), status=status, content_type=_renderer.media_type)
+
+
+def _days(params):
+    days = int(params.get("days", 7))
+    if days <= 0 or days > 365:
+        raise ValueError()
+    return days
+
+
+@csrf_exempt  # the sync DRF views it delegates to do their own CSRF checks
+@replica_reads
+@closes_client
+async def restaurant_dashboard(request, pk: int):
+    if request.method != "GET" or views.SERIES_PARAMS.intersection(request.GET):
+        return await sync_to_async(views.restaurant_dashboard)(request, pk=pk)
+
+    try:
+        restaurant = await Restaurant.objects.only("id", "name").aget(pk=pk)
+    except Restaurant.DoesNotExist:
+        return _json("NOT FOUND", status=status.HTTP_404_NOT_FOUND)
+
+    try:
+        days = _days(request.GET)
+    except ValueError:
+        return _json({"detail": "days must be an integer between 1 and 365."}, status=status.HTTP_400_BAD_REQUEST)
+
+    if hot_dashboards.record_access([restaurant.id], days):
+        await hot_dashboards.aflush()
+    return views.dashboard_response(request, await aget_dashboard(restaurant, days))
+
+
+@csrf_exempt
+@replica_reads
+@closes_client
+async def dashboard_batch(request):
+    if request.method != "GET":
+        return await sync_to_async(views.dashboard_batch)(request)
+
+    try:
+        ids = [int(pk) for pk in request.GET.get("ids", "").split(",") if pk.strip()]
+        if not ids or len(ids) > views.MAX_BATCH_DASHBOARDS:
+            raise ValueError()
+    except ValueError:
+        return _json(
+            {"detail": f"ids must be a comma-separated list of 1 to {views.MAX_BATCH_DASHBOARDS} integers."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    try:
+        days = _days(request.GET)
+    except ValueError:
+        return _json({"detail": "days must be an integer between 1 and 365."}, status=status.HTTP_400_BAD_REQUEST)
+
+    ids = list(dict.fromkeys(ids))
+    if hot_dashboards.record_access(ids, days):
+        await hot_dashboards.aflush()
+    payloads, missing = await aget_dashboards(ids, days)
+    return views.dashboard_batch_response(ids, payloads, missing)
+
+
+@csrf_exempt
+async def restaurant_detail(request, pk: int):
+    if request.method != "GET":
+        return await sync_to_async(views.restaurant_detail)(request, pk=pk)
+    try:
+        restaurant = await Restaurant.objects.aget(pk=pk)
+    except Restaurant.DoesNotExist:
+        return _json("Not found.", status=status.HTTP_404_NOT_FOUND)
+    return _json(RestaurantSerializer(restaurant).data)
+
+
+@csrf_exempt
+async def customer_detail(request, pk: int):
+    if request.method != "GET":
+        return await sync_to_async(views.customer_detail)(request, pk=pk)
+    try:
+        customer = await Customer.objects.aget(pk=pk)
+    except Customer.DoesNotExist:
+        return _json({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+    return _json(CustomerSerializer(customer).data)
+
+
+@csrf_exempt
+async def order_detail(request, pk: int):
+    if request.method != "GET":
+        return await sync_to_async(views.order_detail)(request, pk=pk)
+    try:
+        order = await Order.objects.aget(pk=pk)  # serializer only needs the FK ids
+    except Order.DoesNotExist:
+        return _json({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+    return _json(OrderSerializer(order).data)
@@ -0,0 +1,325 @@
+"""
+Benchmark scenarios for the `benchmark` management command.
+
+A scenario is a function (client, context) -> list of request callables;
+each callable issues one request through the Django test client and
+returns the response. The runner times every call and records query count,
+in "cold" mode (the keys the scenarios cache dropped before each call, see
+COLD_CACHE_PATTERNS) or "warm" mode (every distinct call made once,
+untimed, before timing). Peak Python memory comes from a second, untimed
+run of each call under tracemalloc, which would otherwise slow the timed one.
+
+run_concurrent() compares the sync and async versions of a view
+(api/views.py vs api/async_views.py) under N concurrent requests on one
+event loop, each in its own ThreadSensitiveContext as ASGIHandler runs
+them, and reports throughput alongside latency.
+"""
+import asyncio
+import statistics
+import time
+import tracemalloc
+
+from asgiref.sync import ThreadSensitiveContext, iscoroutinefunction, sync_to_async
+from django.core.cache import cache
+from django.db import close_old_connections, connection, reset_queries
+from django.db.models import Sum
+from django.test import AsyncRequestFactory
+from django.test.utils import CaptureQueriesContext
+from django_redis import get_redis_connection
+
+from . import async_cache, async_views, local_cache, views
+from .models import Restaurant, Customer, Order, RestaurantDailyStats
+
+SCENARIOS = {}
+
+# What the scenarios cache; cold mode drops only these, not the whole Redis DB
+COLD_CACHE_PATTERNS = ("dashboard:*", "idempotency:*")  # through django.core.cache
+COLD_REDIS_PATTERNS = ("dash:live:*",)  # raw keys (api/live_dashboard.py)
+
+
+def scenario(name):
+    def register(func):
+        SCENARIOS[name] = func
+        return func
+    return register
+
+
+def percentile(values, pct):
+    # nearest-rank percentile on a sorted copy
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    rank = max(1, int(round(pct / 100 * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def build_context(sample_size=20):
+    """Pick the restaurants/customers the scenarios hit, biggest first."""
+    restaurants = list(
+        RestaurantDailyStats.objects.values("restaurant_id")
+        .annotate(orders=Sum("orders_count"))
+        .order_by("-orders")
+        .values_list("restaurant_id", flat=True)[:sample_size]
+    ) or list(Restaurant.objects.order_by("-id").values_list("id", flat=True)[:sample_size])
+    customer = Customer.objects.filter(restaurant_id__in=restaurants).values("id", "restaurant_id").first()
+    return {"restaurant_ids": restaurants, "customer": customer}
+
+
+def _consume(response):
+    # streaming responses only do their work while being read
+    if getattr(response, "streaming", False):
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+def _drop_cached():
+    for pattern in COLD_CACHE_PATTERNS:
+        cache.delete_pattern(pattern)
+    conn = get_redis_connection("default")
+    for pattern in COLD_REDIS_PATTERNS:
+        keys = list(conn.scan_iter(match=pattern, count=1000))
+        if keys:
+            conn.delete(*keys)
+    if local_cache.enabled():
+        local_cache.clear()
+
+
+def _peak_memory(call, mode):
+    if mode == "cold":
+        _drop_cached()
+    tracemalloc.start()
+    try:
+        _consume(call())
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run_scenario(client, name, mode, iterations, context):
+    calls = SCENARIOS[name](client, context)
+    if not calls:
+        return None
+
+    if mode == "warm":
+        for call in calls[:iterations]:
+            _consume(call())  # prime the cache, untimed
+
+    latencies, queries, peaks, statuses = [], [], [], {}
+    for i in range(iterations):
+        call = calls[i % len(calls)]
+        if mode == "cold":
+            _drop_cached()
+
+        reset_queries()
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            response = _consume(call())
+            elapsed = time.perf_counter() - started
+
+        latencies.append(elapsed * 1000)
+        queries.append(len(ctx.captured_queries))
+        peaks.append(_peak_memory(call, mode))
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    return {
+        "scenario": name,
+        "mode": mode,
+        "iterations": iterations,
+        "latency_ms": _latency_summary(latencies),
+        "queries": {"mean": statistics.fmean(queries), "max": max(queries)},
+        "peak_memory_bytes": {"p50": percentile(peaks, 50), "max": max(peaks)},
+        "status_codes": statuses,
+    }
+
+
+def _latency_summary(latencies):
+    return {
+        "p50": percentile(latencies, 50),
+        "p95": percentile(latencies, 95),
+        "p99": percentile(latencies, 99),
+        "mean": statistics.fmean(latencies),
+        "max": max(latencies),
+    }
+
+
+# scenario -> (sync view, async view, context -> [(path, view kwargs)])
+CONCURRENT = {
+    "dashboard": (
+        views.restaurant_dashboard, async_views.restaurant_dashboard,
+        lambda context: [(f"/api/restaurants/{pk}/dashboard/?days=30", {"pk": pk}) for pk in context["restaurant_ids"]],
+    ),
+    "dashboard_batch": (
+        views.dashboard_batch, async_views.dashboard_batch,
+        lambda context: [(f"/api/dashboards/?ids={','.join(map(str, context['restaurant_ids']))}&days=30", {})]
+        if context["restaurant_ids"] else [],
+    ),
+    "restaurant_detail": (
+        views.restaurant_detail, async_views.restaurant_detail,
+        lambda context: [(f"/api/restaurants/{pk}/", {"pk": pk}) for pk in context["restaurant_ids"]],
+    ),
+}
+
+
+async def _drive(view, targets, concurrency, total):
+    factory = AsyncRequestFactory()
+    call = view if iscoroutinefunction(view) else sync_to_async(view)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, statuses = [], {}
+
+    async def one(i):
+        path, kwargs = targets[i % len(targets)]
+        async with semaphore, ThreadSensitiveContext():
+            started = time.perf_counter()
+            response = await call(factory.get(path), **kwargs)
+            if hasattr(response, "render"):
+                await sync_to_async(response.render)()
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            await sync_to_async(close_old_connections)()  # what request_finished does
+
+    try:
+        for i in range(len(targets)):
+            await one(i)  # warm the cache, untimed
+        latencies.clear()
+        statuses.clear()
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        return latencies, statuses, time.perf_counter() - started
+    finally:
+        await async_cache.close()
+
+
+def run_concurrent(name, concurrency, iterations, context):
+    """Warm-cache sync vs async comparison; returns [] for scenarios without an async view."""
+    if name not in CONCURRENT:
+        return []
+    sync_view, async_view, build = CONCURRENT[name]
+    targets = build(context)
+    if not targets:
+        return []
+
+    results = []
+    for kind, view in (("sync", sync_view), ("async", async_view)):
+        latencies, statuses, elapsed = asyncio.run(_drive(view, targets, concurrency, iterations))
+        results.append({
+            "scenario": name,
+            "mode": f"{kind}-c{concurrency}",
+            "iterations": iterations,
+            "concurrency": concurrency,
+            "throughput_rps": iterations / elapsed,
+            "latency_ms": _latency_summary(latencies),
+            "status_codes": statuses,
+        })
+    return results
+
+
+def compare(results, baseline):
+    """Yield (scenario, mode, metric, before, after) for p50/p95/p99, queries and throughput."""
+    previous = {(r["scenario"], r["mode"]): r for r in baseline.get("results", [])}
+    for result in results:
+        before = previous.get((result["scenario"], result["mode"]))
+        if before is None:
+            continue
+        for metric in ("p50", "p95", "p99"):
+            yield result["scenario"], result["mode"], metric, before["latency_ms"][metric], result["latency_ms"][metric]
+        if "queries" in result and "queries" in before:
+            yield result["scenario"], result["mode"], "queries", before["queries"]["mean"], result["queries"]["mean"]
+        if "throughput_rps" in result and "throughput_rps" in before:
+            yield result["scenario"], result["mode"], "rps", before["throughput_rps"], result["throughput_rps"]
+
+
+def dataset_stats():
+    return {
+        "restaurants": Restaurant.objects.count(),
+        "customers": Customer.objects.count(),
+        "orders": Order.objects.count(),
+    }
+
+
+@scenario("dashboard")
+def dashboard_scenario(client, context):
+    return [
+        (lambda pk=pk, days=days: client.get(f"/api/restaurants/{pk}/dashboard/?days={days}"))
+        for pk in context["restaurant_ids"]
+        for days in (7, 30, 90)
+    ]
+
+
+@scenario("dashboard_365")
+def dashboard_year_scenario(client, context):
+    return [
+        (lambda pk=pk: client.get(f"/api/restaurants/{pk}/dashboard/?days=365"))
+        for pk in context["restaurant_ids"]
+    ]
+
+
+@scenario("dashboard_series")
+def dashboard_series_scenario(client, context):
+    return [
+        (lambda pk=pk: client.get(f"/api/restaurants/{pk}/dashboard/?bucket=day&days=90"))
+        for pk in context["restaurant_ids"]
+    ]
+
+
+@scenario("cohorts")
+def cohorts_scenario(client, context):
+    # cold: every week from the rollups; warm: cached closed weeks plus the current one
+    return [
+        (lambda pk=pk: client.get(f"/api/restaurants/{pk}/cohorts/?weeks=12"))
+        for pk in context["restaurant_ids"]
+    ]
+
+
+@scenario("dashboard_batch")
+def dashboard_batch_scenario(client, context):
+    ids = ",".join(str(pk) for pk in context["restaurant_ids"])
+    return [lambda: client.get(f"/api/dashboards/?ids={ids}&days=30")]
+
+
+@scenario("restaurant_detail")
+def restaurant_detail_scenario(client, context):
+    return [
+        (lambda pk=pk: client.get(f"/api/restaurants/{pk}/"))
+        for pk in context["restaurant_ids"]
+    ]
+
+
+@scenario("order_list_page")
+def order_list_page_scenario(client, context):
+    return [lambda: client.get("/api/orders/?limit=100")]
+
+
+@scenario("order_list_large_page")
+def order_list_large_page_scenario(client, context):
+    return [lambda: client.get("/api/orders/?limit=1000")]
+
+
+@scenario("order_list_stream")
+def order_list_stream_scenario(client, context):
+    return [lambda: client.get("/api/orders/?stream=ndjson")]
+
+
+@scenario("customer_list_page")
+def customer_list_page_scenario(client, context):
+    return [lambda: client.get("/api/customers/?limit=100")]
+
+
+@scenario("order_create")
+def order_create_scenario(client, context):
+    customer = context["customer"]
+    if customer is None:
+        return []
+    payload = {"restaurant": customer["restaurant_id"], "customer": customer["id"], "total_amount": "12.34"}
+    return [lambda: client.post("/api/orders/", payload, content_type="application/json")]
+
+
+@scenario("order_create_retry")
+def order_create_retry_scenario(client, context):
+    # one Idempotency-Key: warm runs are replays, cold runs (cached keys dropped) insert
+    customer = context["customer"]
+    if customer is None:
+        return []
+    payload = {"restaurant": customer["restaurant_id"], "customer": customer["id"], "total_amount": "12.34"}
+    return [lambda: client.post("/api/orders/", payload, content_type="application/json",
+                                HTTP_IDEMPOTENCY_KEY="benchmark-order-create-retry")]
@@ -0,0 +1,144 @@
+"""
+Weekly cohort retention for a restaurant
+(GET /api/restaurants/<pk>/cohorts/?weeks=12).
+
+A customer's cohort is the week of their first order at the restaurant
+(Monday-start in settings.TIME_ZONE, as the series buckets); a cohort's
+row counts how many of its customers ordered in that week and in each
+later one, up to the current week.
+
+Both queries read CustomerDailySpend, which already has one row per
+customer and day with orders, instead of Order:
+
+- closed weeks: one pass over the window's rows with a window function
+  for each customer's first week; customers seen before the window belong
+  to an older cohort and are left out. Cached (per current week) until the
+  week is over, or until an order write to an earlier day invalidates it
+  (api/signals.py, as for the series buckets).
+- current week: the customers with orders this week, each with their
+  first day read off customer_daily_spend_first_idx in one index probe.
+  Never cached.
+"""
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+
+from .models import CustomerDailySpend
+
+DEFAULT_WEEKS = 12
+MAX_WEEKS = 52
+CLOSED_TIMEOUT = 8 * 86400  # the key names its week; this only bounds leftovers
+
+# Monday of the week a date column falls in
+_WEEK = "({day} - (EXTRACT(ISODOW FROM {day})::int - 1))"
+
+
+class CohortError(ValueError):
+    pass
+
+
+def parse_weeks(params) -> int:
+    try:
+        weeks = int(params.get("weeks", DEFAULT_WEEKS))
+    except ValueError:
+        weeks = 0
+    if weeks <= 0 or weeks > MAX_WEEKS:
+        raise CohortError(f"weeks must be an integer between 1 and {MAX_WEEKS}.")
+    return weeks
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def cohort_cache_key(restaurant_id: int, current_week, weeks: int) -> str:
+    return f"dashboard:cohorts:{restaurant_id}:{current_week.isoformat()}:{weeks}"
+
+
+def _closed_counts(restaurant_id, start, current) -> dict:
+    # {(cohort week, week): customers} for weeks in [start, current);
+    # `connection` is the primary, whatever the routing, as these are cached
+    table = CustomerDailySpend._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT cohort, week, count(*) FROM (
+                SELECT customer_id, week, min(week) OVER (PARTITION BY customer_id) AS cohort
+                FROM (
+                    SELECT DISTINCT customer_id, {_WEEK.format(day="day")} AS week
+                    FROM {table}
+                    WHERE restaurant_id = %s AND day >= %s AND day < %s
+                ) AS activity
+            ) AS weeks
+            WHERE NOT EXISTS (
+                SELECT 1 FROM {table} AS earlier
+                WHERE earlier.customer_id = weeks.customer_id AND earlier.restaurant_id = %s AND earlier.day < %s
+            )
+            GROUP BY cohort, week
+            """,
+            [restaurant_id, start, current, restaurant_id, start],
+        )
+        return {(cohort, week): count for cohort, week, count in cursor.fetchall()}
+
+
+def _current_counts(restaurant_id, start, current) -> dict:
+    # {(cohort week, current week): customers} for the customers with orders this week
+    table = CustomerDailySpend._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT {_WEEK.format(day="first.day")} AS cohort, count(*)
+            FROM (SELECT DISTINCT customer_id FROM {table} WHERE restaurant_id = %s AND day >= %s) AS cur
+            CROSS JOIN LATERAL (
+                SELECT f.day FROM {table} AS f
+                WHERE f.customer_id = cur.customer_id AND f.restaurant_id = %s
+                ORDER BY f.day LIMIT 1
+            ) AS first
+            WHERE first.day >= %s
+            GROUP BY 1
+            """,
+            [restaurant_id, current, restaurant_id, start],
+        )
+        return {(cohort, current): count for cohort, count in cursor.fetchall()}
+
+
+def compute_cohorts(restaurant, weeks: int = DEFAULT_WEEKS) -> dict:
+    current = week_start(timezone.localdate())
+    start = current - timedelta(weeks=weeks - 1)
+
+    key = cohort_cache_key(restaurant.id, current, weeks)
+    counts = cache.get(key)
+    if counts is None:
+        counts = _closed_counts(restaurant.id, start, current)
+        cache.set(key, counts, timeout=CLOSED_TIMEOUT)
+    counts = {**counts, **_current_counts(restaurant.id, start, current)}
+
+    cohorts = []
+    for i in range(weeks):
+        cohort = start + timedelta(weeks=i)
+        size = counts.get((cohort, cohort), 0)
+        active = [counts.get((cohort, cohort + timedelta(weeks=k)), 0) for k in range(weeks - i)]
+        cohorts.append({
+            "week": cohort.isoformat(),
+            "customers": size,
+            "active": active,  # customers with orders in week 0, 1, ... after their first
+            "retention": [round(100 * n / size, 1) if size else None for n in active],
+        })
+    return {
+        "restaurant": {"id": restaurant.id, "name": restaurant.name},
+        "weeks": weeks,
+        "from": start.isoformat(),
+        "current_week": current.isoformat(),
+        "cohorts": cohorts,
+    }
+
+
+def invalidate_days(pairs):
+    """Forget cached cohorts of restaurants whose orders changed on (restaurant_id, day) pairs before this week."""
+    current = week_start(timezone.localdate())
+    restaurants = {restaurant_id for restaurant_id, day in pairs if day < current}
+    keys = [cohort_cache_key(r, current, weeks) for r in restaurants for weeks in range(1, MAX_WEEKS + 1)]
+    if keys:
+        cache.delete_many(keys)
@@ -0,0 +1,203 @@
+"""
+Per-customer spend behind the dashboard's top_customers and spend-ordered
+customer lists.
+
+CustomerSpend holds one row per (restaurant, customer): lifetime totals and
+totals over each of CustomerSpend.WINDOWS trailing days. Each spend column
+has an index on (restaurant, spend DESC, customer), so the top N customers
+of a restaurant are the first N entries of one index range.
+
+Rows move with the same deltas as the daily rollups (rollups.apply_deltas),
+which count today in every window. Days leaving a window are taken out by
+roll_windows() (the roll_customer_spend beat task), which recomputes the
+window columns from CustomerDailySpend and records the day it ran for.
+Until it has run today, rolled_today() is False and the dashboard groups
+the daily rollups instead.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection, connections, router, transaction
+from django.utils import timezone
+
+from .models import Customer, CustomerDailySpend, CustomerSpend
+
+WINDOWS = CustomerSpend.WINDOWS
+ROLLED_KEY = "customer_spend:rolled_on"
+
+COLUMNS = ("lifetime_orders", "lifetime_spend") + tuple(
+    column for days in WINDOWS for column in (f"orders_{days}d", f"spend_{days}d")
+)
+COUNT_COLUMNS = COLUMNS[0::2]
+
+
+def _window_starts(today):
+    return {days: today - timedelta(days=days - 1) for days in WINDOWS}
+
+
+def _sums_sql():
+    # SUMs over CustomerDailySpend in COLUMNS order; takes one day param per window
+    sums = ["SUM(orders_count)", "SUM(total_spend)"]
+    for _ in WINDOWS:
+        sums.append("COALESCE(SUM(orders_count) FILTER (WHERE day >= %s), 0)")
+        sums.append("COALESCE(SUM(total_spend) FILTER (WHERE day >= %s), 0)")
+    return ", ".join(sums)
+
+
+def _sums_params(today):
+    return [start for start in _window_starts(today).values() for _ in range(2)]
+
+
+def apply_deltas(cursor, customer_rows):
+    """
+    customer_rows: {(restaurant_id, customer_id, day): [orders_count, amount]},
+    as built by rollups.apply_deltas(), which calls this in its transaction.
+    Like the daily rollups, only growing rows are upserted.
+    """
+    starts = _window_starts(timezone.localdate())
+    rows = defaultdict(lambda: [0, Decimal("0")] * (1 + len(WINDOWS)))
+    for (restaurant_id, customer_id, day), (count, amount) in customer_rows.items():
+        values = rows[(restaurant_id, customer_id)]
+        values[0] += count
+        values[1] += amount
+        for i, days in enumerate(WINDOWS, start=1):
+            if day >= starts[days]:
+                values[2 * i] += count
+                values[2 * i + 1] += amount
+
+    table = CustomerSpend._meta.db_table
+    inc = [(r, c, *values) for (r, c), values in rows.items() if values[0] > 0 and min(values[0::2]) >= 0]
+    dec = [(*values, r, c) for (r, c), values in rows.items() if values[0] <= 0 or min(values[0::2]) < 0]
+    if inc:
+        cursor.executemany(
+            f"""
+            INSERT INTO {table} AS t (restaurant_id, customer_id, {", ".join(COLUMNS)})
+            VALUES ({", ".join(["%s"] * (2 + len(COLUMNS)))})
+            ON CONFLICT (restaurant_id, customer_id) DO UPDATE SET
+                {", ".join(f"{col} = t.{col} + EXCLUDED.{col}" for col in COLUMNS)}
+            """,
+            inc,
+        )
+    if dec:
+        assignments = ", ".join(
+            f"{col} = GREATEST({col} + %s, 0)" if col in COUNT_COLUMNS else f"{col} = {col} + %s"
+            for col in COLUMNS
+        )
+        cursor.executemany(
+            f"UPDATE {table} SET {assignments} WHERE restaurant_id = %s AND customer_id = %s",
+            dec,
+        )
+        cursor.executemany(
+            f"DELETE FROM {table} WHERE restaurant_id = %s AND customer_id = %s AND lifetime_orders = 0",
+            [row[-2:] for row in dec],
+        )
+
+
+def refresh(pairs):
+    """Recompute the rows for (restaurant_id, customer_id) pairs from CustomerDailySpend."""
+    pairs = list(pairs)
+    if not pairs:
+        return
+    table = CustomerSpend._meta.db_table
+    in_pairs = "(restaurant_id, customer_id) IN (SELECT * FROM unnest(%s::bigint[], %s::bigint[]))"
+    pair_params = [[r for r, _ in pairs], [c for _, c in pairs]]
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE {in_pairs}", pair_params)
+        cursor.execute(
+            f"""
+            INSERT INTO {table} (restaurant_id, customer_id, {", ".join(COLUMNS)})
+            SELECT restaurant_id, customer_id, {_sums_sql()}
+            FROM {CustomerDailySpend._meta.db_table}
+            WHERE {in_pairs}
+            GROUP BY restaurant_id, customer_id
+            """,
+            _sums_params(timezone.localdate()) + pair_params,
+        )
+
+
+def rebuild_restaurant(restaurant_id):
+    """Recompute every row for a restaurant (rollups.rebuild_restaurant)."""
+    table = CustomerSpend._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {table} WHERE restaurant_id = %s", [restaurant_id])
+        cursor.execute(
+            f"""
+            INSERT INTO {table} (restaurant_id, customer_id, {", ".join(COLUMNS)})
+            SELECT restaurant_id, customer_id, {_sums_sql()}
+            FROM {CustomerDailySpend._meta.db_table}
+            WHERE restaurant_id = %s
+            GROUP BY restaurant_id, customer_id
+            """,
+            _sums_params(timezone.localdate()) + [restaurant_id],
+        )
+
+
+def rolled_today() -> bool:
+    return cache.get(ROLLED_KEY) == timezone.localdate().isoformat()
+
+
+def roll_windows() -> int:
+    """
+    Recompute the window columns for today from CustomerDailySpend and mark
+    them current. Writers wait on the table lock, so no delta is applied to
+    a row between the recompute's snapshot and its update. Returns the
+    number of rows changed.
+    """
+    today = timezone.localdate()
+    table = CustomerSpend._meta.db_table
+    window_columns = COLUMNS[2:]
+    widest = max(WINDOWS)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE")
+        cursor.execute(
+            f"""
+            WITH w (restaurant_id, customer_id, {", ".join(COLUMNS)}) AS (
+                SELECT restaurant_id, customer_id, {_sums_sql()}
+                FROM {CustomerDailySpend._meta.db_table}
+                WHERE day >= %s
+                GROUP BY restaurant_id, customer_id
+            )
+            UPDATE {table} AS t SET
+                {", ".join(f"{col} = COALESCE(w.{col}, 0)" for col in window_columns)}
+            FROM {table} AS s
+            LEFT JOIN w ON w.restaurant_id = s.restaurant_id AND w.customer_id = s.customer_id
+            WHERE t.id = s.id
+              AND (s.orders_{widest}d > 0 OR w.customer_id IS NOT NULL)
+              AND ({", ".join(f"s.{col}" for col in window_columns)})
+                  IS DISTINCT FROM ({", ".join(f"COALESCE(w.{col}, 0)" for col in window_columns)})
+            """,
+            _sums_params(today) + [_window_starts(today)[widest]],
+        )
+        changed = cursor.rowcount
+        transaction.on_commit(lambda: cache.set(ROLLED_KEY, today.isoformat(), timeout=None))
+    return changed
+
+
+def top_customers(restaurant_ids, days, limit):
+    """
+    [(restaurant_id, customer_id, email, spend, orders)] for the top `limit`
+    customers by spend over a WINDOWS window: one index range per restaurant.
+    """
+    orders, spend = f"orders_{days}d", f"spend_{days}d"
+    with connections[router.db_for_read(CustomerSpend)].cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT r.id, s.customer_id, c.email, s.{spend}, s.{orders}
+            FROM unnest(%s::bigint[]) AS r(id)
+            CROSS JOIN LATERAL (
+                SELECT customer_id, {spend}, {orders}
+                FROM {CustomerSpend._meta.db_table}
+                WHERE restaurant_id = r.id AND {orders} > 0
+                ORDER BY {spend} DESC, customer_id
+                LIMIT %s
+            ) AS s
+            JOIN {Customer._meta.db_table} AS c ON c.id = s.customer_id
+            ORDER BY r.id, s.{spend} DESC, s.customer_id
+            """,
+            [list(restaurant_ids), limit],
+        )
+        return cursor.fetchall()
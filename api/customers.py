@@ -0,0 +1,152 @@
+"""
+Customers by email: bulk find-or-create for POS integrations
+(POST /api/customers/bulk/) and merging of duplicates created before
+emails were unique per restaurant.
+
+Emails match case-insensitively within a restaurant, through the
+uniq_live_customer_email index on (restaurant, lower(email)); soft-deleted
+customers (api/purge.py) are left out.
+"""
+from django.db import connection, transaction
+from rest_framework.exceptions import ValidationError
+
+from . import rollups
+from .models import Customer, Order, Restaurant
+from .serializers import CustomerBulkRowSerializer
+from .signals import forget_order_days
+
+MAX_UPSERT_ROWS = 10000
+MERGE_BATCH_SIZE = 100  # duplicate groups per merge transaction
+
+_UPSERT_SQL = f"""
+    WITH input (ord, restaurant_id, email) AS (
+        SELECT * FROM unnest(%s::int[], %s::bigint[], %s::text[])
+    ),
+    inserted AS (
+        INSERT INTO {Customer._meta.db_table} (restaurant_id, email, created_at)
+        SELECT DISTINCT ON (restaurant_id, lower(email)) restaurant_id, email, now()
+        FROM input
+        ORDER BY restaurant_id, lower(email), ord
+        ON CONFLICT (restaurant_id, lower(email)) WHERE deleted_at IS NULL DO NOTHING
+        RETURNING id, restaurant_id, lower(email) AS email_key
+    )
+    SELECT i.ord, COALESCE(n.id, c.id), n.id IS NOT NULL
+    FROM input AS i
+    LEFT JOIN inserted AS n ON n.restaurant_id = i.restaurant_id AND n.email_key = lower(i.email)
+    LEFT JOIN {Customer._meta.db_table} AS c
+        ON n.id IS NULL AND c.restaurant_id = i.restaurant_id AND lower(c.email) = lower(i.email)
+        AND c.deleted_at IS NULL
+    ORDER BY i.ord
+"""
+
+
+def upsert_customers(pairs):
+    """
+    Resolve (restaurant_id, email) pairs to customer ids, creating the
+    customers that do not exist, in one statement. Returns
+    [(customer_id, created)] in input order; created is True for the first
+    occurrence of a new customer only.
+    """
+    pairs = list(pairs)
+    results = [None] * len(pairs)
+    todo = list(range(len(pairs)))
+    with connection.cursor() as cursor:
+        while todo:
+            cursor.execute(_UPSERT_SQL, [todo, [pairs[i][0] for i in todo], [pairs[i][1] for i in todo]])
+            claimed = set()
+            for position, customer_id, created in cursor.fetchall():
+                if customer_id is not None:
+                    results[position] = (customer_id, created and customer_id not in claimed)
+                    claimed.add(customer_id)
+            # a conflicting row committed after the statement's snapshot: look again
+            todo = [i for i in todo if results[i] is None]
+    return results
+
+
+def upsert_customer_rows(payload):
+    """
+    Validate a list of {"restaurant", "email"} dicts and resolve them with
+    upsert_customers(). Returns (results, errors): results is a list of
+    {"index", "id", "created"}, errors of {"index", "errors"}.
+    """
+    row_serializer = CustomerBulkRowSerializer()
+    errors = []
+    candidates = []
+    rows = []
+    for index, item in enumerate(payload):
+        try:
+            rows.append(row_serializer.run_validation(item))
+        except ValidationError as exc:
+            errors.append({"index": index, "errors": exc.detail})
+        else:
+            candidates.append(index)
+
+    known = set(Restaurant.objects.filter(id__in={row["restaurant"] for row in rows}).values_list("id", flat=True))
+    valid = []
+    for index, row in zip(candidates, rows):
+        if row["restaurant"] in known:
+            valid.append((index, row))
+        else:
+            errors.append({"index": index, "errors": {
+                "restaurant": [f'Invalid pk "{row["restaurant"]}" - object does not exist.'],
+            }})
+    errors.sort(key=lambda e: e["index"])
+
+    resolved = upsert_customers((row["restaurant"], row["email"]) for _, row in valid)
+    results = [
+        {"index": index, "id": customer_id, "created": created}
+        for (index, _), (customer_id, created) in zip(valid, resolved)
+    ]
+    return results, errors
+
+
+def duplicate_groups():
+    """[(kept_id, [duplicate_id, ...])] per restaurant/email with several customers; the oldest is kept."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT array_agg(id ORDER BY id) FROM {Customer._meta.db_table}
+            WHERE deleted_at IS NULL
+            GROUP BY restaurant_id, lower(email) HAVING count(*) > 1
+            ORDER BY min(id)
+            """
+        )
+        return [(ids[0], ids[1:]) for (ids,) in cursor.fetchall()]
+
+
+def merge_batch(groups) -> int:
+    """
+    Move the duplicates' orders to the kept customers and delete the
+    duplicates, in one short transaction that only takes row locks: order
+    writes for these customers wait for it, others carry on. Rollups are
+    rebuilt for the days the moved orders fall on. Returns orders moved.
+    """
+    mapping = {duplicate: kept for kept, duplicates in groups for duplicate in duplicates}
+    if not mapping:
+        return 0
+    with transaction.atomic():
+        duplicates = list(Customer.objects.select_for_update().filter(id__in=mapping).values_list("id", flat=True))
+        touched = rollups.touched_days(Order.objects.filter(customer_id__in=duplicates))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                UPDATE {Order._meta.db_table} AS o SET customer_id = m.kept
+                FROM unnest(%s::bigint[], %s::bigint[]) AS m(duplicate, kept)
+                WHERE o.customer_id = m.duplicate
+                """,
+                [duplicates, [mapping[pk] for pk in duplicates]],
+            )
+            moved = cursor.rowcount
+        rollups.rebuild_days(touched)
+        forget_order_days(touched)
+        Customer.objects.filter(id__in=duplicates).delete()
+    return moved
+
+
+def merge_duplicates(batch_size=MERGE_BATCH_SIZE):
+    """Merge every duplicate group, batch_size groups per transaction. Yields (groups, customers, orders) per batch."""
+    groups = duplicate_groups()
+    for start in range(0, len(groups), batch_size):
+        batch = groups[start:start + batch_size]
+        moved = merge_batch(batch)
+        yield len(batch), sum(len(duplicates) for _, duplicates in batch), moved
@@ -0,0 +1,133 @@
+"""
+Dashboard payloads, computed from the daily rollups (api/rollups.py).
+
+compute_dashboards() is the one implementation: it builds payloads for any
+number of restaurants and windows with a fixed number of grouped queries.
+The view, the single-restaurant Celery task and the batch warming task all
+go through it (via api/dashboard_cache.py), so every writer of a dashboard
+cache key stores the same payload shape.
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Sum, Count, F, Q, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from . import customer_spend, rollups
+from .models import RestaurantDailyStats, CustomerDailySpend
+
+TOP_CUSTOMERS = 5
+DASHBOARD_CACHE_TIMEOUT = 60  # seconds
+DEFAULT_WINDOWS = (7, 30, 90)
+
+
+def dashboard_cache_key(restaurant_id: int, days: int) -> str:
+    return f"dashboard:restaurant:{restaurant_id}:days:{days}"
+
+
+def window_start(days: int):
+    # A `days` window is today plus the previous days-1 whole days, so it maps
+    # onto at most `days` rollup rows.
+    return timezone.localdate() - timedelta(days=days - 1)
+
+
+def _top_customers(restaurant_ids, days, start_day, use_customer_spend):
+    if use_customer_spend and days in customer_spend.WINDOWS:
+        # first TOP_CUSTOMERS entries of each restaurant's spend index
+        rows = customer_spend.top_customers(restaurant_ids, days, TOP_CUSTOMERS)
+    else:
+        # Top N per restaurant in one query: ROW_NUMBER() partitioned by restaurant
+        rows = (
+            CustomerDailySpend.objects.filter(restaurant_id__in=restaurant_ids, day__gte=start_day)
+            .values("restaurant_id", "customer_id", "customer__email")
+            .annotate(total_spend=Sum("total_spend"), orders=Sum("orders_count"))
+            .annotate(rank=Window(
+                RowNumber(),
+                partition_by=F("restaurant_id"),
+                order_by=[F("total_spend").desc(), F("customer_id").asc()],
+            ))
+            .filter(rank__lte=TOP_CUSTOMERS)
+            .order_by("restaurant_id", "rank")
+            .values_list("restaurant_id", "customer_id", "customer__email", "total_spend", "orders")
+        )
+    top = {}
+    for restaurant_id, customer_id, email, total_spend, orders in rows:
+        top.setdefault(restaurant_id, []).append({
+            "customer_id": customer_id,
+            "email": email,
+            "total_spend": f"{total_spend:.2f}",
+            "orders": orders,
+        })
+    return top
+
+
+def compute_dashboards(restaurants, windows) -> dict:
+    """
+    Return {(restaurant_id, days): payload} for every restaurant/window pair.
+
+    Totals and unique customers for all windows come from one conditional
+    aggregate query each over the widest window; top customers take one
+    query per window, read from CustomerSpend once its windows are current.
+    """
+    restaurants = list(restaurants)
+    windows = sorted(set(windows))
+    if not restaurants or not windows:
+        return {}
+
+    restaurant_ids = [r.id for r in restaurants]
+    starts = {days: window_start(days) for days in windows}
+    widest = starts[windows[-1]]
+
+    totals_aggregates = {}
+    unique_aggregates = {}
+    for days, start_day in starts.items():
+        in_window = Q(day__gte=start_day)
+        totals_aggregates[f"count_{days}"] = Sum("orders_count", filter=in_window)
+        totals_aggregates[f"revenue_{days}"] = Sum("revenue_total", filter=in_window)
+        unique_aggregates[f"unique_{days}"] = Count("customer_id", filter=in_window, distinct=True)
+
+    totals = {
+        row["restaurant_id"]: row
+        for row in RestaurantDailyStats.objects.filter(restaurant_id__in=restaurant_ids, day__gte=widest)
+        .values("restaurant_id")
+        .annotate(**totals_aggregates)
+        .order_by()
+    }
+    uniques = {
+        row["restaurant_id"]: row
+        for row in CustomerDailySpend.objects.filter(restaurant_id__in=restaurant_ids, day__gte=widest)
+        .values("restaurant_id")
+        .annotate(**unique_aggregates)
+        .order_by()
+    }
+
+    payloads = {}
+    use_customer_spend = customer_spend.rolled_today()
+    for days, start_day in starts.items():
+        since = rollups.day_start(start_day)
+        top = _top_customers(restaurant_ids, days, start_day, use_customer_spend)
+        for restaurant in restaurants:
+            row = totals.get(restaurant.id, {})
+            orders_count = row.get(f"count_{days}") or 0
+            revenue_total = row.get(f"revenue_{days}") or Decimal("0")
+            avg_order_value = revenue_total / orders_count if orders_count else Decimal("0")
+            unique_customers = uniques.get(restaurant.id, {}).get(f"unique_{days}") or 0
+
+            payloads[(restaurant.id, days)] = {
+                "restaurant": {"id": restaurant.id, "name": restaurant.name},
+                "window_days": days,
+                "since": since.isoformat(),
+                "totals": {
+                    "orders_count": orders_count,
+                    "revenue_total": f"{revenue_total:.2f}",  # Decimal -> string for JSON
+                    "avg_order_value": f"{avg_order_value:.2f}",  # Decimal -> string for JSON
+                    "unique_customers": unique_customers,
+                },
+                "top_customers": top.get(restaurant.id, []),
+            }
+    return payloads
+
+
+def compute_dashboard(restaurant, days: int) -> dict:
+    return compute_dashboards([restaurant], [days])[(restaurant.id, days)]
@@ -0,0 +1,472 @@
+"""
+Cache layer in front of the dashboard computation (live Redis counters for
+single dashboards, grouped SQL over the rollups for batches).
+
+Entries are stored as {"body", "etag", "fresh_until", "delta"} under the
+usual dashboard key, with a hard TTL longer than the soft (fresh) TTL. The
+body is the payload already rendered to JSON, so a hit is sent as is
+(views.dashboard_response) without a serializer or renderer, and the etag
+lets polling clients get a 304 instead. Bodies of at least
+DASHBOARD_CACHE_COMPRESS_MIN_BYTES are stored compressed with
+DASHBOARD_CACHE_COMPRESSION (zlib, or lz4 when installed), marked by a
+"codec" key; read_entry() undoes that.
+
+- fresh hit: served as is. Near the end of its life a request may refresh
+  early with probability growing as expiry approaches (XFetch, scaled by how
+  long the last recompute took), so hot keys rarely all expire at once.
+- stale hit (past fresh_until, before the hard TTL): the stale payload is
+  served while one background Celery refresh runs.
+- miss: a single-flight lock lets one worker recompute; the others wait
+  briefly for its result instead of running the same aggregates.
+
+Refreshes (stale hits, early expiry and the refresh endpoint) go through
+schedule_refresh(): one pending recompute_dashboard_cache task per
+(restaurant, days), whose id is kept under refresh_key(). It waits
+REFRESH_DEBOUNCE seconds in the queue, so a burst of requests shares it,
+and the key is cleared when it starts running.
+
+aget_dashboard() / aget_dashboards() are the same reads for the async
+views, over api/async_cache.py.
+
+Fresh entries read from Redis are also kept for a few seconds in the
+in-process L1 (api/local_cache.py), which serves them without a Redis
+round trip until it expires. Order writes drop the restaurant's entries
+from both tiers once they commit (forget_restaurants()), so the next read
+recomputes from live counters that already include the write.
+"""
+import asyncio
+import hashlib
+import json
+import math
+import random
+import time
+import uuid
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from . import async_cache, db_routing, fast_serializers, live_dashboard, local_cache, metrics
+from .dashboard import (
+    compute_dashboards,
+    dashboard_cache_key,
+    DASHBOARD_CACHE_TIMEOUT,
+    DEFAULT_WINDOWS,
+)
+from .models import Restaurant
+
+try:
+    import lz4.frame
+except ImportError:  # optional: DASHBOARD_CACHE_COMPRESSION = "lz4" falls back to zlib
+    lz4 = None
+
+STALE_TTL = 300  # seconds a stale entry may still be served after fresh_until
+EARLY_EXPIRY_BETA = 1.0  # >1 refreshes earlier, <1 later, 0 disables
+LOCK_TIMEOUT = 30
+LOCK_WAIT = 5.0
+LOCK_POLL_INTERVAL = 0.05
+REFRESH_DEBOUNCE = 2  # seconds a queued refresh waits, absorbing repeat requests
+REFRESH_PENDING_TIMEOUT = 120  # a lost refresh task stops blocking new ones after this
+FORGET_BATCH_SIZE = 100  # restaurants per DEL in forget_restaurants(), 365 keys each
+
+requests_total = metrics.counter(
+    "dashboard_cache_requests_total",
+    "Dashboard cache lookups by result (hit, miss, stale, early).",
+    ("result",),
+)
+CODECS = {"zlib": (zlib.compress, zlib.decompress)}
+if lz4 is not None:
+    CODECS["lz4"] = (lz4.frame.compress, lz4.frame.decompress)
+
+tier_requests_total = metrics.counter(
+    "dashboard_cache_tier_requests_total",
+    "Dashboard cache lookups by tier (l1 in-process, l2 Redis) and result (hit, miss).",
+    ("tier", "result"),
+)
+
+
+def lock_key(restaurant_id: int, days: int) -> str:
+    return f"{dashboard_cache_key(restaurant_id, days)}:lock"
+
+
+def _entry(data, delta):
+    body = fast_serializers.dumps(data)  # the bytes JSONRenderer would send
+    return {
+        "body": body,
+        "etag": f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"',
+        "fresh_until": time.time() + DASHBOARD_CACHE_TIMEOUT,
+        "delta": delta,
+    }
+
+
+def _codec():
+    codec = settings.DASHBOARD_CACHE_COMPRESSION or None
+    if codec == "lz4" and lz4 is None:
+        return "zlib"
+    return codec
+
+
+def _pack(entry):
+    # the form stored in Redis
+    codec = _codec()
+    if codec is None or len(entry["body"]) < settings.DASHBOARD_CACHE_COMPRESS_MIN_BYTES:
+        return entry
+    return {**entry, "body": CODECS[codec][0](entry["body"]), "codec": codec}
+
+
+def read_entry(stored):
+    """An entry as stored in Redis, with its body decompressed; None for a miss."""
+    if stored is None or "body" not in stored:  # missing, or from before bodies were pre-rendered
+        return None
+    codec = stored.get("codec")
+    if codec is None:
+        return stored
+    entry = {key: value for key, value in stored.items() if key != "codec"}
+    entry["body"] = CODECS[codec][1](stored["body"])
+    return entry
+
+
+def payload(entry) -> dict:
+    return json.loads(entry["body"])
+
+
+def store(restaurant_id: int, days: int, data: dict, delta: float = 0.0) -> dict:
+    entry = _entry(data, delta)
+    cache.set(
+        dashboard_cache_key(restaurant_id, days),
+        _pack(entry),
+        timeout=DASHBOARD_CACHE_TIMEOUT + STALE_TTL,
+    )
+    return entry
+
+
+def store_many(payloads: dict, delta: float = 0.0) -> dict:
+    # {(restaurant_id, days): data} -> one set_many / Redis pipeline; returns the entries by the same keys
+    entries = {key: _entry(data, delta) for key, data in payloads.items()}
+    cache.set_many(
+        {dashboard_cache_key(pk, days): _pack(entry) for (pk, days), entry in entries.items()},
+        timeout=DASHBOARD_CACHE_TIMEOUT + STALE_TTL,
+    )
+    return entries
+
+
+def refresh_key(restaurant_id: int, days: int) -> str:
+    return f"{dashboard_cache_key(restaurant_id, days)}:refresh"
+
+
+def acquire_lock(restaurant_id: int, days: int) -> bool:
+    return cache.add(lock_key(restaurant_id, days), 1, timeout=LOCK_TIMEOUT)
+
+
+def release_lock(restaurant_id: int, days: int):
+    cache.delete(lock_key(restaurant_id, days))
+
+
+def recompute(restaurant, days: int) -> dict:
+    started = time.monotonic()
+    data = live_dashboard.read_dashboard(restaurant, days)
+    return store(restaurant.id, days, data, time.monotonic() - started)
+
+
+def _compute_batch(restaurant_ids, days):
+    # -> ({(restaurant_id, days): payload}, seconds per payload), with the
+    # same replica rule as recompute_many()
+    with db_routing.within_lag(DASHBOARD_CACHE_TIMEOUT):
+        restaurants = list(Restaurant.objects.filter(id__in=restaurant_ids).only("id", "name"))
+        started = time.monotonic()
+        computed = compute_dashboards(restaurants, [days])
+    return computed, (time.monotonic() - started) / max(len(computed), 1)
+
+
+def recompute_many(restaurants, windows) -> int:
+    started = time.monotonic()
+    # A replica (when the caller opted in) may serve the rollups unless it is
+    # further behind than a fresh entry is allowed to be anyway
+    with db_routing.within_lag(DASHBOARD_CACHE_TIMEOUT):
+        payloads = compute_dashboards(restaurants, windows)
+    store_many(payloads, (time.monotonic() - started) / max(len(payloads), 1))
+    return len(payloads)
+
+
+def warm_dashboards(restaurant_ids=None, windows=DEFAULT_WINDOWS, batch_size=500) -> int:
+    """
+    Precompute and cache dashboards for many restaurants, one batch of
+    grouped queries and one set_many per `batch_size` restaurants.
+    Returns the number of keys written.
+    """
+    restaurants = Restaurant.objects.order_by("id").only("id", "name")
+    if restaurant_ids is not None:
+        restaurants = restaurants.filter(id__in=restaurant_ids)
+
+    written = 0
+    batch = []
+    for restaurant in restaurants.iterator(chunk_size=batch_size):
+        batch.append(restaurant)
+        if len(batch) >= batch_size:
+            written += recompute_many(batch, windows)
+            batch = []
+    if batch:
+        written += recompute_many(batch, windows)
+    return written
+
+
+def _should_refresh_early(entry, now):
+    # XFetch: now - delta * beta * ln(U) >= expiry, with U in (0, 1]
+    delta = entry.get("delta") or 0.0
+    if not delta or not EARLY_EXPIRY_BETA:
+        return False
+    return now - delta * EARLY_EXPIRY_BETA * math.log(1.0 - random.random()) >= entry["fresh_until"]
+
+
+def _freshness(entry, now) -> str:
+    if now >= entry["fresh_until"]:
+        return "stale"
+    if _should_refresh_early(entry, now):
+        return "early"
+    return "hit"
+
+
+def _local_get(restaurant_id: int, days: int):
+    if not local_cache.enabled():
+        return None
+    entry = local_cache.get((restaurant_id, days))
+    tier_requests_total.inc(tier="l1", result="miss" if entry is None else "hit")
+    return entry
+
+
+def _local_set(restaurant_id: int, days: int, entry):
+    # only fresh entries, and never past fresh_until: L1 hits skip the freshness checks
+    if local_cache.enabled():
+        local_cache.put((restaurant_id, days), entry, restaurant_id, entry["fresh_until"])
+
+
+def _l2_result(entry):
+    tier_requests_total.inc(tier="l2", result="miss" if entry is None else "hit")
+    return entry
+
+
+def schedule_refresh(restaurant_id: int, days: int):
+    """
+    Queue a recompute unless one is already pending for (restaurant_id, days).
+    Returns (task_id, queued): the new task's id, or the pending task's.
+    """
+    from .tasks import recompute_dashboard_cache
+
+    key = refresh_key(restaurant_id, days)
+    task_id = str(uuid.uuid4())
+    if not cache.add(key, task_id, timeout=REFRESH_PENDING_TIMEOUT):
+        pending = cache.get(key)
+        if pending is not None:
+            return pending, False
+        cache.set(key, task_id, timeout=REFRESH_PENDING_TIMEOUT)  # it started running in between
+    recompute_dashboard_cache.apply_async((restaurant_id, days), task_id=task_id, countdown=REFRESH_DEBOUNCE)
+    return task_id, True
+
+
+def refresh_started(restaurant_id: int, days: int, task_id):
+    # called by the task: requests from now on need a new run
+    key = refresh_key(restaurant_id, days)
+    if task_id is not None and cache.get(key) == task_id:
+        cache.delete(key)
+
+
+def forget_restaurants(restaurant_ids):
+    """
+    Drop these restaurants' entries, for every window the views accept, from
+    Redis and every L1: after their orders changed (api/signals.py) or they
+    were deleted.
+    """
+    restaurant_ids = sorted(restaurant_ids)
+    for i in range(0, len(restaurant_ids), FORGET_BATCH_SIZE):
+        cache.delete_many([
+            dashboard_cache_key(pk, days)
+            for pk in restaurant_ids[i:i + FORGET_BATCH_SIZE] for days in range(1, 366)
+        ])
+    if local_cache.enabled():
+        local_cache.publish(restaurant_ids)
+
+
+def _wait_for_entry(key):
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        entry = read_entry(cache.get(key))
+        if entry is not None:
+            return entry
+    return None
+
+
+def get_dashboard(restaurant, days: int) -> dict:
+    """The restaurant's cached dashboard entry ({"body", "etag", ...})."""
+    entry = _local_get(restaurant.id, days)
+    if entry is not None:
+        requests_total.inc(result="hit")
+        return entry
+
+    key = dashboard_cache_key(restaurant.id, days)
+    entry = _l2_result(read_entry(cache.get(key)))
+    now = time.time()
+
+    if entry is not None:
+        result = _freshness(entry, now)
+        requests_total.inc(result=result)
+        if result == "hit":
+            _local_set(restaurant.id, days, entry)
+        else:
+            schedule_refresh(restaurant.id, days)
+        return entry
+
+    requests_total.inc(result="miss")
+    if acquire_lock(restaurant.id, days):
+        try:
+            return recompute(restaurant, days)
+        finally:
+            release_lock(restaurant.id, days)
+
+    # Someone else is computing this key: wait for their result
+    entry = _wait_for_entry(key)
+    if entry is not None:
+        return entry
+    return recompute(restaurant, days)
+
+
+def _local_batch(restaurant_ids, days: int):
+    # ({restaurant_id: body} served by the L1, {restaurant_id: key} still to read from Redis)
+    payloads, keys = {}, {}
+    for pk in restaurant_ids:
+        entry = _local_get(pk, days)
+        if entry is not None:
+            requests_total.inc(result="hit")
+            payloads[pk] = entry["body"]
+        else:
+            keys[pk] = dashboard_cache_key(pk, days)
+    return payloads, keys
+
+
+def _sort_batch(keys, entries, days: int, payloads) -> list:
+    # fresh Redis entries into payloads (and the L1); returns the ids to compute
+    now = time.time()
+    todo = []
+    for pk, key in keys.items():
+        entry = _l2_result(read_entry(entries.get(key)))
+        if entry is not None and now < entry["fresh_until"]:
+            requests_total.inc(result="hit")
+            payloads[pk] = entry["body"]
+            _local_set(pk, days, entry)
+        else:
+            requests_total.inc(result="stale" if entry is not None else "miss")
+            todo.append(pk)
+    return todo
+
+
+def get_dashboards(restaurant_ids, days: int):
+    """
+    Batch read: one get_many for every key the L1 does not hold, then all
+    misses (and stale entries) computed together by compute_dashboards()
+    and written back with one set_many. Returns ({restaurant_id: JSON body}, missing_ids).
+    """
+    payloads, keys = _local_batch(restaurant_ids, days)
+    entries = cache.get_many(list(keys.values()))
+    todo = _sort_batch(keys, entries, days, payloads)
+
+    missing = []
+    if todo:
+        computed, delta = _compute_batch(todo, days)
+        stored = store_many(computed, delta)
+        payloads.update({pk: entry["body"] for (pk, _), entry in stored.items()})
+        missing = [pk for pk in todo if pk not in payloads]
+    return payloads, missing
+
+
+async def arecompute(restaurant, days: int) -> dict:
+    started = time.monotonic()
+    data = await live_dashboard.aread_dashboard(restaurant, days)
+    entry = _entry(data, time.monotonic() - started)
+    await async_cache.set(
+        dashboard_cache_key(restaurant.id, days),
+        _pack(entry),
+        timeout=DASHBOARD_CACHE_TIMEOUT + STALE_TTL,
+    )
+    return entry
+
+
+async def _await_entry(key):
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(LOCK_POLL_INTERVAL)
+        entry = read_entry(await async_cache.get(key))
+        if entry is not None:
+            return entry
+    return None
+
+
+async def aget_dashboard(restaurant, days: int) -> dict:
+    entry = _local_get(restaurant.id, days)
+    if entry is not None:
+        requests_total.inc(result="hit")
+        return entry
+
+    key = dashboard_cache_key(restaurant.id, days)
+    entry = _l2_result(read_entry(await async_cache.get(key)))
+    now = time.time()
+
+    if entry is not None:
+        result = _freshness(entry, now)
+        requests_total.inc(result=result)
+        if result == "hit":
+            _local_set(restaurant.id, days, entry)
+        else:
+            await sync_to_async(schedule_refresh)(restaurant.id, days)  # Celery publishing is sync
+        return entry
+
+    requests_total.inc(result="miss")
+    lock = lock_key(restaurant.id, days)
+    if await async_cache.add(lock, 1, timeout=LOCK_TIMEOUT):
+        try:
+            return await arecompute(restaurant, days)
+        finally:
+            await async_cache.delete(lock)
+
+    entry = await _await_entry(key)
+    if entry is not None:
+        return entry
+    return await arecompute(restaurant, days)
+
+
+async def aget_dashboards(restaurant_ids, days: int):
+    """
+    get_dashboards() for async views. Hits cost one MGET on the event loop;
+    the grouped SQL for misses runs in a worker thread, as Django's async
+    ORM would do with it anyway.
+    """
+    payloads, keys = _local_batch(restaurant_ids, days)
+    entries = await async_cache.get_many(keys.values())
+    todo = _sort_batch(keys, entries, days, payloads)
+
+    missing = []
+    if todo:
+        computed, delta = await sync_to_async(_compute_batch)(todo, days)
+        stored = {key: _entry(data, delta) for key, data in computed.items()}
+        await async_cache.set_many(
+            {dashboard_cache_key(pk, d): _pack(entry) for (pk, d), entry in stored.items()},
+            timeout=DASHBOARD_CACHE_TIMEOUT + STALE_TTL,
+        )
+        payloads.update({pk: entry["body"] for (pk, _), entry in stored.items()})
+        missing = [pk for pk in todo if pk not in payloads]
+    return payloads, missing
+
+
+def stats() -> dict:
+    return {result: requests_total.value(result=result) for result in ("hit", "miss", "stale", "early")}
+
+
+def tier_stats() -> dict:
+    """Lookups and hit rate per tier, plus the L1's current size in this process."""
+    tiers = {}
+    for tier in ("l1", "l2"):
+        hits = tier_requests_total.value(tier=tier, result="hit")
+        misses = tier_requests_total.value(tier=tier, result="miss")
+        tiers[tier] = {"hits": hits, "misses": misses, "hit_rate": hits / (hits + misses) if hits + misses else None}
+    tiers["l1"].update(local_cache.size())
+    return tiers
@@ -0,0 +1,124 @@
+"""
+Read-replica routing (settings.DATABASE_ROUTERS).
+
+Reads go to the primary unless they run inside a replica() block, so only
+code that opted in can see replica lag. The opted-in paths are the dashboard
+views, list GETs (@replica_reads), the dashboard Celery tasks and the order
+exports.
+
+Reads whose results are kept for long stay on the primary, inside primary()
+(or on an explicit connection) where they could be reached from a replica()
+block: the live counter seeds, which are trusted to include the deltas they
+skipped, and the closed series buckets and cohort weeks, cached for days.
+Dashboard payloads are only fresh for DASHBOARD_CACHE_TIMEOUT, so their
+rollup reads may use a replica that is at most that far behind
+(within_lag(), measured by replica_lag()).
+
+Read-your-writes: PrimaryPinMiddleware (api/middleware.py) sets a short-lived
+cookie on the response to any unsafe request, and @replica_reads keeps that
+client's reads on the primary while it is present (DB_PRIMARY_PIN_SECONDS).
+
+Without DB_REPLICAS every alias resolves to the primary.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_COOKIE = "db_primary_pin"
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+_read_alias = ContextVar("db_read_alias", default=None)
+
+
+@contextmanager
+def replica():
+    """Send ORM reads in this block (and sync_to_async calls from it) to one replica."""
+    replicas = settings.DATABASE_REPLICAS
+    token = _read_alias.set(random.choice(replicas) if replicas else None)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+@contextmanager
+def primary():
+    """Send ORM reads in this block to the primary, even inside replica()."""
+    token = _read_alias.set(None)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def replica_lag(alias) -> float:
+    """
+    Seconds the database behind `alias` trails the primary: 0 for the primary
+    itself and for a replica that has replayed all it received (an idle
+    primary sends nothing, so the last replay time alone would grow).
+    """
+    with connections[alias].cursor() as cursor:
+        cursor.execute(
+            "SELECT CASE WHEN pg_last_wal_receive_lsn() IS NULL "
+            "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+            "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+        )
+        return float(cursor.fetchone()[0] or 0)
+
+
+@contextmanager
+def within_lag(max_lag: float):
+    """Keep reads in this block on the current replica only if it trails the primary by at most max_lag seconds."""
+    alias = _read_alias.get()
+    if alias is not None and replica_lag(alias) > max_lag:
+        with primary():
+            yield
+    else:
+        yield
+
+
+@contextmanager
+def _request_reads(request):
+    if request.method in SAFE_METHODS and PIN_COOKIE not in request.COOKIES:
+        with replica():
+            yield
+    else:
+        yield
+
+
+def replica_reads(view):
+    """Serve safe requests from a replica unless the client recently wrote."""
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            with _request_reads(request):
+                return await view(request, *args, **kwargs)
+    else:
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            with _request_reads(request):
+                return view(request, *args, **kwargs)
+    return wrapper
+
+
+def pin_primary(request, response):
+    if request.method not in SAFE_METHODS:
+        response.set_cookie(PIN_COOKIE, "1", max_age=settings.DB_PRIMARY_PIN_SECONDS, httponly=True, samesite="Lax")
+    return response
+
+
+class PrimaryReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        # also for instances that were read from a replica
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True  # replicas hold the same rows as the primary
@@ -0,0 +1,205 @@
+"""
+Columnar exports of Order for offline analytics: Parquet, or Arrow IPC.
+
+export_orders() (the export_orders command and Celery task) appends the
+orders created since the previous run to ORDER_EXPORT_DIR, one file per
+run and month (UTC, as the Order partitions):
+
+    month=2026-10/orders-20261018T215300-1234.parquet
+    _watermark.json        (created_at, id) of the last order exported
+
+Columns: id, created_at, restaurant_id, customer_id, total_amount. The
+month=... directories are Hive-style partitions, read back as a `month`
+column by pyarrow.dataset, pandas, DuckDB or Spark.
+
+Rows come from a replica in (created_at, id) order through a server-side
+cursor, CHUNK_ROWS at a time, and every chunk is written out as one record
+batch (a Parquet row group), so memory stays at about one chunk whatever
+the export size. Only orders older than ORDER_EXPORT_LAG_SECONDS are
+taken, and the export is append-only: later edits or deletions of exported
+orders are not carried over. A replica further behind than that could
+still be missing some of them, which the watermark would then skip for
+good, so the export reads from the primary while the replica lags more.
+
+Files are written under a .tmp name and renamed once complete, and the
+watermark moves last. A file is named after its first row, so a run that
+died before moving the watermark is redone by the next one over the same
+file names instead of duplicating rows.
+"""
+import json
+import os
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+
+from . import db_routing
+from .models import Order
+
+CHUNK_ROWS = 50000
+LOCK_KEY = "exports:orders:lock"
+LOCK_TIMEOUT = 6 * 60 * 60
+WATERMARK_FILE = "_watermark.json"
+COLUMNS = ("id", "created_at", "restaurant_id", "customer_id", "total_amount")
+FORMATS = {
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+    "arrow": (".arrow", "application/vnd.apache.arrow.file"),
+}
+FILE_RE = re.compile(r"^month=\d{4}-\d{2}/orders-\d{8}T\d{6}-\d+\.(parquet|arrow)$")
+
+
+class ExportError(Exception):
+    pass
+
+
+def _directory(directory=None) -> Path:
+    return Path(directory or settings.ORDER_EXPORT_DIR)
+
+
+def _schema():
+    return pa.schema([
+        ("id", pa.int64()),
+        ("created_at", pa.timestamp("us", tz="UTC")),
+        ("restaurant_id", pa.int64()),
+        ("customer_id", pa.int64()),
+        ("total_amount", pa.decimal128(10, 2)),
+    ])
+
+
+def read_watermark(directory=None):
+    """{"created_at", "id", "exported_at"} of the last export, or None before the first."""
+    try:
+        with open(_directory(directory) / WATERMARK_FILE) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _write_watermark(directory, created_at, order_id):
+    path = directory / WATERMARK_FILE
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump({"created_at": created_at.isoformat(), "id": order_id, "exported_at": timezone.now().isoformat()}, f)
+    os.replace(tmp, path)
+
+
+def _open(path, fmt, schema):
+    if fmt == "parquet":
+        return pq.ParquetWriter(str(path), schema, compression="zstd")
+    return pa.ipc.new_file(str(path), schema)
+
+
+def _flush(writer, columns, schema):
+    # one chunk -> one record batch / row group
+    if columns[0]:
+        writer.write_batch(pa.record_batch(
+            [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema,
+        ))
+        for values in columns:
+            values.clear()
+
+
+def export_orders(directory=None, fmt=None, chunk_rows: int = CHUNK_ROWS) -> dict:
+    """
+    Export the orders created since the watermark. Returns {"rows", "files"
+    (paths relative to the export directory), "watermark"}.
+    """
+    fmt = fmt or settings.ORDER_EXPORT_FORMAT
+    if fmt not in FORMATS:
+        raise ExportError(f"Unknown export format {fmt!r}; use one of {', '.join(FORMATS)}.")
+    if not cache.add(LOCK_KEY, 1, timeout=LOCK_TIMEOUT):
+        raise ExportError("An order export is already running.")
+    try:
+        with db_routing.replica(), db_routing.within_lag(settings.ORDER_EXPORT_LAG_SECONDS):
+            return _export(_directory(directory), fmt, chunk_rows)
+    finally:
+        cache.delete(LOCK_KEY)
+
+
+def _export(directory, fmt, chunk_rows):
+    directory.mkdir(parents=True, exist_ok=True)
+    for leftover in directory.glob("month=*/*.tmp"):  # from a run that died
+        leftover.unlink()
+
+    orders = Order.objects.filter(
+        created_at__lt=timezone.now() - timedelta(seconds=settings.ORDER_EXPORT_LAG_SECONDS),
+    )
+    mark = read_watermark(directory)
+    if mark is not None:
+        after = datetime.fromisoformat(mark["created_at"])
+        orders = orders.filter(Q(created_at__gt=after) | Q(created_at=after, id__gt=mark["id"]))
+    rows = orders.order_by("created_at", "id").values_list(*COLUMNS).iterator(chunk_size=chunk_rows)
+
+    schema = _schema()
+    suffix = FORMATS[fmt][0]
+    columns = [[] for _ in COLUMNS]
+    written = []  # (tmp, final)
+    writer = month = last = None
+    total = 0
+    try:
+        for row in rows:
+            created_at = row[1].astimezone(dt_timezone.utc)
+            if created_at.strftime("%Y-%m") != month:
+                if writer is not None:
+                    _flush(writer, columns, schema)
+                    writer.close()
+                month = created_at.strftime("%Y-%m")
+                final = directory / f"month={month}" / f"orders-{created_at:%Y%m%dT%H%M%S}-{row[0]}{suffix}"
+                final.parent.mkdir(exist_ok=True)
+                tmp = final.with_name(final.name + ".tmp")
+                written.append((tmp, final))
+                writer = _open(tmp, fmt, schema)
+            for values, value in zip(columns, row):
+                values.append(value)
+            if len(columns[0]) >= chunk_rows:
+                _flush(writer, columns, schema)
+            total += 1
+            last = row
+        if writer is not None:
+            _flush(writer, columns, schema)
+            writer.close()
+            writer = None
+    except BaseException:
+        if writer is not None:
+            writer.close()
+        for tmp, _ in written:
+            tmp.unlink(missing_ok=True)
+        raise
+
+    for tmp, final in written:
+        os.replace(tmp, final)
+    if last is not None:
+        _write_watermark(directory, last[1], last[0])
+    return {
+        "rows": total,
+        "files": [final.relative_to(directory).as_posix() for _, final in written],
+        "watermark": read_watermark(directory),
+    }
+
+
+def list_files(directory=None) -> list:
+    """Exported files, oldest first: [{"path", "month", "bytes"}]."""
+    directory = _directory(directory)
+    files = []
+    for path in sorted(directory.glob("month=*/orders-*")):
+        relative = path.relative_to(directory).as_posix()
+        if FILE_RE.match(relative):
+            files.append({"path": relative, "month": path.parent.name[len("month="):], "bytes": path.stat().st_size})
+    return files
+
+
+def resolve(relative: str, directory=None):
+    """(path, content type) for an exported file's relative path, or None. Nothing outside the export files."""
+    match = FILE_RE.match(relative)
+    if match is None:
+        return None
+    path = _directory(directory) / relative
+    if not path.is_file():
+        return None
+    return path, FORMATS[match.group(1)][1]
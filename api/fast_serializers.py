@@ -0,0 +1,172 @@
+"""
+Fast path for list responses of flat ModelSerializers.
+
+row_encoder() reads a serializer's fields once and maps each to a model
+column. Rows then come from values_list() and become the dicts the
+serializer would have built: int / str / bool / FK id columns are copied
+as is, and other values (dates, decimals) go through that serializer
+field's own to_representation(). No model instances or per-row field
+objects are created, and there is no ReturnList.
+
+The two converters that dominate list payloads, DateTimeField and
+DecimalField, are inlined for the common case (aware datetimes, values
+already at the field's decimal places; with orjson, UTC datetimes are
+left for orjson to format). Anything else falls back to the field.
+
+The result is encoded with orjson when it is installed, otherwise with
+the json.dumps settings DRF's JSONRenderer uses. Either way the bytes
+match what JSONRenderer produces for the serializer's .data.
+"""
+import functools
+import json
+from datetime import timedelta
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+from . import instrumentation
+
+try:
+    import orjson
+except ImportError:  # optional: the stdlib encoder gives the same bytes, slower
+    orjson = None
+
+PASSTHROUGH_FIELDS = (serializers.IntegerField, serializers.CharField, serializers.BooleanField)
+ZERO = timedelta(0)
+CONVERTED_FIELDS = (
+    serializers.DateTimeField,
+    serializers.DateField,
+    serializers.TimeField,
+    serializers.DecimalField,
+    serializers.UUIDField,
+)
+
+
+def dumps(data) -> bytes:
+    if orjson is not None:
+        out = orjson.dumps(data, option=orjson.OPT_UTC_Z)
+    else:
+        out = json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+    # JSONRenderer escapes U+2028 / U+2029 for embedding in JavaScript
+    if b"\xe2\x80\xa8" in out or b"\xe2\x80\xa9" in out:
+        out = out.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+    return out
+
+
+def _datetime_converter(field):
+    # DateTimeField.to_representation() minus the per-value settings and
+    # current-timezone lookups; resolved once per encode() call
+    if getattr(field, "format", api_settings.DATETIME_FORMAT).lower() != ISO_8601:
+        return field.to_representation
+    tz = field.timezone if hasattr(field, "timezone") else field.default_timezone()
+    if tz is None:
+        return field.to_representation
+
+    if orjson is not None and tz.utcoffset(None) == ZERO:
+        # orjson (OPT_UTC_Z) writes a UTC datetime exactly as isoformat() + "Z"
+        def convert(value):
+            if value.tzinfo is not None and value.utcoffset() == ZERO:
+                return value
+            return field.to_representation(value)
+        return convert
+
+    def convert(value):
+        if value.tzinfo is None:
+            return field.to_representation(value)
+        value = value.astimezone(tz).isoformat()
+        return value[:-6] + "Z" if value.endswith("+00:00") else value
+    return convert
+
+
+def _decimal_converter(field):
+    coerce_to_string = getattr(field, "coerce_to_string", api_settings.COERCE_DECIMAL_TO_STRING)
+    if not coerce_to_string or field.localize or field.normalize_output or not field.decimal_places:
+        return field.to_representation
+    places = field.decimal_places
+
+    def convert(value):
+        # a value already at the field's scale needs no quantize(), and str()
+        # then matches the fixed-point format
+        text = str(value)
+        dot = text.find(".")
+        if dot != -1 and len(text) - dot - 1 == places and "E" not in text:
+            return text
+        return field.to_representation(value)
+    return convert
+
+
+def _converter(field):
+    if isinstance(field, serializers.DateTimeField):
+        return _datetime_converter(field)
+    if isinstance(field, serializers.DecimalField):
+        return _decimal_converter(field)
+    return field.to_representation
+
+
+class RowEncoder:
+    def __init__(self, names, columns, converters):
+        self.names = tuple(names)
+        self.columns = tuple(columns)
+        self.converters = tuple(converters)  # (index, serializer field)
+
+    def to_dicts(self, rows):
+        # rows may carry extra trailing columns (e.g. a pagination key); zip drops them
+        names = self.names
+        if not self.converters:
+            return [dict(zip(names, row)) for row in rows]
+        converters = [(index, _converter(field)) for index, field in self.converters]
+        out = []
+        for row in rows:
+            values = list(row)
+            for index, convert in converters:
+                if values[index] is not None:
+                    values[index] = convert(values[index])
+            out.append(dict(zip(names, values)))
+        return out
+
+    def encode(self, rows) -> bytes:
+        """JSON array, as JSONRenderer would render serializer(rows, many=True).data."""
+        with instrumentation.serializing():
+            return dumps(self.to_dicts(rows))
+
+    def encode_lines(self, rows) -> bytes:
+        """NDJSON: one object per line."""
+        with instrumentation.serializing():
+            return b"".join(dumps(row) + b"\n" for row in self.to_dicts(rows))
+
+
+@functools.cache
+def row_encoder(serializer_class):
+    """
+    RowEncoder for `serializer_class`, or None when it cannot take the fast
+    path (nested or computed fields, custom to_representation(), or
+    non-default DRF JSON settings); callers then use the serializer.
+    """
+    if not (api_settings.COMPACT_JSON and api_settings.UNICODE_JSON and api_settings.STRICT_JSON):
+        return None
+    model = getattr(getattr(serializer_class, "Meta", None), "model", None)
+    if model is None or serializer_class.to_representation is not serializers.Serializer.to_representation:
+        return None
+
+    names, columns, converters = [], [], []
+    for field in serializer_class().fields.values():
+        if field.write_only:
+            continue
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            return None
+        if not model_field.concrete or model_field.many_to_many:
+            return None
+
+        if isinstance(field, serializers.PrimaryKeyRelatedField):
+            if field.pk_field is not None:
+                return None
+        elif isinstance(field, CONVERTED_FIELDS):
+            converters.append((len(names), field))
+        elif not isinstance(field, PASSTHROUGH_FIELDS):
+            return None
+        names.append(field.field_name)
+        columns.append(model_field.attname)
+    return RowEncoder(names, columns, converters)
@@ -0,0 +1,126 @@
+"""
+Query-string filters for order and customer lists.
+
+Orders: GET /api/orders/, /api/restaurants/<pk>/orders/ and
+/api/customers/<pk>/orders/.
+
+    restaurant, customer             ids
+    created_after, created_before    ISO date or datetime; [after, before)
+    min_total, max_total             inclusive
+    ordering                         created_at, -created_at, total_amount, -total_amount
+
+Every accepted combination is served by an index on Order (see Order.Meta):
+
+    customer [...]                     (customer, created_at, id) INCLUDE (restaurant, total_amount)
+    restaurant [...]                   (restaurant, created_at, id) INCLUDE (customer, total_amount)
+    restaurant, ordering=total_amount  (restaurant, total_amount, id) INCLUDE (customer, created_at)
+    customer, ordering=total_amount    (customer, total_amount, id) INCLUDE (restaurant, created_at)
+    neither                            (created_at, id)
+
+The INCLUDE columns make the list pages index-only scans and let total
+ranges be checked inside the index. Ordering by total_amount needs a
+restaurant or customer, since no index orders the whole table by amount.
+
+Customers: GET /api/customers/ and /api/restaurants/<pk>/customers/.
+
+    restaurant                       id
+    ordering                         -lifetime_spend, -spend_7d, -spend_30d, -spend_90d
+
+Spend orderings read CustomerSpend (api/customer_spend.py) through its
+(restaurant, spend DESC, customer) indexes, so they too need a restaurant;
+customers without orders there are not listed.
+"""
+from decimal import Decimal, InvalidOperation
+
+from .timeseries import parse_bound
+
+ORDERINGS = {
+    "created_at": ("created_at", "id"),
+    "-created_at": ("-created_at", "-id"),
+    "total_amount": ("total_amount", "id"),
+    "-total_amount": ("-total_amount", "-id"),
+}
+
+SPEND_ORDERINGS = {
+    f"-{column}": (f"-{column}", "customer_id")
+    for column in ("lifetime_spend", "spend_7d", "spend_30d", "spend_90d")
+}
+
+
+class FilterError(ValueError):
+    pass
+
+
+def _int_param(params, name):
+    try:
+        value = int(params[name])
+        if value <= 0:
+            raise ValueError()
+    except ValueError:
+        raise FilterError(f"{name} must be a positive integer.")
+    return value
+
+
+def _amount_param(params, name):
+    try:
+        value = Decimal(params[name])
+        if not value.is_finite():
+            raise InvalidOperation()
+    except InvalidOperation:
+        raise FilterError(f"{name} must be a decimal number.")
+    return value
+
+
+def filter_orders(queryset, params, restaurant_id=None, customer_id=None):
+    """
+    Apply the query-string filters to an Order queryset; nested routes pass
+    their parent as restaurant_id / customer_id. Returns (queryset, ordering),
+    ordering being None when the client asked for none. Raises FilterError.
+    """
+    if restaurant_id is None and "restaurant" in params:
+        restaurant_id = _int_param(params, "restaurant")
+    if customer_id is None and "customer" in params:
+        customer_id = _int_param(params, "customer")
+    if restaurant_id is not None:
+        queryset = queryset.filter(restaurant_id=restaurant_id)
+    if customer_id is not None:
+        queryset = queryset.filter(customer_id=customer_id)
+
+    for name, lookup in (("created_after", "created_at__gte"), ("created_before", "created_at__lt")):
+        if name in params:
+            try:
+                queryset = queryset.filter(**{lookup: parse_bound(params[name], name)})
+            except ValueError as exc:
+                raise FilterError(str(exc))
+
+    for name, lookup in (("min_total", "total_amount__gte"), ("max_total", "total_amount__lte")):
+        if name in params:
+            queryset = queryset.filter(**{lookup: _amount_param(params, name)})
+
+    ordering = None
+    if "ordering" in params:
+        ordering = ORDERINGS.get(params["ordering"])
+        if ordering is None:
+            raise FilterError(f"ordering must be one of {', '.join(ORDERINGS)}.")
+        if ordering[0].lstrip("-") == "total_amount" and restaurant_id is None and customer_id is None:
+            raise FilterError("ordering by total_amount needs a restaurant or customer.")
+    return queryset, ordering
+
+
+def filter_customers(params, restaurant_id=None):
+    """
+    Returns (restaurant_id, ordering) for a customer list; ordering is a
+    SPEND_ORDERINGS pair, or None for the plain Customer list. Raises
+    FilterError.
+    """
+    if restaurant_id is None and "restaurant" in params:
+        restaurant_id = _int_param(params, "restaurant")
+
+    ordering = None
+    if "ordering" in params:
+        ordering = SPEND_ORDERINGS.get(params["ordering"])
+        if ordering is None:
+            raise FilterError(f"ordering must be one of {', '.join(SPEND_ORDERINGS)}.")
+        if restaurant_id is None:
+            raise FilterError("ordering by spend needs a restaurant.")
+    return restaurant_id, ordering
@@ -0,0 +1,156 @@
+"""
+Access-frequency tracking and warming for the dashboard cache.
+
+Every dashboard read counts one hit for its (restaurant, days) key. Counts
+are summed in process and added to the HOT_KEY sorted set in one pipeline
+at most every FLUSH_INTERVAL seconds, so reads served by the in-process
+L1 stay free of Redis round trips.
+
+The warm_hot_dashboards beat task takes the top-K keys by score and
+recomputes those whose cache entry is missing or goes stale within
+WARM_AHEAD seconds, grouped by window in batches of compute_dashboards()
+and with at most `concurrency` batches at a time. Each run then multiplies
+every score by DECAY and drops what has faded, so the ranking follows
+recent traffic.
+"""
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.db import connections
+from django_redis import get_redis_connection
+
+from . import async_cache, db_routing, metrics
+from .dashboard import dashboard_cache_key
+from .dashboard_cache import recompute_many
+from .models import Restaurant
+
+HOT_KEY = "dashboard:hot"
+FLUSH_INTERVAL = 10  # seconds between a process's ZINCRBY pipelines
+WARM_INTERVAL = 30  # seconds between warming runs (CELERY_BEAT_SCHEDULE)
+WARM_AHEAD = WARM_INTERVAL + 15  # refresh entries that would go stale before the next run
+DECAY = 0.9  # per run: a score halves in about six and a half runs
+MIN_SCORE = 0.5
+MAX_TRACKED = 10000
+TOP_K = 500
+BATCH_SIZE = 100
+CONCURRENCY = 2
+
+warmed_total = metrics.counter(
+    "dashboard_warm_keys_total",
+    "Dashboard cache keys recomputed by the access-frequency warmer.",
+)
+warm_duration = metrics.histogram(
+    "dashboard_warm_duration_seconds",
+    "Time spent per warm_hot_dashboards run.",
+)
+
+_counts = Counter()
+_flushed_at = time.monotonic()
+_lock = threading.Lock()
+
+
+def _member(restaurant_id: int, days: int) -> str:
+    return f"{restaurant_id}:{days}"
+
+
+def record_access(restaurant_ids, days: int) -> bool:
+    """Count reads of these dashboards; True when this process's counts are due to be flushed."""
+    with _lock:
+        for restaurant_id in restaurant_ids:
+            _counts[_member(restaurant_id, days)] += 1
+        return time.monotonic() - _flushed_at >= FLUSH_INTERVAL
+
+
+def _take() -> Counter:
+    global _counts, _flushed_at
+    with _lock:
+        counts, _counts = _counts, Counter()
+        _flushed_at = time.monotonic()
+    return counts
+
+
+def flush():
+    counts = _take()
+    if counts:
+        pipe = get_redis_connection("default").pipeline(transaction=False)
+        for member, count in counts.items():
+            pipe.zincrby(HOT_KEY, count, member)
+        pipe.execute()
+
+
+async def aflush():
+    counts = _take()
+    if counts:
+        pipe = async_cache.client().pipeline(transaction=False)
+        for member, count in counts.items():
+            pipe.zincrby(HOT_KEY, count, member)
+        await pipe.execute()
+
+
+def hottest(k: int) -> list:
+    """[(restaurant_id, days, score)] for the k most read dashboards."""
+    rows = get_redis_connection("default").zrevrange(HOT_KEY, 0, k - 1, withscores=True)
+    out = []
+    for member, score in rows:
+        restaurant_id, days = member.decode().split(":")
+        out.append((int(restaurant_id), int(days), score))
+    return out
+
+
+def decay():
+    pipe = get_redis_connection("default").pipeline()
+    pipe.zunionstore(HOT_KEY, {HOT_KEY: DECAY})
+    pipe.zremrangebyscore(HOT_KEY, "-inf", f"({MIN_SCORE}")
+    pipe.zremrangebyrank(HOT_KEY, 0, -MAX_TRACKED - 1)
+    pipe.execute()
+
+
+def _due(keys) -> list:
+    # hot (restaurant_id, days) keys whose entry is missing or goes stale before the next run
+    names = {key: dashboard_cache_key(*key) for key in keys}
+    entries = cache.get_many(list(names.values()))
+    deadline = time.time() + WARM_AHEAD
+    return [key for key, name in names.items() if name not in entries or entries[name]["fresh_until"] < deadline]
+
+
+def _warm_batch(restaurant_ids, days) -> int:
+    with db_routing.replica():
+        restaurants = list(Restaurant.objects.filter(id__in=restaurant_ids).only("id", "name"))
+        return recompute_many(restaurants, [days])
+
+
+def _warm_batch_in_pool(batch) -> int:
+    try:
+        return _warm_batch(*batch)
+    finally:
+        connections.close_all()  # the pool thread's own connections
+
+
+def warm(top_k=TOP_K, batch_size=BATCH_SIZE, concurrency=CONCURRENCY) -> dict:
+    """Recompute the due entries among the top_k hottest dashboards, then decay the scores."""
+    started = time.monotonic()
+    hot = hottest(top_k)
+    due = _due([(restaurant_id, days) for restaurant_id, days, _ in hot])
+
+    by_days = {}
+    for restaurant_id, days in due:
+        by_days.setdefault(days, []).append(restaurant_id)
+    batches = [
+        (ids[i:i + batch_size], days)
+        for days, ids in sorted(by_days.items())
+        for i in range(0, len(ids), batch_size)
+    ]
+    if concurrency > 1 and len(batches) > 1:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            warmed = sum(pool.map(_warm_batch_in_pool, batches))
+    else:
+        warmed = sum(_warm_batch(*batch) for batch in batches)
+    decay()
+
+    seconds = time.monotonic() - started
+    warmed_total.inc(warmed)
+    warm_duration.observe(seconds)
+    return {"hot": len(hot), "due": len(due), "keys_warmed": warmed, "batches": len(batches), "seconds": round(seconds, 3)}
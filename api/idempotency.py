@@ -0,0 +1,152 @@
+"""
+Idempotency-Key support for unsafe requests (@idempotent, on order POSTs).
+
+Clients that retry on timeouts send the same Idempotency-Key header with
+every attempt. The first attempt runs the view and its rendered response
+is kept in Redis for IDEMPOTENCY_KEY_TTL seconds; a retry gets that
+response back (with an Idempotent-Replayed header) without running the
+view, so no serializer, no SQL and no duplicate Order.
+
+- in flight: a lock per key makes concurrent duplicates poll for the
+  first attempt's response instead of running the view again. Past
+  LOCK_WAIT they get a 409 with Retry-After. The lock holds a token of the
+  attempt that took it and only that attempt releases it; it expires after
+  IDEMPOTENCY_LOCK_TIMEOUT, which must outlast any request, so a retry
+  never runs the view while the first attempt still can.
+- a key reused with a different body (or on another path) gets a 422.
+- 5xx responses are not stored, so the next retry runs the view again.
+
+Requests without the header are not affected.
+"""
+import hashlib
+import time
+import uuid
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse, HttpResponse
+from django_redis import get_redis_connection
+
+from . import metrics
+from .db_routing import SAFE_METHODS
+
+HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+LOCK_WAIT = 5.0
+LOCK_POLL_INTERVAL = 0.05
+
+# delete the lock only if it still holds this attempt's token
+_RELEASE = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+requests_total = metrics.counter(
+    "idempotency_requests_total",
+    "Requests with an Idempotency-Key by result (executed, replayed, conflict, mismatch).",
+    ("result",),
+)
+
+
+def response_key(idempotency_key: str) -> str:
+    return f"idempotency:{hashlib.sha256(idempotency_key.encode()).hexdigest()}"
+
+
+def lock_key(idempotency_key: str) -> str:
+    return f"{response_key(idempotency_key)}:lock"
+
+
+def _redis():
+    return get_redis_connection("default")
+
+
+def _acquire(idempotency_key: str):
+    """This attempt's token if it took the lock, else None."""
+    token = uuid.uuid4().hex
+    if _redis().set(lock_key(idempotency_key), token, nx=True, ex=settings.IDEMPOTENCY_LOCK_TIMEOUT):
+        return token
+    return None
+
+
+def _release(idempotency_key: str, token: str):
+    _redis().register_script(_RELEASE)(keys=[lock_key(idempotency_key)], args=[token])
+
+
+def _fingerprint(request) -> str:
+    # what the key promises to repeat: the same call with the same body
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (request.method, request.path, request.content_type or ""):
+        digest.update(part.encode())
+        digest.update(b"\0")
+    digest.update(request.body)
+    return digest.hexdigest()
+
+
+def _error(detail, status, **headers):
+    response = JsonResponse({"detail": detail}, status=status)
+    for name, value in headers.items():
+        response[name] = value
+    return response
+
+
+def _replay(entry, fingerprint):
+    if entry["fingerprint"] != fingerprint:
+        requests_total.inc(result="mismatch")
+        return _error(f"This {HEADER} was already used with a different request.", 422)
+    requests_total.inc(result="replayed")
+    response = HttpResponse(entry["body"], status=entry["status"], content_type=entry["content_type"])
+    response[REPLAYED_HEADER] = "true"
+    return response
+
+
+def _execute(view, request, args, kwargs, key, fingerprint, token):
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, "render") and not response.is_rendered:
+            response.render()
+        if response.status_code < 500 and not response.streaming:
+            cache.set(response_key(key), {
+                "fingerprint": fingerprint,
+                "status": response.status_code,
+                "content_type": response["Content-Type"],
+                "body": response.content,
+            }, timeout=settings.IDEMPOTENCY_KEY_TTL)
+        requests_total.inc(result="executed")
+        return response
+    finally:
+        _release(key, token)
+
+
+def idempotent(view):
+    """Run a view once per Idempotency-Key and replay its response to retries."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None or request.method in SAFE_METHODS:
+            return view(request, *args, **kwargs)
+        if not 0 < len(key) <= MAX_KEY_LENGTH or not key.isascii() or not key.isprintable():
+            return _error(f"{HEADER} must be 1 to {MAX_KEY_LENGTH} printable ASCII characters.", 400)
+        fingerprint = _fingerprint(request)
+
+        deadline = time.monotonic() + LOCK_WAIT
+        while True:
+            entry = cache.get(response_key(key))
+            if entry is not None:
+                return _replay(entry, fingerprint)
+            token = _acquire(key)
+            if token is not None:
+                # the attempt holding the lock may have finished in between
+                entry = cache.get(response_key(key))
+                if entry is not None:
+                    _release(key, token)
+                    return _replay(entry, fingerprint)
+                return _execute(view, request, args, kwargs, key, fingerprint, token)
+            if time.monotonic() >= deadline:
+                requests_total.inc(result="conflict")
+                return _error(f"A request with this {HEADER} is still in progress.", 409, **{"Retry-After": "1"})
+            time.sleep(LOCK_POLL_INTERVAL)
+    return wrapper
@@ -0,0 +1,110 @@
+"""
+Bulk order ingest for POS integrations (POST /api/orders/bulk/).
+
+A batch is validated as a whole: field validation through a single
+OrderBulkRowSerializer instance, FK existence through two set-based
+lookups. Valid rows are inserted with bulk_create, or COPY for large
+batches on psycopg 3, and the order write hook (rollups + live dashboard
+counters) runs once per batch.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+
+from . import rollups
+from .models import Restaurant, Customer, Order
+from .serializers import OrderBulkRowSerializer
+from .signals import record_order_deltas
+
+MAX_BATCH_ROWS = 10000
+COPY_THRESHOLD = 2000
+INSERT_BATCH_SIZE = 1000
+
+def _use_copy(count):
+    if count < COPY_THRESHOLD or connection.vendor != "postgresql":
+        return False
+    from django.db.backends.postgresql.psycopg_any import is_psycopg3
+    return is_psycopg3
+
+
+def _copy_orders(rows, created_at):
+    columns = ("restaurant_id", "customer_id", "total_amount", "created_at")
+    sql = f"COPY {Order._meta.db_table} ({', '.join(columns)}) FROM STDIN"
+    with connection.cursor() as cursor:
+        with cursor.cursor.copy(sql) as copy:
+            for row in rows:
+                copy.write_row((row["restaurant"], row["customer"], row["total_amount"], created_at))
+
+
+def _bulk_create_orders(rows):
+    return Order.objects.bulk_create(
+        [
+            Order(restaurant_id=row["restaurant"], customer_id=row["customer"], total_amount=row["total_amount"])
+            for row in rows
+        ],
+        batch_size=INSERT_BATCH_SIZE,
+    )
+
+
+def ingest_orders(payload):
+    """
+    Validate and insert a list of order dicts.
+    Returns (created_count, errors) where errors is a list of
+    {"index": i, "errors": {...}} for the rejected rows.
+    """
+    # One serializer instance validates every row (what ListSerializer does
+    # internally), but keeps the good rows when others fail.
+    row_serializer = OrderBulkRowSerializer()
+    errors = []
+    candidates = []
+    rows = []
+    for index, item in enumerate(payload):
+        try:
+            rows.append(row_serializer.run_validation(item))
+        except ValidationError as exc:
+            errors.append({"index": index, "errors": exc.detail})
+        else:
+            candidates.append(index)
+
+    restaurant_ids = {row["restaurant"] for row in rows}
+    customer_ids = {row["customer"] for row in rows}
+    known_restaurants = set(Restaurant.objects.filter(id__in=restaurant_ids).values_list("id", flat=True))
+    known_customers = set(Customer.objects.filter(id__in=customer_ids).values_list("id", flat=True))
+
+    valid_rows = []
+    for index, row in zip(candidates, rows):
+        row_errors = {}
+        if row["restaurant"] not in known_restaurants:
+            row_errors["restaurant"] = [f'Invalid pk "{row["restaurant"]}" - object does not exist.']
+        if row["customer"] not in known_customers:
+            row_errors["customer"] = [f'Invalid pk "{row["customer"]}" - object does not exist.']
+        if row_errors:
+            errors.append({"index": index, "errors": row_errors})
+        else:
+            valid_rows.append(row)
+
+    errors.sort(key=lambda e: e["index"])
+    if not valid_rows:
+        return 0, errors
+
+    with transaction.atomic():
+        if _use_copy(len(valid_rows)):
+            created_at = timezone.now()
+            _copy_orders(valid_rows, created_at)
+            created = [(row["restaurant"], row["customer"], row["total_amount"], created_at) for row in valid_rows]
+        else:
+            orders = _bulk_create_orders(valid_rows)
+            created = [(o.restaurant_id, o.customer_id, o.total_amount, o.created_at) for o in orders]
+
+        # bulk inserts skip the Order signals, so feed the write hook here
+        deltas = defaultdict(lambda: (0, Decimal("0")))
+        for restaurant_id, customer_id, total_amount, created_at in created:
+            key = (restaurant_id, customer_id, rollups.order_day(created_at))
+            count, amount = deltas[key]
+            deltas[key] = (count + 1, amount + total_amount)
+        record_order_deltas(dict(deltas), {(restaurant_id, created_at) for restaurant_id, _, _, created_at in created})
+
+    return len(valid_rows), errors
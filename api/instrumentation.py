@@ -0,0 +1,234 @@
+"""
+Per-request cost accounting: SQL queries and time, cache hits / misses /
+bytes, Redis round trips and time, serializer time.
+
+RequestMetricsMiddleware (api/middleware.py) opens a RequestStats for a
+sampled request; the hooks below add to it:
+
+- DB: a connection.execute_wrapper added to every connection as it opens
+  (ApiConfig.ready() imports this module before any connection exists).
+- Cache: InstrumentedCacheClient, the django-redis CLIENT_CLASS.
+- Redis: InstrumentedRedis, the REDIS_CLIENT_CLASS, so round trips made
+  through get_redis_connection() (api/live_dashboard.py) count too;
+  InstrumentedAsyncRedis does the same for api/async_cache.py.
+- Serializers: TimedSerializerMixin / TimedListSerializer, and
+  serializing() around the row encoder in api/fast_serializers.py.
+
+The stats live in a context variable, which asgiref copies into the
+threads that run sync code for async views, so ORM queries made through
+the async ORM are counted as well. When a request is not sampled the hooks
+only find no RequestStats in the context variable and do nothing else.
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django_redis.client import DefaultClient
+from redis import Redis
+from redis.asyncio import Redis as AsyncRedis
+from redis.asyncio.client import Pipeline as AsyncPipeline
+from redis.client import Pipeline
+from rest_framework import serializers
+
+_current = contextvars.ContextVar("request_stats", default=None)
+
+
+class RequestStats:
+    __slots__ = (
+        "queries", "db_time", "cache_hits", "cache_misses", "cache_bytes_read",
+        "cache_bytes_written", "redis_commands", "redis_time", "serialize_time",
+    )
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_bytes_read = 0
+        self.cache_bytes_written = 0
+        self.redis_commands = 0
+        self.redis_time = 0.0
+        self.serialize_time = 0.0
+
+    def server_timing(self, total: float) -> str:
+        """Server-Timing header value; durations in milliseconds."""
+        return ", ".join([
+            f'db;desc="{self.queries} queries";dur={self.db_time * 1000:.2f}',
+            f'cache;desc="{self.cache_hits} hits, {self.cache_misses} misses, '
+            f'{self.cache_bytes_read} B read, {self.cache_bytes_written} B written"',
+            f'redis;desc="{self.redis_commands} round trips";dur={self.redis_time * 1000:.2f}',
+            f"serialize;dur={self.serialize_time * 1000:.2f}",
+            f"total;dur={total * 1000:.2f}",
+        ])
+
+
+def current():
+    return _current.get()
+
+
+def record_cache(hits=0, misses=0):
+    stats = _current.get()
+    if stats is not None:
+        stats.cache_hits += hits
+        stats.cache_misses += misses
+
+
+def _db_wrapper(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.db_time += time.perf_counter() - started
+
+
+@receiver(connection_created)
+def install_db_wrapper(sender, connection, **kwargs):
+    # fires on every reconnect of the same DatabaseWrapper
+    if _db_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_db_wrapper)
+
+
+@contextmanager
+def collect():
+    """Record everything the current request does into a fresh RequestStats."""
+    stats = RequestStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def serializing():
+    stats = _current.get()
+    if stats is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.serialize_time += time.perf_counter() - started
+
+
+class InstrumentedCacheClient(DefaultClient):
+    """django-redis client counting hits, misses and payload bytes."""
+
+    def get(self, key, default=None, version=None, client=None):
+        stats = _current.get()
+        if stats is None:
+            return super().get(key, default=default, version=version, client=client)
+        missing = object()
+        value = super().get(key, default=missing, version=version, client=client)
+        if value is missing:
+            stats.cache_misses += 1
+            return default
+        stats.cache_hits += 1
+        return value
+
+    def get_many(self, keys, version=None, client=None):
+        found = super().get_many(keys, version=version, client=client)
+        stats = _current.get()
+        if stats is not None:
+            stats.cache_hits += len(found)
+            stats.cache_misses += len(keys) - len(found)
+        return found
+
+    def decode(self, value):
+        stats = _current.get()
+        if stats is not None and isinstance(value, bytes):
+            stats.cache_bytes_read += len(value)
+        return super().decode(value)
+
+    def encode(self, value, *, allow_int=True):
+        encoded = super().encode(value, allow_int=allow_int)
+        stats = _current.get()
+        if stats is not None and isinstance(encoded, bytes):
+            stats.cache_bytes_written += len(encoded)
+        return encoded
+
+
+class InstrumentedPipeline(Pipeline):
+    def execute(self, raise_on_error=True):
+        stats = _current.get()
+        if stats is None:
+            return super().execute(raise_on_error)
+        started = time.perf_counter()
+        try:
+            return super().execute(raise_on_error)
+        finally:
+            stats.redis_commands += 1  # one round trip for the whole pipeline
+            stats.redis_time += time.perf_counter() - started
+
+
+class InstrumentedRedis(Redis):
+    """redis-py client counting round trips and time spent in them."""
+
+    def execute_command(self, *args, **options):
+        stats = _current.get()
+        if stats is None:
+            return super().execute_command(*args, **options)
+        started = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            stats.redis_commands += 1
+            stats.redis_time += time.perf_counter() - started
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+class InstrumentedAsyncPipeline(AsyncPipeline):
+    async def execute(self, raise_on_error=True):
+        stats = _current.get()
+        if stats is None:
+            return await super().execute(raise_on_error)
+        started = time.perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        finally:
+            stats.redis_commands += 1
+            stats.redis_time += time.perf_counter() - started
+
+
+class InstrumentedAsyncRedis(AsyncRedis):
+    async def execute_command(self, *args, **options):
+        stats = _current.get()
+        if stats is None:
+            return await super().execute_command(*args, **options)
+        started = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            stats.redis_commands += 1
+            stats.redis_time += time.perf_counter() - started
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        return InstrumentedAsyncPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+class TimedSerializerMixin:
+    """Adds the time spent building `.data` to the request's serializer time."""
+
+    @property
+    def data(self):
+        stats = _current.get()
+        if stats is None:
+            return super().data
+        started = time.perf_counter()
+        try:
+            return super().data
+        finally:
+            stats.serialize_time += time.perf_counter() - started
+
+
+class TimedListSerializer(TimedSerializerMixin, serializers.ListSerializer):
+    pass
@@ -0,0 +1,283 @@
+"""
+Redis-held dashboard counters, updated in place on every Order write.
+
+Per (restaurant, day):
+    dash:live:{rid}:{day}:totals   HASH  orders, revenue (cents), version
+    dash:live:{rid}:{day}:spend    ZSET  customer_id -> spend (cents)
+    dash:live:{rid}:{day}:orders   ZSET  customer_id -> order count
+Per restaurant:
+    dash:live:{rid}:emails         HASH  customer_id -> email
+
+Days are seeded from the daily rollups the first time they are read and
+expire after a while (sooner for today). Deltas for days that are not
+seeded are skipped: the next read seeds them from the rollups, which
+already include the write (read from the primary, so a lagging replica
+cannot leave it out).
+
+A delta is applied after its transaction commits, so a seed can also read
+a write whose delta is still on its way. Each delta carries the version
+rollups.apply_deltas() gave its RestaurantDailyStats row and the seed keeps
+the row's version, so deltas at or below it are skipped instead of being
+counted twice.
+
+A dashboard read is then a few Redis pipelines, whatever the window size,
+from sync views (read_dashboard) or async ones (aread_dashboard).
+"""
+import uuid
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.postgres.expressions import ArraySubquery
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import CharField, OuterRef, QuerySet
+from django.db.models.functions import Cast, JSONObject
+from django.utils import timezone
+from django_redis import get_redis_connection
+
+from . import async_cache, rollups
+from .dashboard import window_start, TOP_CUSTOMERS
+from .models import Customer, RestaurantDailyStats, CustomerDailySpend
+
+TODAY_TTL = 600  # seconds; today's counters are re-seeded this often
+PAST_TTL = 86400
+UNION_TTL = 10  # scratch keys for ZUNIONSTORE
+
+_APPLY_DELTA = """
+local seeded = redis.call('HGET', KEYS[1], 'version')
+if not seeded or tonumber(ARGV[4]) <= tonumber(seeded) then
+    return 0
+end
+redis.call('HINCRBY', KEYS[1], 'orders', ARGV[2])
+redis.call('HINCRBY', KEYS[1], 'revenue', ARGV[3])
+local orders = tonumber(redis.call('ZINCRBY', KEYS[3], ARGV[2], ARGV[1]))
+redis.call('ZINCRBY', KEYS[2], ARGV[3], ARGV[1])
+if orders <= 0 then
+    redis.call('ZREM', KEYS[2], ARGV[1])
+    redis.call('ZREM', KEYS[3], ARGV[1])
+end
+-- a day seeded without spend rows has no ZSETs until ZINCRBY creates
+-- them, without a TTL: they expire with the totals
+local ttl = redis.call('PTTL', KEYS[1])
+if ttl > 0 then
+    redis.call('PEXPIRE', KEYS[2], ttl)
+    redis.call('PEXPIRE', KEYS[3], ttl)
+end
+return 1
+"""
+
+
+def _redis():
+    return get_redis_connection("default")
+
+
+def _day_keys(restaurant_id, day):
+    prefix = f"dash:live:{restaurant_id}:{day.isoformat()}"
+    return f"{prefix}:totals", f"{prefix}:spend", f"{prefix}:orders"
+
+
+def _emails_key(restaurant_id):
+    return f"dash:live:{restaurant_id}:emails"
+
+
+def _cents(amount) -> int:
+    return int(Decimal(amount) * 100)
+
+
+def apply_deltas(deltas, versions):
+    """
+    deltas: {(restaurant_id, customer_id, day): (orders_count, amount)},
+    the same shape rollups.apply_deltas() takes, and versions the
+    {(restaurant_id, day): version} it returned for them.
+    """
+    if not deltas:
+        return
+    conn = _redis()
+    script = conn.register_script(_APPLY_DELTA)
+    pipe = conn.pipeline(transaction=False)
+    for (restaurant_id, customer_id, day), (count, amount) in deltas.items():
+        version = versions.get((restaurant_id, day))
+        if version is None:  # no rollup row was written, so nothing to count
+            continue
+        script(keys=_day_keys(restaurant_id, day), args=[customer_id, count, _cents(amount), version], client=pipe)
+    pipe.execute()
+
+
+def apply_deltas_on_commit(deltas, versions):
+    # Only publish what actually committed; robust so a Redis outage
+    # never fails an order write after the fact.
+    transaction.on_commit(lambda: apply_deltas(deltas, versions), robust=True)
+
+
+def forget_days(pairs):
+    """Drop counters for (restaurant_id, day) pairs so they re-seed from the rollups."""
+    keys = [key for restaurant_id, day in pairs for key in _day_keys(restaurant_id, day)]
+    if keys:
+        _redis().delete(*keys)
+
+
+def set_email(restaurant_id, customer_id, email):
+    conn = _redis()
+    if conn.exists(_emails_key(restaurant_id)):
+        conn.hset(_emails_key(restaurant_id), customer_id, email)
+
+
+def _queue_seed(pipe, restaurant_id, days, stats_rows):
+    stats = {row["day"]: row for row in stats_rows}
+    today = timezone.localdate()
+    for day in days:
+        totals_key, spend_key, orders_key = _day_keys(restaurant_id, day)
+        ttl = TODAY_TTL if day >= today else PAST_TTL
+        row = stats.get(day, {})
+        pipe.delete(totals_key, spend_key, orders_key)
+        pipe.hset(totals_key, mapping={
+            "orders": row.get("orders_count", 0),
+            "revenue": _cents(row.get("revenue_total", 0)),
+            "version": row.get("version", 0),
+        })
+        pipe.expire(totals_key, ttl)
+        rows = row.get("spend") or []
+        if rows:
+            pipe.zadd(spend_key, {str(r["customer_id"]): _cents(r["total_spend"]) for r in rows})
+            pipe.zadd(orders_key, {str(r["customer_id"]): r["orders_count"] for r in rows})
+            pipe.expire(spend_key, ttl)
+            pipe.expire(orders_key, ttl)
+
+
+def _read_steps(conn, restaurant, days: int):
+    """
+    The dashboard read as a generator: it yields Redis pipelines to execute
+    and querysets to evaluate, is sent their results, and returns the
+    payload. _run() drives it with the sync clients, _arun() with
+    redis.asyncio and the async ORM, so both paths share one implementation.
+    """
+    start_day = window_start(days)
+    window = [start_day + timedelta(days=i) for i in range(days)]
+
+    pipe = conn.pipeline(transaction=False)
+    for day in window:
+        pipe.exists(_day_keys(restaurant.id, day)[0])
+    seeded = yield pipe
+    missing = [day for day, exists in zip(window, seeded) if not exists]
+    if missing:
+        # from the primary, whatever the caller's routing: deltas for unseeded
+        # days were skipped, so a seed missing a write would keep it missing.
+        # One statement, so the spend rows are as of the version read with them.
+        spend = CustomerDailySpend.objects.filter(
+            restaurant_id=OuterRef("restaurant_id"), day=OuterRef("day"),
+        ).values(row=JSONObject(
+            customer_id="customer_id",
+            orders_count="orders_count",
+            total_spend=Cast("total_spend", CharField()),  # exact, unlike a JSON number
+        ))
+        stats_rows = yield RestaurantDailyStats.objects.using(DEFAULT_DB_ALIAS).filter(
+            restaurant_id=restaurant.id, day__in=missing,
+        ).values("day", "orders_count", "revenue_total", "version", spend=ArraySubquery(spend))
+        pipe = conn.pipeline(transaction=True)
+        _queue_seed(pipe, restaurant.id, missing, stats_rows)
+        yield pipe
+
+    scratch = f"dash:live:{restaurant.id}:union:{uuid.uuid4().hex}"
+    spend_union, orders_union = f"{scratch}:spend", f"{scratch}:orders"
+    keys = [_day_keys(restaurant.id, day) for day in window]
+
+    pipe = conn.pipeline(transaction=False)
+    for totals_key, _, _ in keys:
+        pipe.hmget(totals_key, "orders", "revenue")
+    pipe.zunionstore(spend_union, [k[1] for k in keys])
+    pipe.zunionstore(orders_union, [k[2] for k in keys])
+    pipe.expire(spend_union, UNION_TTL)
+    pipe.expire(orders_union, UNION_TTL)
+    pipe.zrevrange(spend_union, TOP_CUSTOMERS - 1, TOP_CUSTOMERS - 1, withscores=True)
+    results = yield pipe
+
+    totals = results[: len(keys)]
+    unique_customers, _, _, _, cutoff = results[len(keys):]
+    orders_count = sum(int(row[0] or 0) for row in totals)
+    revenue_total = Decimal(sum(int(row[1] or 0) for row in totals)) / 100
+
+    # Everyone tied with the N-th customer, so ties break on customer_id like the SQL path
+    min_score = cutoff[0][1] if cutoff else "-inf"
+    pipe = conn.pipeline(transaction=False)
+    pipe.zrevrangebyscore(spend_union, "+inf", min_score, withscores=True)
+    pipe.delete(spend_union)
+    ranked, _ = yield pipe
+    candidates = sorted(
+        ((int(member), int(score)) for member, score in ranked),
+        key=lambda item: (-item[1], item[0]),
+    )[:TOP_CUSTOMERS]
+
+    customer_ids = [pk for pk, _ in candidates]
+    orders, emails = [], {}
+    pipe = conn.pipeline(transaction=False)
+    if customer_ids:
+        pipe.zmscore(orders_union, customer_ids)
+        pipe.hmget(_emails_key(restaurant.id), customer_ids)
+    pipe.delete(orders_union)
+    results = yield pipe
+    if customer_ids:
+        orders, cached_emails, _ = results
+        emails = dict(zip(customer_ids, cached_emails))
+
+    # email misses come from Postgres once, then stay in the per-restaurant hash
+    unknown = [pk for pk, email in emails.items() if email is None]
+    if unknown:
+        fetched = dict((yield Customer.objects.using(DEFAULT_DB_ALIAS).filter(id__in=unknown).values_list("id", "email")))
+        if fetched:
+            pipe = conn.pipeline(transaction=False)
+            pipe.hset(_emails_key(restaurant.id), mapping=fetched)
+            pipe.expire(_emails_key(restaurant.id), PAST_TTL)
+            yield pipe
+        emails.update(fetched)
+    emails = {pk: email.decode() if isinstance(email, bytes) else email for pk, email in emails.items()}
+
+    avg_order_value = revenue_total / orders_count if orders_count else Decimal("0")
+    return {
+        "restaurant": {"id": restaurant.id, "name": restaurant.name},
+        "window_days": days,
+        "since": rollups.day_start(start_day).isoformat(),
+        "totals": {
+            "orders_count": orders_count,
+            "revenue_total": f"{revenue_total:.2f}",  # Decimal -> string for JSON
+            "avg_order_value": f"{avg_order_value:.2f}",  # Decimal -> string for JSON
+            "unique_customers": unique_customers,
+        },
+        "top_customers": [
+            {
+                "customer_id": pk,
+                "email": emails.get(pk),
+                "total_spend": f"{Decimal(score) / 100:.2f}",
+                "orders": int(count or 0),
+            }
+            for (pk, score), count in zip(candidates, orders)
+        ],
+    }
+
+
+def _run(steps):
+    result = None
+    while True:
+        try:
+            step = steps.send(result)
+        except StopIteration as done:
+            return done.value
+        result = list(step) if isinstance(step, QuerySet) else step.execute()
+
+
+async def _arun(steps):
+    result = None
+    while True:
+        try:
+            step = steps.send(result)
+        except StopIteration as done:
+            return done.value
+        result = [row async for row in step] if isinstance(step, QuerySet) else await step.execute()
+
+
+def read_dashboard(restaurant, days: int) -> dict:
+    """Same payload as dashboard.compute_dashboard(), read from the counters."""
+    return _run(_read_steps(_redis(), restaurant, days))
+
+
+async def aread_dashboard(restaurant, days: int) -> dict:
+    """read_dashboard() for async views: redis.asyncio and the async ORM."""
+    return await _arun(_read_steps(async_cache.client(), restaurant, days))
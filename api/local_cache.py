@@ -0,0 +1,188 @@
+"""
+In-process LRU (L1) in front of the Redis dashboard cache (L2,
+api/dashboard_cache.py), so a hot dashboard costs a dict lookup instead of
+a Redis round trip and an unpickle.
+
+Each worker process keeps entries for at most DASHBOARD_L1_TTL seconds,
+bounded by DASHBOARD_L1_MAX_ENTRIES and DASHBOARD_L1_MAX_BYTES (measured as
+the pickled size of each entry); the least recently used go first.
+DASHBOARD_L1_TTL = 0 turns the tier off.
+
+Entries belong to a restaurant. Order writes publish the restaurant ids
+they touched on CHANNEL once they commit (publish()), and a daemon thread
+in every process evicts those restaurants' entries. While that thread is
+not subscribed the L1 is empty and bypassed, so a missed message cannot
+leave an entry behind.
+"""
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django_redis import get_redis_connection
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "dashboard:l1:invalidate"
+RECONNECT_DELAY = 1.0
+
+evictions_total = metrics.counter(
+    "dashboard_l1_evictions_total",
+    "Entries dropped from the in-process dashboard cache by reason (capacity, expired, invalidated).",
+    ("reason",),
+)
+
+
+class LRUCache:
+    """Thread-safe LRU with per-entry expiry and eviction by group."""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries = OrderedDict()  # key -> (value, expires, size, group)
+        self._groups = {}  # group -> {key, ...}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, now):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            if now >= item[1]:
+                self._pop(key)
+                evictions_total.inc(reason="expired")
+                return None
+            self._entries.move_to_end(key)
+            return item[0]
+
+    def set(self, key, value, expires, group, size):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._pop(key)
+            self._entries[key] = (value, expires, size, group)
+            self._groups.setdefault(group, set()).add(key)
+            self.nbytes += size
+            while len(self._entries) > self.max_entries or self.nbytes > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+                evictions_total.inc(reason="capacity")
+
+    def evict_groups(self, groups) -> int:
+        evicted = 0
+        with self._lock:
+            for group in groups:
+                for key in list(self._groups.get(group, ())):
+                    self._pop(key)
+                    evicted += 1
+        if evicted:
+            evictions_total.inc(evicted, reason="invalidated")
+        return evicted
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._groups.clear()
+            self.nbytes = 0
+
+    def _pop(self, key):
+        _, _, size, group = self._entries.pop(key)
+        self.nbytes -= size
+        keys = self._groups[group]
+        keys.discard(key)
+        if not keys:
+            del self._groups[group]
+
+
+class _Process:
+    # The L1 and its subscriber; a forked worker builds its own
+    def __init__(self):
+        self.pid = os.getpid()
+        self.cache = LRUCache(settings.DASHBOARD_L1_MAX_ENTRIES, settings.DASHBOARD_L1_MAX_BYTES)
+        self.subscribed = threading.Event()
+        threading.Thread(target=self._listen, name="dashboard-l1-invalidation", daemon=True).start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = get_redis_connection("default").pubsub()
+                pubsub.subscribe(CHANNEL)
+                for message in pubsub.listen():
+                    if message["type"] == "subscribe":
+                        self.subscribed.set()
+                    elif message["type"] == "message":
+                        self.cache.evict_groups(_parse(message["data"]))
+            except Exception:
+                logger.warning("dashboard L1 invalidation subscriber disconnected", exc_info=True)
+            self.subscribed.clear()
+            self.cache.clear()
+            time.sleep(RECONNECT_DELAY)
+
+
+_process = None
+_process_lock = threading.Lock()
+
+
+def _local():
+    global _process
+    if _process is None or _process.pid != os.getpid():
+        with _process_lock:
+            if _process is None or _process.pid != os.getpid():
+                _process = _Process()
+    return _process
+
+
+def _parse(data) -> list:
+    if isinstance(data, bytes):
+        data = data.decode()
+    return [int(group) for group in data.split(",") if group]
+
+
+def enabled() -> bool:
+    return settings.DASHBOARD_L1_TTL > 0
+
+
+def get(key):
+    """The live value for key, or None (also while not subscribed)."""
+    process = _local()
+    if not process.subscribed.is_set():
+        return None
+    return process.cache.get(key, time.time())
+
+
+def put(key, value, group: int, expires_at: float):
+    """Keep value until DASHBOARD_L1_TTL from now, or expires_at if sooner."""
+    process = _local()
+    if not process.subscribed.is_set():
+        return
+    expires = min(time.time() + settings.DASHBOARD_L1_TTL, expires_at)
+    process.cache.set(key, value, expires, group, len(pickle.dumps(value, pickle.HIGHEST_PROTOCOL)))
+
+
+def publish(groups):
+    """Evict these restaurants' entries here now and in every other process via CHANNEL."""
+    groups = sorted(groups)
+    if not groups:
+        return
+    if _process is not None and _process.pid == os.getpid():
+        _process.cache.evict_groups(groups)
+    get_redis_connection("default").publish(CHANNEL, ",".join(map(str, groups)))
+
+
+def clear():
+    """Drop every entry this process holds (the benchmark's cold mode)."""
+    _local().cache.clear()
+
+
+def size() -> dict:
+    cache = _local().cache
+    return {"entries": len(cache), "bytes": cache.nbytes}
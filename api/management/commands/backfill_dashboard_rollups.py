@@ -0,0 +1,44 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api import rollups
+from api.models import Restaurant
+
+
+class Command(BaseCommand):
+    help = "Rebuild the dashboard daily rollups from existing Order rows."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--restaurant",
+            type=int,
+            action="append",
+            dest="restaurant_ids",
+            help="Only rebuild this restaurant (repeatable). Defaults to all restaurants.",
+        )
+        parser.add_argument(
+            "--days",
+            type=int,
+            help="Only rebuild the trailing N days instead of the full history.",
+        )
+
+    def handle(self, *args, **options):
+        restaurant_ids = options["restaurant_ids"]
+        if not restaurant_ids:
+            restaurant_ids = Restaurant.objects.order_by("id").values_list("id", flat=True).iterator()
+
+        since = None
+        if options["days"]:
+            since = timezone.localdate() - timedelta(days=options["days"] - 1)
+
+        # One transaction per restaurant keeps locks short on big tables
+        done = 0
+        for restaurant_id in restaurant_ids:
+            rollups.rebuild_restaurant(restaurant_id, since=since)
+            done += 1
+            if options["verbosity"] > 1:
+                self.stdout.write(f"rebuilt restaurant {restaurant_id}")
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt dashboard rollups for {done} restaurant(s)."))
@@ -0,0 +1,108 @@
+import json
+import platform
+import subprocess
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from api import benchmarks
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark API endpoints against the current database (see "
+        "generate_fake_data). Reports p50/p95/p99 latency, query counts and "
+        "peak memory per scenario in cold- and warm-cache modes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--scenario", action="append", dest="scenarios",
+            help=f"Scenario to run (repeatable). Choices: {', '.join(sorted(benchmarks.SCENARIOS))}.",
+        )
+        parser.add_argument("--mode", choices=["cold", "warm", "both"], default="both")
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument("--sample", type=int, default=20, help="Restaurants to spread requests over.")
+        parser.add_argument("--host", default="localhost", help="Host header sent with every request.")
+        parser.add_argument("--output", help="Write results as JSON to this file.")
+        parser.add_argument("--compare", help="Print changes against a previous --output file.")
+        parser.add_argument(
+            "--concurrency", type=int,
+            help="Instead of cold/warm runs, compare the sync and async views of each scenario "
+                 f"({', '.join(sorted(benchmarks.CONCURRENT))}) with this many requests in flight.",
+        )
+        parser.add_argument(
+            "--allow-writes", action="store_true",
+            help="Include scenarios that write (order_create).",
+        )
+
+    def handle(self, *args, **options):
+        names = options["scenarios"] or sorted(benchmarks.SCENARIOS)
+        unknown = set(names) - set(benchmarks.SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenario(s): {', '.join(sorted(unknown))}")
+        if not options["allow_writes"] and not options["scenarios"]:
+            names = [n for n in names if n != "order_create"]
+
+        modes = ["cold", "warm"] if options["mode"] == "both" else [options["mode"]]
+        context = benchmarks.build_context(options["sample"])
+        if not context["restaurant_ids"]:
+            raise CommandError("No restaurants in the database; run generate_fake_data first.")
+
+        client = Client(HTTP_HOST=options["host"])
+        results = []
+        for name in names:
+            if options["concurrency"]:
+                for result in benchmarks.run_concurrent(name, options["concurrency"], options["iterations"], context):
+                    results.append(result)
+                    latency = result["latency_ms"]
+                    self.stdout.write(
+                        f"{name:<22} {result['mode']:<9} rps={result['throughput_rps']:9.1f} "
+                        f"p50={latency['p50']:8.2f}ms p95={latency['p95']:8.2f}ms p99={latency['p99']:8.2f}ms"
+                    )
+                continue
+            for mode in modes:
+                result = benchmarks.run_scenario(client, name, mode, options["iterations"], context)
+                if result is None:
+                    self.stdout.write(f"{name:<22} {mode:<5} skipped (no data)")
+                    continue
+                results.append(result)
+                latency = result["latency_ms"]
+                self.stdout.write(
+                    f"{name:<22} {mode:<5} p50={latency['p50']:8.2f}ms p95={latency['p95']:8.2f}ms "
+                    f"p99={latency['p99']:8.2f}ms queries={result['queries']['mean']:6.1f} "
+                    f"peak_mem={result['peak_memory_bytes']['max'] / 1024:9.1f}KiB"
+                )
+
+        report = {
+            "generated_at": datetime.now(dt_timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "dataset": benchmarks.dataset_stats(),
+            "iterations": options["iterations"],
+            "results": results,
+        }
+        if options["compare"]:
+            with open(options["compare"]) as fh:
+                baseline = json.load(fh)
+            self.stdout.write(f"\nchanges vs {options['compare']} ({baseline.get('git_revision')}):")
+            for name, mode, metric, before, after in benchmarks.compare(results, baseline):
+                change = (after - before) / before * 100 if before else 0.0
+                self.stdout.write(f"{name:<22} {mode:<5} {metric:<7} {before:10.2f} -> {after:10.2f} ({change:+.1f}%)")
+
+        if options["output"]:
+            with open(options["output"], "w") as fh:
+                json.dump(report, fh, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {len(results)} results to {options['output']}"))
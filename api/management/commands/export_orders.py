@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api import exports
+
+
+class Command(BaseCommand):
+    help = (
+        "Append orders created since the last export to columnar files (Parquet or Arrow IPC) "
+        "under ORDER_EXPORT_DIR, one file per month."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dir",
+            help="Export directory. Defaults to ORDER_EXPORT_DIR.",
+        )
+        parser.add_argument(
+            "--format",
+            choices=sorted(exports.FORMATS),
+            help="File format. Defaults to ORDER_EXPORT_FORMAT.",
+        )
+        parser.add_argument(
+            "--chunk-rows",
+            type=int,
+            default=exports.CHUNK_ROWS,
+            help="Rows fetched from the cursor and written per record batch.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            result = exports.export_orders(options["dir"], options["format"], chunk_rows=options["chunk_rows"])
+        except exports.ExportError as exc:
+            raise CommandError(str(exc))
+
+        for path in result["files"]:
+            self.stdout.write(f"wrote {path}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {result['rows']} order(s) into {len(result['files'])} file(s)."
+        ))
@@ -0,0 +1,108 @@
+import random
+import time
+from bisect import bisect
+from datetime import timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from api import rollups
+from api.models import Restaurant, Customer, Order
+
+
+def zipf_weights(n, s):
+    # weight of rank k is 1 / k^s; s=0 is uniform, larger s is more skewed
+    return [1.0 / (k ** s) for k in range(1, n + 1)]
+
+
+def split(total, weights, minimum=0):
+    """Split `total` proportionally to `weights`, at least `minimum` each."""
+    scale = sum(weights)
+    parts = [max(minimum, int(total * w / scale)) for w in weights]
+    parts[0] += max(0, total - sum(parts))
+    return parts
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate a synthetic dataset for load testing: restaurants with "
+        "Zipf-skewed sizes, Zipf-distributed customer activity, orders spread "
+        "over a time window. Uses COPY for customers and orders."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--restaurants", type=int, default=100)
+        parser.add_argument("--customers", type=int, default=100_000, help="Total customers across restaurants.")
+        parser.add_argument("--orders", type=int, default=1_000_000, help="Total orders across restaurants.")
+        parser.add_argument("--days", type=int, default=365, help="Spread orders over the trailing N days.")
+        parser.add_argument("--restaurant-skew", type=float, default=1.1, help="Zipf exponent for restaurant size.")
+        parser.add_argument("--customer-skew", type=float, default=1.2, help="Zipf exponent for customer activity.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--chunk-size", type=int, default=50_000, help="Rows per COPY batch.")
+        parser.add_argument("--skip-rollups", action="store_true", help="Do not rebuild dashboard rollups afterwards.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("generate_fake_data needs PostgreSQL (it loads rows with COPY).")
+
+        rng = random.Random(options["seed"])
+        started = time.monotonic()
+
+        n_restaurants = options["restaurants"]
+        weights = zipf_weights(n_restaurants, options["restaurant_skew"])
+        customers_per = split(options["customers"], weights, minimum=1)
+        orders_per = split(options["orders"], weights)
+
+        run = int(time.time())
+        restaurants = Restaurant.objects.bulk_create(
+            [Restaurant(name=f"Load test {run} #{i}") for i in range(n_restaurants)],
+            batch_size=1000,
+        )
+        self.stdout.write(f"created {len(restaurants)} restaurants")
+
+        now = timezone.now()
+        window = options["days"] * 86400
+        chunk_size = options["chunk_size"]
+        customer_cols = f"COPY {Customer._meta.db_table} (restaurant_id, email, created_at) FROM STDIN"
+        order_cols = f"COPY {Order._meta.db_table} (restaurant_id, customer_id, total_amount, created_at) FROM STDIN"
+
+        total_orders = 0
+        for restaurant, n_customers, n_orders in zip(restaurants, customers_per, orders_per):
+            with transaction.atomic(), connection.cursor() as cursor:
+                with cursor.cursor.copy(customer_cols) as copy:
+                    for i in range(n_customers):
+                        copy.write_row((restaurant.id, f"lt{run}.r{restaurant.id}.c{i}@example.com", now))
+
+                customer_ids = list(
+                    Customer.objects.filter(restaurant=restaurant).order_by("id").values_list("id", flat=True)
+                )
+                # Zipf over a shuffled customer list, so heavy spenders are not just the oldest rows
+                rng.shuffle(customer_ids)
+                cum_weights = list(accumulate(zipf_weights(len(customer_ids), options["customer_skew"])))
+                top = cum_weights[-1]
+
+                remaining = n_orders
+                while remaining > 0:
+                    batch = min(remaining, chunk_size)
+                    with cursor.cursor.copy(order_cols) as copy:
+                        for _ in range(batch):
+                            customer_id = customer_ids[bisect(cum_weights, rng.random() * top)]
+                            amount = Decimal(rng.randint(300, 12000)) / 100
+                            created_at = now - timedelta(seconds=rng.random() * window)
+                            copy.write_row((restaurant.id, customer_id, amount, created_at))
+                    remaining -= batch
+            total_orders += n_orders
+
+            if not options["skip_rollups"]:
+                rollups.rebuild_restaurant(restaurant.id)
+            if options["verbosity"] > 1:
+                self.stdout.write(f"restaurant {restaurant.id}: {n_customers} customers, {n_orders} orders")
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {sum(customers_per)} customers and {total_orders} orders "
+            f"for {n_restaurants} restaurants in {elapsed:.1f}s."
+        ))
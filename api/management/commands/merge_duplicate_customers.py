@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from api import customers
+
+
+class Command(BaseCommand):
+    help = (
+        "Merge customers that share a restaurant and (case-insensitive) email into the oldest one, "
+        "moving their orders over. Run before migrating to the unique email constraint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=customers.MERGE_BATCH_SIZE,
+            help="Duplicate groups merged per transaction.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report the duplicates.",
+        )
+
+    def handle(self, *args, **options):
+        if options["dry_run"]:
+            groups = customers.duplicate_groups()
+            duplicates = sum(len(ids) for _, ids in groups)
+            self.stdout.write(f"{len(groups)} emails have {duplicates} duplicate customer(s).")
+            return
+
+        totals = [0, 0, 0]
+        for batch in customers.merge_duplicates(batch_size=options["batch_size"]):
+            totals = [total + n for total, n in zip(totals, batch)]
+            if options["verbosity"] > 1:
+                self.stdout.write(f"merged {batch[1]} customer(s) in {batch[0]} group(s), moved {batch[2]} order(s)")
+        self.stdout.write(self.style.SUCCESS(
+            f"Merged {totals[1]} duplicate customer(s) into {totals[0]} and moved {totals[2]} order(s)."
+        ))
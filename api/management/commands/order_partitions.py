@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api import partitions
+
+
+class Command(BaseCommand):
+    help = "Create upcoming monthly Order partitions and detach expired ones."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ahead",
+            type=int,
+            help="Months to create beyond the current one. Defaults to ORDER_PARTITIONS_AHEAD.",
+        )
+        parser.add_argument(
+            "--retention-months",
+            type=int,
+            help="Keep this many months attached, counting the current one. "
+                 "Defaults to ORDER_PARTITION_RETENTION_MONTHS (unset keeps everything).",
+        )
+        parser.add_argument(
+            "--archive-schema",
+            help="Schema detached partitions are moved into. Defaults to ORDER_PARTITION_ARCHIVE_SCHEMA.",
+        )
+        parser.add_argument(
+            "--drop",
+            action="store_true",
+            help="Drop detached partitions instead of archiving them.",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            result = partitions.maintain(
+                ahead=options["ahead"],
+                retention_months=options["retention_months"],
+                archive_schema=options["archive_schema"],
+                drop=options["drop"],
+            )
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        for name in result["created"]:
+            self.stdout.write(f"created {name}")
+        for name in result["detached"]:
+            self.stdout.write(f"{'dropped' if options['drop'] else 'detached'} {name}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(result['created'])} and detached {len(result['detached'])} Order partition(s)."
+        ))
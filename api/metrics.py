@@ -0,0 +1,140 @@
+"""
+In-process counters and histograms for the API, exposed in the Prometheus
+text format at /metrics.
+
+Each worker process keeps its own values; they are cheap to bump on the
+request path (a dict update under a lock, no network round trip).
+"""
+import threading
+from bisect import bisect_left
+
+_lock = threading.Lock()
+REGISTRY = {}
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels.get(label, "")) for label in self.labelnames)
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with _lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with _lock:
+            items = list(self._values.items())
+        return [(dict(zip(self.labelnames, key)), value) for key, value in items]
+
+    def reset(self):
+        with _lock:
+            self._values.clear()
+
+
+def counter(name, documentation, labelnames=()):
+    with _lock:
+        if name not in REGISTRY:
+            REGISTRY[name] = Counter(name, documentation, labelnames)
+        return REGISTRY[name]
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 7.5, 10.0)
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # label key -> [per-bucket counts..., +Inf count, sum]
+
+    def _key(self, labels):
+        return tuple(str(labels.get(label, "")) for label in self.labelnames)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with _lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0] * (len(self.buckets) + 2)
+            row[index] += 1
+            row[-1] += value
+
+    def count(self, **labels):
+        row = self._values.get(self._key(labels))
+        return sum(row[:-1]) if row else 0
+
+    def samples(self):
+        """[(labels, [(le, cumulative count), ...], sum)], "+Inf" last."""
+        with _lock:
+            items = [(key, list(row)) for key, row in self._values.items()]
+        out = []
+        for key, row in items:
+            cumulative, buckets = 0, []
+            for le, n in zip(self.buckets + ("+Inf",), row[:-1]):
+                cumulative += n
+                buckets.append((le, cumulative))
+            out.append((dict(zip(self.labelnames, key)), buckets, row[-1]))
+        return out
+
+    def reset(self):
+        with _lock:
+            self._values.clear()
+
+
+def histogram(name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+    with _lock:
+        if name not in REGISTRY:
+            REGISTRY[name] = Histogram(name, documentation, labelnames, buckets)
+        return REGISTRY[name]
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _number(value):
+    if isinstance(value, str):
+        return value
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render() -> str:
+    """Every registered metric in the Prometheus text exposition format."""
+    lines = []
+    with _lock:
+        metrics = sorted(REGISTRY.values(), key=lambda m: m.name)
+    for metric in metrics:
+        kind = "histogram" if isinstance(metric, Histogram) else "counter"
+        lines.append(f"# HELP {metric.name} {_escape(metric.documentation)}")
+        lines.append(f"# TYPE {metric.name} {kind}")
+        if kind == "counter":
+            for labels, value in metric.samples():
+                lines.append(f"{metric.name}{_labels(labels)} {_number(value)}")
+            continue
+        for labels, buckets, total in metric.samples():
+            for le, count in buckets:
+                lines.append(f"{metric.name}_bucket{_labels({**labels, 'le': _number(le)})} {count}")
+            lines.append(f"{metric.name}_sum{_labels(labels)} {_number(total)}")
+            lines.append(f"{metric.name}_count{_labels(labels)} {buckets[-1][1]}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,144 @@
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+from . import db_routing, instrumentation, metrics
+
+request_duration = metrics.histogram(
+    "http_request_duration_seconds",
+    "Request latency by URL pattern.",
+    ("route", "method", "status"),
+)
+request_queries = metrics.histogram(
+    "http_request_db_queries",
+    "SQL queries per sampled request.",
+    ("route",),
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 250),
+)
+request_db_time = metrics.histogram(
+    "http_request_db_duration_seconds",
+    "Time spent in SQL per sampled request.",
+    ("route",),
+)
+request_redis_commands = metrics.histogram(
+    "http_request_redis_round_trips",
+    "Redis round trips (commands or pipelines) per sampled request.",
+    ("route",),
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 250),
+)
+request_serialize_time = metrics.histogram(
+    "http_request_serialize_duration_seconds",
+    "Time spent in serializers per sampled request.",
+    ("route",),
+)
+cache_lookups = metrics.counter(
+    "http_request_cache_lookups_total",
+    "Cache lookups made by sampled requests, by result (hit, miss).",
+    ("route", "result"),
+)
+cache_bytes = metrics.counter(
+    "http_request_cache_bytes_total",
+    "Cache payload bytes moved by sampled requests, by direction (read, write).",
+    ("route", "direction"),
+)
+
+
+def _route(request):
+    # the URL pattern, not the path, so ids do not blow up label cardinality
+    match = getattr(request, "resolver_match", None)
+    return match.route if match is not None else "unmatched"
+
+
+def _sampled():
+    rate = settings.REQUEST_METRICS_SAMPLE_RATE
+    return rate >= 1 or (rate > 0 and random.random() < rate)
+
+
+def _record(request, response, elapsed, stats=None):
+    route = _route(request)
+    request_duration.observe(elapsed, route=route, method=request.method, status=response.status_code)
+    if stats is None:
+        return
+    request_queries.observe(stats.queries, route=route)
+    request_db_time.observe(stats.db_time, route=route)
+    request_redis_commands.observe(stats.redis_commands, route=route)
+    request_serialize_time.observe(stats.serialize_time, route=route)
+    cache_lookups.inc(stats.cache_hits, route=route, result="hit")
+    cache_lookups.inc(stats.cache_misses, route=route, result="miss")
+    cache_bytes.inc(stats.cache_bytes_read, route=route, direction="read")
+    cache_bytes.inc(stats.cache_bytes_written, route=route, direction="write")
+    response["Server-Timing"] = stats.server_timing(elapsed)
+
+
+class RequestMetricsMiddleware:
+    """
+    Records request latency per URL pattern for every request. A sampled
+    fraction (settings.REQUEST_METRICS_SAMPLE_RATE) also records query,
+    cache, Redis and serializer costs and returns them in a Server-Timing
+    header. Unsampled requests pay for two clock reads and one histogram
+    update.
+
+    Sync and async capable, so async views under ASGI are not pushed onto
+    a thread by this middleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        if not _sampled():
+            response = self.get_response(request)
+            _record(request, response, time.perf_counter() - started)
+            return response
+
+        with instrumentation.collect() as stats:
+            response = self.get_response(request)
+        _record(request, response, time.perf_counter() - started, stats)
+        return response
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        if not _sampled():
+            response = await self.get_response(request)
+            _record(request, response, time.perf_counter() - started)
+            return response
+
+        with instrumentation.collect() as stats:
+            response = await self.get_response(request)
+        _record(request, response, time.perf_counter() - started, stats)
+        return response
+
+
+class PrimaryPinMiddleware:
+    """
+    Marks clients that just wrote so their next reads skip the replicas
+    (see api/db_routing.py). Sync and async capable.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return db_routing.pin_primary(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return db_routing.pin_primary(request, await self.get_response(request))
@@ -0,0 +1,33 @@
+# Generated by Django 6.0.1 on 2026-10-18 21:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='order',
+            name='api_order_restaur_e3f7d3_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='order',
+            name='api_order_custome_f00102_idx',
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['restaurant', 'created_at', 'id'], include=('customer', 'total_amount'), name='order_restaurant_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['customer', 'created_at', 'id'], include=('restaurant', 'total_amount'), name='order_customer_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['restaurant', 'total_amount', 'id'], include=('customer', 'created_at'), name='order_restaurant_amount_idx'),
+        ),
+    ]
@@ -0,0 +1,164 @@
+# Generated by Django 6.0.1 on 2026-10-18 21:27
+
+import re
+
+import django.db.models.deletion
+from datetime import date, datetime, timezone as dt_timezone
+from django.db import migrations, models
+from django.utils import timezone
+
+# Months created ahead of time when converting; later ones come from
+# partitions.maintain()
+AHEAD = 3
+# Postgres truncates identifiers to this many bytes
+MAX_NAME_LENGTH = 63
+
+
+def _month_start(value):
+    return date(value.year, value.month, 1)
+
+
+def _add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _bound(month):
+    return datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc)
+
+
+def _create_partition(cursor, month=None):
+    # api/partitions.py create_partition() as of this migration, copied so
+    # later changes to it cannot change what the migration does. The table
+    # is new, so there are no rows to move out of the default partition.
+    if month is None:
+        name, bounds, params = "api_order_default", "DEFAULT", []
+    else:
+        name = f"api_order_p{month.year:04d}_{month.month:02d}"
+        bounds, params = "FOR VALUES FROM (%s) TO (%s)", [_bound(month), _bound(_add_months(month, 1))]
+    cursor.execute(f'CREATE TABLE "{name}" (LIKE api_order INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+
+    # the parent's indexes under readable names, which ATTACH adopts
+    cursor.execute(
+        "SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = 'api_order'"
+    )
+    for index, definition in cursor.fetchall():
+        if definition.startswith("CREATE UNIQUE"):
+            continue  # the primary key; ATTACH creates the partition's own
+        child = f"{name}__{index}"[:MAX_NAME_LENGTH]
+        cursor.execute(re.sub(r"^CREATE INDEX \S+ ON (ONLY )?\S+", f'CREATE INDEX "{child}" ON "{name}"', definition))
+    cursor.execute(f'ALTER TABLE api_order ATTACH PARTITION "{name}" {bounds}', params)
+
+
+def _drop_indexes(cursor, table):
+    # Everything but the primary key; the names are reused on the new table
+    cursor.execute(
+        "SELECT indexrelid::regclass::text FROM pg_index WHERE indrelid = %s::regclass AND NOT indisprimary",
+        [table],
+    )
+    for (name,) in cursor.fetchall():
+        cursor.execute(f"DROP INDEX {name}")
+
+
+def _copy_orders(cursor, Order, source, target, overriding=""):
+    columns = ", ".join(f'"{f.column}"' for f in Order._meta.local_concrete_fields)
+    cursor.execute(f"INSERT INTO {target} ({columns}) {overriding} SELECT {columns} FROM {source}")
+
+
+def partition_orders(apps, schema_editor):
+    """
+    Rebuild api_order as a table range-partitioned by month on created_at.
+    Rows are copied inside the migration's transaction, which holds an
+    exclusive lock on the table throughout: run it in a maintenance window.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    Order = apps.get_model("api", "Order")
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("ALTER TABLE api_order RENAME TO api_order_unpartitioned")
+        cursor.execute("ALTER TABLE api_order_unpartitioned RENAME CONSTRAINT api_order_pkey TO api_order_unpartitioned_pkey")
+        _drop_indexes(cursor, "api_order_unpartitioned")
+        cursor.execute("SELECT pg_get_serial_sequence('api_order_unpartitioned', 'id')")
+        cursor.execute(f"SELECT last_value, is_called FROM {cursor.fetchone()[0]}")
+        last_value, is_called = cursor.fetchone()
+        # Identity columns cannot be partitioned before Postgres 17; use a plain sequence
+        cursor.execute("ALTER TABLE api_order_unpartitioned ALTER COLUMN id DROP IDENTITY")
+
+        # A unique constraint on a partitioned table must include the partition key
+        cursor.execute(
+            "CREATE TABLE api_order (LIKE api_order_unpartitioned INCLUDING CONSTRAINTS, "
+            "PRIMARY KEY (id, created_at)) PARTITION BY RANGE (created_at)"
+        )
+        cursor.execute("CREATE SEQUENCE api_order_id_seq OWNED BY api_order.id")
+        cursor.execute("SELECT setval('api_order_id_seq', %s, %s)", [last_value, is_called])
+        cursor.execute("ALTER TABLE api_order ALTER COLUMN id SET DEFAULT nextval('api_order_id_seq')")
+
+        for name in ("restaurant", "customer"):
+            schema_editor.execute(schema_editor._create_fk_sql(
+                Order, Order._meta.get_field(name), "_fk_%(to_table)s_%(to_column)s",
+            ))
+        for index in Order._meta.indexes:
+            schema_editor.add_index(Order, index)
+
+        cursor.execute("SELECT MIN(created_at) FROM api_order_unpartitioned")
+        oldest = cursor.fetchone()[0]
+        this_month = _month_start(timezone.now().astimezone(dt_timezone.utc))
+        month = _month_start(oldest.astimezone(dt_timezone.utc)) if oldest else this_month
+        while month <= _add_months(this_month, AHEAD):
+            _create_partition(cursor, month)
+            month = _add_months(month, 1)
+        _create_partition(cursor)
+
+        _copy_orders(cursor, Order, "api_order_unpartitioned", "api_order")
+        cursor.execute("DROP TABLE api_order_unpartitioned")
+
+
+def unpartition_orders(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    Order = apps.get_model("api", "Order")
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("ALTER TABLE api_order RENAME TO api_order_partitioned")
+        cursor.execute("ALTER TABLE api_order_partitioned RENAME CONSTRAINT api_order_pkey TO api_order_partitioned_pkey")
+        _drop_indexes(cursor, "api_order_partitioned")
+        cursor.execute("SELECT last_value, is_called FROM api_order_id_seq")
+        last_value, is_called = cursor.fetchone()
+        cursor.execute("ALTER TABLE api_order_partitioned ALTER COLUMN id DROP DEFAULT")
+        cursor.execute("DROP SEQUENCE api_order_id_seq")
+
+        schema_editor.create_model(Order)
+        _copy_orders(cursor, Order, "api_order_partitioned", "api_order", overriding="OVERRIDING SYSTEM VALUE")
+        cursor.execute(
+            "SELECT setval(pg_get_serial_sequence('api_order', 'id'), %s, %s)", [last_value, is_called]
+        )
+        # Detached (archived) partitions are left alone
+        cursor.execute("DROP TABLE api_order_partitioned")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_order_list_covering_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_orders, unpartition_orders),
+        # The composite indexes lead with both FK columns; the old
+        # single-column indexes went with the unpartitioned table
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='order',
+                    name='customer',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='orders', to='api.customer'),
+                ),
+                migrations.AlterField(
+                    model_name='order',
+                    name='restaurant',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='orders', to='api.restaurant'),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 6.0.1 on 2026-10-18 21:33
+
+import django.db.models.deletion
+from datetime import timedelta
+from django.db import migrations, models
+from django.utils import timezone
+
+WINDOWS = (7, 30, 90)
+
+
+def fill_customer_spend(apps, schema_editor):
+    CustomerSpend = apps.get_model("api", "CustomerSpend")
+    CustomerDailySpend = apps.get_model("api", "CustomerDailySpend")
+    today = timezone.localdate()
+    columns, sums, params = ["lifetime_orders", "lifetime_spend"], ["SUM(orders_count)", "SUM(total_spend)"], []
+    for days in WINDOWS:
+        columns += [f"orders_{days}d", f"spend_{days}d"]
+        sums += [
+            "COALESCE(SUM(orders_count) FILTER (WHERE day >= %s), 0)",
+            "COALESCE(SUM(total_spend) FILTER (WHERE day >= %s), 0)",
+        ]
+        params += [today - timedelta(days=days - 1)] * 2
+    schema_editor.execute(
+        f"""
+        INSERT INTO {CustomerSpend._meta.db_table} (restaurant_id, customer_id, {", ".join(columns)})
+        SELECT restaurant_id, customer_id, {", ".join(sums)}
+        FROM {CustomerDailySpend._meta.db_table}
+        GROUP BY restaurant_id, customer_id
+        """,
+        params,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_partition_orders_by_month'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CustomerSpend',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lifetime_orders', models.PositiveIntegerField(default=0)),
+                ('lifetime_spend', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('orders_7d', models.PositiveIntegerField(default=0)),
+                ('spend_7d', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('orders_30d', models.PositiveIntegerField(default=0)),
+                ('spend_30d', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('orders_90d', models.PositiveIntegerField(default=0)),
+                ('spend_90d', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('customer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='spend', to='api.customer')),
+                ('restaurant', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='customer_spend', to='api.restaurant')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['restaurant', '-lifetime_spend', 'customer'], include=('lifetime_orders',), name='customer_spend_lifetime_idx'), models.Index(fields=['restaurant', '-spend_7d', 'customer'], include=('orders_7d',), name='customer_spend_7d_idx'), models.Index(fields=['restaurant', '-spend_30d', 'customer'], include=('orders_30d',), name='customer_spend_30d_idx'), models.Index(fields=['restaurant', '-spend_90d', 'customer'], include=('orders_90d',), name='customer_spend_90d_idx')],
+                'constraints': [models.UniqueConstraint(fields=('restaurant', 'customer'), name='uniq_customer_spend')],
+            },
+        ),
+        migrations.RunPython(fill_customer_spend, migrations.RunPython.noop),
+    ]
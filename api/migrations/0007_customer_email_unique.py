@@ -0,0 +1,55 @@
+# Generated by Django 6.0.1 on 2026-10-18 21:49
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+def check_no_duplicates(apps, schema_editor):
+    Customer = apps.get_model("api", "Customer")
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT count(*) FROM (
+                SELECT 1 FROM {Customer._meta.db_table}
+                GROUP BY restaurant_id, lower(email) HAVING count(*) > 1
+            ) AS d
+            """
+        )
+        duplicated = cursor.fetchone()[0]
+    if duplicated:
+        raise RuntimeError(
+            f"{duplicated} restaurant/email pairs belong to more than one customer; "
+            "run `manage.py merge_duplicate_customers` and migrate again."
+        )
+
+
+class Migration(migrations.Migration):
+    # the unique index is built CONCURRENTLY, so customer writes carry on meanwhile
+    atomic = False
+
+    dependencies = [
+        ('api', '0006_customer_spend'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_no_duplicates, migrations.RunPython.noop),
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    [
+                        # an earlier attempt that met a duplicate leaves an invalid index behind
+                        'DROP INDEX CONCURRENTLY IF EXISTS "uniq_customer_restaurant_email"',
+                        'CREATE UNIQUE INDEX CONCURRENTLY "uniq_customer_restaurant_email" '
+                        'ON "api_customer" ("restaurant_id", (LOWER("email")))',
+                    ],
+                    'DROP INDEX CONCURRENTLY IF EXISTS "uniq_customer_restaurant_email"',
+                ),
+            ],
+            state_operations=[
+                migrations.AddConstraint(
+                    model_name='customer',
+                    constraint=models.UniqueConstraint(models.F('restaurant'), django.db.models.functions.text.Lower('email'), name='uniq_customer_restaurant_email'),
+                ),
+            ],
+        ),
+    ]
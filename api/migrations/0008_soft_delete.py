@@ -0,0 +1,64 @@
+# Generated by Django 6.0.1 on 2026-10-18 21:53
+
+import django.db.models.functions.text
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # indexes are built CONCURRENTLY, so writes carry on meanwhile
+    atomic = False
+
+    dependencies = [
+        ('api', '0007_customer_email_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customer',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='deleted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        AddIndexConcurrently(
+            model_name='customer',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', False)), fields=['deleted_at'], name='customer_deleted_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='restaurant',
+            index=models.Index(condition=models.Q(('deleted_at__isnull', False)), fields=['deleted_at'], name='restaurant_deleted_idx'),
+        ),
+        # a soft-deleted customer no longer holds its email: build the partial
+        # index next to the old one, then drop the old one
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    [
+                        'DROP INDEX CONCURRENTLY IF EXISTS "uniq_live_customer_email"',
+                        'CREATE UNIQUE INDEX CONCURRENTLY "uniq_live_customer_email" '
+                        'ON "api_customer" ("restaurant_id", (LOWER("email"))) WHERE "deleted_at" IS NULL',
+                        'DROP INDEX CONCURRENTLY IF EXISTS "uniq_customer_restaurant_email"',
+                    ],
+                    [
+                        'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS "uniq_customer_restaurant_email" '
+                        'ON "api_customer" ("restaurant_id", (LOWER("email")))',
+                        'DROP INDEX CONCURRENTLY IF EXISTS "uniq_live_customer_email"',
+                    ],
+                ),
+            ],
+            state_operations=[
+                migrations.RemoveConstraint(
+                    model_name='customer',
+                    name='uniq_customer_restaurant_email',
+                ),
+                migrations.AddConstraint(
+                    model_name='customer',
+                    constraint=models.UniqueConstraint(models.F('restaurant'), django.db.models.functions.text.Lower('email'), condition=models.Q(('deleted_at__isnull', True)), name='uniq_live_customer_email'),
+                ),
+            ],
+        ),
+    ]
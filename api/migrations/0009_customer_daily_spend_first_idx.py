@@ -0,0 +1,38 @@
+# Generated by Django 6.0.1 on 2026-10-18 22:10
+
+import django.db.models.deletion
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # indexes are built CONCURRENTLY, so writes carry on meanwhile
+    atomic = False
+
+    dependencies = [
+        ('api', '0008_soft_delete'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='customerdailyspend',
+            index=models.Index(fields=['customer', 'restaurant', 'day'], name='customer_daily_spend_first_idx'),
+        ),
+        # the new index leads with customer_id, so the FK's own index goes
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    'DROP INDEX CONCURRENTLY IF EXISTS "api_customerdailyspend_customer_id_03c3fd99"',
+                    'CREATE INDEX CONCURRENTLY IF NOT EXISTS "api_customerdailyspend_customer_id_03c3fd99" '
+                    'ON "api_customerdailyspend" ("customer_id")',
+                ),
+            ],
+            state_operations=[
+                migrations.AlterField(
+                    model_name='customerdailyspend',
+                    name='customer',
+                    field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='daily_spend', to='api.customer'),
+                ),
+            ],
+        ),
+    ]
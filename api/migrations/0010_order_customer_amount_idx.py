@@ -0,0 +1,58 @@
+# Generated by Django 6.0.1 on 2026-10-19 09:12
+
+import re
+
+from django.db import migrations, models
+
+INDEX = models.Index(
+    fields=['customer', 'total_amount', 'id'], include=['restaurant', 'created_at'],
+    name='order_customer_amount_idx',
+)
+# Postgres truncates identifiers to this many bytes
+MAX_NAME_LENGTH = 63
+
+
+def _retarget(definition, head):
+    return re.sub(r'^CREATE INDEX \S+ ON (ONLY )?\S+', head, definition)
+
+
+def add_index(apps, schema_editor):
+    # api/partitions.py create_index() as of this migration, copied so later
+    # changes to it cannot change what the migration does: the parent's index
+    # ON ONLY, each partition's copy CONCURRENTLY and attached to it.
+    Order = apps.get_model('api', 'Order')
+    definition = str(INDEX.create_sql(Order, schema_editor))
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass('api_order')")
+        if cursor.fetchone()[0] != 'p':
+            cursor.execute(_retarget(definition, f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{INDEX.name}" ON api_order'))
+            return
+        cursor.execute(_retarget(definition, f'CREATE INDEX IF NOT EXISTS "{INDEX.name}" ON ONLY api_order'))
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass('api_order') ORDER BY c.relname"
+        )
+        for (partition,) in cursor.fetchall():
+            child = f'{partition}__{INDEX.name}'[:MAX_NAME_LENGTH]
+            cursor.execute(_retarget(definition, f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{child}" ON "{partition}"'))
+            cursor.execute(f'ALTER INDEX "{INDEX.name}" ATTACH PARTITION "{child}"')
+
+
+def remove_index(apps, schema_editor):
+    schema_editor.execute(f'DROP INDEX IF EXISTS "{INDEX.name}"')  # with the partitions' copies
+
+
+class Migration(migrations.Migration):
+    # partition indexes are built CONCURRENTLY, so writes carry on meanwhile
+    atomic = False
+
+    dependencies = [
+        ('api', '0009_customer_daily_spend_first_idx'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            database_operations=[migrations.RunPython(add_index, remove_index)],
+            state_operations=[migrations.AddIndex(model_name='order', index=INDEX)],
+        ),
+    ]
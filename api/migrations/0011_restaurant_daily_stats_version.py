@@ -0,0 +1,34 @@
+# Generated by Django 6.0.1 on 2026-10-18 22:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_order_customer_amount_idx'),
+    ]
+
+    operations = [
+        # existing rows take a constant 0, so adding the column does not
+        # rewrite the table; only rows written from now on draw from the sequence
+        migrations.SeparateDatabaseAndState(
+            database_operations=[
+                migrations.RunSQL(
+                    'CREATE SEQUENCE "api_restaurantdailystats_version_seq"; '
+                    'ALTER TABLE "api_restaurantdailystats" ADD COLUMN "version" bigint NOT NULL DEFAULT 0; '
+                    'ALTER TABLE "api_restaurantdailystats" ALTER COLUMN "version" '
+                    "SET DEFAULT nextval('api_restaurantdailystats_version_seq')",
+                    'ALTER TABLE "api_restaurantdailystats" DROP COLUMN "version"; '
+                    'DROP SEQUENCE "api_restaurantdailystats_version_seq"',
+                ),
+            ],
+            state_operations=[
+                migrations.AddField(
+                    model_name='restaurantdailystats',
+                    name='version',
+                    field=models.BigIntegerField(db_default=models.Func(models.Value('api_restaurantdailystats_version_seq'), function='nextval', output_field=models.BigIntegerField())),
+                ),
+            ],
+        ),
+    ]
@@ -1,10 +1,27 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
 
 # Create your models here.
 
+class LiveManager(models.Manager):
+    # Hides soft-deleted rows: DELETE only sets deleted_at, api/purge.py removes them later
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Restaurant(models.Model):
     name = models.CharField(max_length=500)
     created_at = models.DateTimeField(auto_now_add=True)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = LiveManager()
+    all_objects = models.Manager()  # soft-deleted rows included
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["deleted_at"], condition=Q(deleted_at__isnull=False), name="restaurant_deleted_idx"),
+        ]
 
     def __str__(self):
         return self.name
@@ -17,36 +34,215 @@ class Customer(models.Model):
     )
     email = models.EmailField()
     created_at = models.DateTimeField(auto_now_add=True)
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = LiveManager()
+    all_objects = models.Manager()  # soft-deleted rows included
 
-    
     class Meta:
         indexes = [
             models.Index(fields=["restaurant", "created_at"]),
+            models.Index(fields=["created_at", "id"]),  # keyset pagination
+            models.Index(fields=["deleted_at"], condition=Q(deleted_at__isnull=False), name="customer_deleted_idx"),
+        ]
+        constraints = [
+            # one live customer per email and restaurant, whatever the case;
+            # also the index behind find-or-create by email (api/customers.py)
+            models.UniqueConstraint(
+                "restaurant", Lower("email"), condition=Q(deleted_at__isnull=True), name="uniq_live_customer_email",
+            ),
         ]
 
     def __str__(self):
         return self.email
 
+class OrderQuerySet(models.QuerySet):
+    # Fields that move an order between rollup rows (see api/rollups.py)
+    ROLLUP_FIELDS = {"restaurant", "restaurant_id", "customer", "customer_id", "total_amount", "created_at"}
+
+    def update(self, **kwargs):
+        if not self.ROLLUP_FIELDS.intersection(kwargs):
+            return super().update(**kwargs)
+
+        # queryset.update() skips save signals, so rebuild the touched days instead
+        from . import rollups
+        from .signals import forget_order_days
+
+        with transaction.atomic(using=self.db):
+            pks = list(self.values_list("pk", flat=True))
+            touched = rollups.touched_days(self.model._base_manager.filter(pk__in=pks))
+            rows = super().update(**kwargs)
+            touched |= rollups.touched_days(self.model._base_manager.filter(pk__in=pks))
+            rollups.rebuild_days(touched)
+            forget_order_days(touched)
+        return rows
+
+
 class Order(models.Model):
+    """
+    Range-partitioned by month on created_at in PostgreSQL (api/partitions.py);
+    the database primary key is (id, created_at).
+    """
+    # No single-column FK indexes: the composite indexes below lead with them
     restaurant = models.ForeignKey(
         Restaurant, 
         on_delete=models.CASCADE, # if parent object is deleted, automatically delete all related child objects
         related_name="orders",
+        db_index=False,
     )
     customer = models.ForeignKey(
         Customer,
         on_delete=models.CASCADE,
         related_name="orders",
+        db_index=False,
     )
 
     total_amount = models.DecimalField(max_digits=10, decimal_places=2)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = OrderQuerySet.as_manager()
+
     class Meta:
         indexes = [
-            models.Index(fields=["restaurant", "created_at"]),
-            models.Index(fields=["customer", "created_at"])
+            # Order list filters (api/filters.py). The INCLUDE columns make list
+            # pages index-only scans; the first also serves rollup and series queries.
+            models.Index(
+                fields=["restaurant", "created_at", "id"], include=["customer", "total_amount"],
+                name="order_restaurant_created_idx",
+            ),
+            models.Index(
+                fields=["customer", "created_at", "id"], include=["restaurant", "total_amount"],
+                name="order_customer_created_idx",
+            ),
+            models.Index(
+                fields=["restaurant", "total_amount", "id"], include=["customer", "created_at"],
+                name="order_restaurant_amount_idx",
+            ),
+            models.Index(
+                fields=["customer", "total_amount", "id"], include=["restaurant", "created_at"],
+                name="order_customer_amount_idx",
+            ),
+            models.Index(fields=["created_at", "id"]),  # keyset pagination
         ]
     
     def __str__(self):
-        return f"Order {self.id}"
\ No newline at end of file
+        return f"Order {self.id}"
+
+
+class RestaurantDailyStats(models.Model):
+    """
+    Per-restaurant, per-day order totals.
+    Kept up to date from Order writes (api/rollups.py) so the dashboard
+    reads at most one row per day in its window.
+    """
+    restaurant = models.ForeignKey(
+        Restaurant,
+        on_delete=models.CASCADE,
+        related_name="daily_stats",
+    )
+    day = models.DateField()
+    orders_count = models.PositiveIntegerField(default=0)
+    revenue_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    # drawn from a sequence on every write to the row, so the live counters
+    # can tell which deltas a seed read from it already includes
+    version = models.BigIntegerField(db_default=models.Func(
+        models.Value("api_restaurantdailystats_version_seq"),
+        function="nextval",
+        output_field=models.BigIntegerField(),
+    ))
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["restaurant", "day"], name="uniq_restaurant_daily_stats"),
+        ]
+
+    def __str__(self):
+        return f"{self.restaurant_id} {self.day}"
+
+
+class CustomerDailySpend(models.Model):
+    """
+    Per-restaurant, per-day, per-customer spend.
+    Feeds unique_customers and top_customers on the dashboard.
+    """
+    restaurant = models.ForeignKey(
+        Restaurant,
+        on_delete=models.CASCADE,
+        related_name="customer_daily_spend",
+    )
+    customer = models.ForeignKey(
+        Customer,
+        on_delete=models.CASCADE,
+        related_name="daily_spend",
+        db_index=False,  # customer_daily_spend_first_idx leads with it
+    )
+    day = models.DateField()
+    orders_count = models.PositiveIntegerField(default=0)
+    total_spend = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["restaurant", "day", "customer"], name="uniq_customer_daily_spend"),
+        ]
+        indexes = [
+            # a customer's first day at a restaurant in one probe (api/cohorts.py)
+            models.Index(fields=["customer", "restaurant", "day"], name="customer_daily_spend_first_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.restaurant_id} {self.day} {self.customer_id}"
+
+class CustomerSpend(models.Model):
+    """
+    Per-restaurant, per-customer spend: lifetime, and over the trailing
+    WINDOWS days (today included, as on the dashboard). Maintained by
+    api/customer_spend.py; the spend indexes let top-N reads and
+    spend-ordered customer lists stop after the rows they return.
+    """
+    WINDOWS = (7, 30, 90)
+
+    restaurant = models.ForeignKey(
+        Restaurant,
+        on_delete=models.CASCADE,
+        related_name="customer_spend",
+        db_index=False,  # the unique constraint and indexes lead with it
+    )
+    customer = models.ForeignKey(
+        Customer,
+        on_delete=models.CASCADE,
+        related_name="spend",
+    )
+    lifetime_orders = models.PositiveIntegerField(default=0)
+    lifetime_spend = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    orders_7d = models.PositiveIntegerField(default=0)
+    spend_7d = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    orders_30d = models.PositiveIntegerField(default=0)
+    spend_30d = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    orders_90d = models.PositiveIntegerField(default=0)
+    spend_90d = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["restaurant", "customer"], name="uniq_customer_spend"),
+        ]
+        indexes = [
+            models.Index(
+                fields=["restaurant", "-lifetime_spend", "customer"], include=["lifetime_orders"],
+                name="customer_spend_lifetime_idx",
+            ),
+            models.Index(
+                fields=["restaurant", "-spend_7d", "customer"], include=["orders_7d"],
+                name="customer_spend_7d_idx",
+            ),
+            models.Index(
+                fields=["restaurant", "-spend_30d", "customer"], include=["orders_30d"],
+                name="customer_spend_30d_idx",
+            ),
+            models.Index(
+                fields=["restaurant", "-spend_90d", "customer"], include=["orders_90d"],
+                name="customer_spend_90d_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.restaurant_id} {self.customer_id}"
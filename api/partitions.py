@@ -0,0 +1,225 @@
+"""
+Monthly range partitions of api_order on created_at (PostgreSQL).
+
+    api_order             partitioned parent, PRIMARY KEY (id, created_at)
+    api_order_p2026_10    [2026-10-01, 2026-11-01) UTC
+    api_order_default     rows no monthly partition covers yet
+
+Each partition carries copies of the parent's indexes named
+"<partition>__<parent index>". maintain() (the order_partitions command and
+the maintain_order_partitions beat task) keeps ORDER_PARTITIONS_AHEAD months
+created in advance, moves rows that landed in the default partition into
+monthly ones, and detaches months older than ORDER_PARTITION_RETENTION_MONTHS.
+
+Postgres only skips partitions when a query compares created_at itself with
+constants or parameters (created_at >= %s AND created_at < %s, as in
+api/timeseries.py and rollups.rebuild_days). Wrapping the column (__date
+lookups, TruncDate or casts in a filter) scans every partition, and lookups
+by id alone probe every partition's primary key.
+"""
+import re
+from datetime import date, datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+TABLE = "api_order"
+DEFAULT_PARTITION = f"{TABLE}_default"
+PARTITION_RE = re.compile(rf"^{TABLE}_p(\d{{4}})_(\d{{2}})$")
+
+# The dashboard reads up to 365 days back: twelve full months plus this one
+MIN_RETENTION_MONTHS = 13
+# DDL waits at most this long for a lock instead of queueing writes behind it
+LOCK_TIMEOUT = "5s"
+
+
+def month_start(value) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{TABLE}_p{month.year:04d}_{month.month:02d}"
+
+
+def _bound(month: date) -> datetime:
+    return datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc)
+
+
+def _qn(name):
+    return connection.ops.quote_name(name)
+
+
+def is_partitioned(cursor) -> bool:
+    cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [TABLE])
+    row = cursor.fetchone()
+    return row is not None and row[0] == "p"
+
+
+def _attached(cursor) -> set:
+    cursor.execute(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = to_regclass(%s)",
+        [TABLE],
+    )
+    return {name for (name,) in cursor.fetchall()}
+
+
+def monthly_partitions(cursor) -> dict:
+    """{month: partition name} for the monthly partitions currently attached."""
+    out = {}
+    for name in _attached(cursor):
+        match = PARTITION_RE.match(name)
+        if match:
+            out[date(int(match[1]), int(match[2]), 1)] = name
+    return out
+
+
+def _columns(cursor):
+    return ", ".join(_qn(col.name) for col in connection.introspection.get_table_description(cursor, TABLE))
+
+
+def _index_statements(cursor, partition):
+    # The parent's indexes rewritten for one partition. ATTACH PARTITION adopts
+    # matching indexes, so partitions get readable names instead of generated ones.
+    cursor.execute(
+        "SELECT indexname, indexdef FROM pg_indexes WHERE schemaname = current_schema() AND tablename = %s",
+        [TABLE],
+    )
+    statements = []
+    for name, definition in cursor.fetchall():
+        if definition.startswith("CREATE UNIQUE"):
+            continue  # the primary key; ATTACH creates the partition's own
+        statements.append(_retarget(definition, f"CREATE INDEX {_child_index(partition, name)} ON {_qn(partition)}"))
+    return statements
+
+
+def _child_index(partition, name):
+    return _qn(f"{partition}__{name}"[:connection.ops.max_name_length()])
+
+
+def _retarget(definition, head):
+    # swap "CREATE INDEX <name> ON <table>" for another head, keeping the columns
+    return re.sub(r"^CREATE INDEX \S+ ON (ONLY )?\S+", head, definition)
+
+
+def create_index(cursor, name, definition):
+    """
+    Add an index (a CREATE INDEX statement named `name` on api_order) without
+    blocking writes: the parent's index is created ON ONLY, each partition's
+    copy CONCURRENTLY and then attached, and the parent's index is valid once
+    every partition has one. Safe to re-run; needs autocommit (atomic=False).
+    """
+    if not is_partitioned(cursor):
+        cursor.execute(_retarget(definition, f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {_qn(name)} ON {_qn(TABLE)}"))
+        return
+    cursor.execute(_retarget(definition, f"CREATE INDEX IF NOT EXISTS {_qn(name)} ON ONLY {_qn(TABLE)}"))
+    for partition in sorted(_attached(cursor)):
+        child = _child_index(partition, name)
+        cursor.execute(_retarget(definition, f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {child} ON {_qn(partition)}"))
+        cursor.execute(f"ALTER INDEX {_qn(name)} ATTACH PARTITION {child}")
+
+
+def create_partition(cursor, month=None):
+    """
+    Create and attach the partition for `month` (the default partition when
+    None), first moving that month's rows out of the default partition.
+    """
+    name = DEFAULT_PARTITION if month is None else partition_name(month)
+    cursor.execute(f"CREATE TABLE {_qn(name)} (LIKE {_qn(TABLE)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+
+    if month is None:
+        bounds, params = "DEFAULT", []
+    else:
+        bounds, params = "FOR VALUES FROM (%s) TO (%s)", [_bound(month), _bound(add_months(month, 1))]
+        if DEFAULT_PARTITION in _attached(cursor):
+            columns = _columns(cursor)
+            # Keep new rows for this month out of the default partition until
+            # ATTACH, which would otherwise fail its check of the default
+            cursor.execute(f"LOCK TABLE {_qn(DEFAULT_PARTITION)} IN ACCESS EXCLUSIVE MODE")
+            cursor.execute(
+                f"WITH moved AS (DELETE FROM {_qn(DEFAULT_PARTITION)} "
+                f"WHERE created_at >= %s AND created_at < %s RETURNING {columns}) "
+                f"INSERT INTO {_qn(name)} ({columns}) SELECT {columns} FROM moved",
+                params,
+            )
+
+    for statement in _index_statements(cursor, name):
+        cursor.execute(statement)
+    cursor.execute(f"ALTER TABLE {_qn(TABLE)} ATTACH PARTITION {_qn(name)} {bounds}", params)
+    return name
+
+
+def detach_partition(cursor, name, archive_schema=None, drop=False):
+    """Detach a partition and drop it, or move it into `archive_schema`."""
+    cursor.execute(f"ALTER TABLE {_qn(TABLE)} DETACH PARTITION {_qn(name)}")
+    if drop:
+        cursor.execute(f"DROP TABLE {_qn(name)}")
+        return
+    # A detached partition keeps its copies of the parent's foreign keys,
+    # which would stop restaurants and customers with archived orders from
+    # ever being deleted (api/purge.py)
+    cursor.execute("SELECT conname FROM pg_constraint WHERE conrelid = to_regclass(%s) AND contype = 'f'", [name])
+    for (constraint,) in cursor.fetchall():
+        cursor.execute(f"ALTER TABLE {_qn(name)} DROP CONSTRAINT {_qn(constraint)}")
+    if archive_schema:
+        cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {_qn(archive_schema)}")
+        cursor.execute(f"ALTER TABLE {_qn(name)} SET SCHEMA {_qn(archive_schema)}")
+
+
+def _default_months(cursor):
+    if DEFAULT_PARTITION not in _attached(cursor):
+        return set()
+    cursor.execute(
+        f"SELECT DISTINCT date_trunc('month', created_at AT TIME ZONE 'UTC') FROM {_qn(DEFAULT_PARTITION)}"
+    )
+    return {month_start(value) for (value,) in cursor.fetchall()}
+
+
+def maintain(ahead=None, retention_months=None, archive_schema=None, drop=False, today=None) -> dict:
+    """
+    Create the monthly partitions from this month to `ahead` months out, split
+    rows out of the default partition, and, when `retention_months` is set,
+    detach older months (archived into `archive_schema`, or dropped).
+    Arguments default to the ORDER_PARTITION* settings. Each step runs in its
+    own transaction. Returns the partitions created and detached.
+    """
+    if ahead is None:
+        ahead = settings.ORDER_PARTITIONS_AHEAD
+    if retention_months is None:
+        retention_months = settings.ORDER_PARTITION_RETENTION_MONTHS
+    if archive_schema is None:
+        archive_schema = settings.ORDER_PARTITION_ARCHIVE_SCHEMA
+    if retention_months is not None and retention_months < MIN_RETENTION_MONTHS:
+        raise ValueError(f"retention_months must be at least {MIN_RETENTION_MONTHS}.")
+
+    this_month = month_start(today or timezone.now().astimezone(dt_timezone.utc))
+    created, detached = [], []
+
+    with connection.cursor() as cursor:
+        if connection.vendor != "postgresql" or not is_partitioned(cursor):
+            return {"created": created, "detached": detached}
+
+        existing = monthly_partitions(cursor)
+        wanted = {add_months(this_month, n) for n in range(ahead + 1)} | _default_months(cursor)
+        for month in sorted(wanted - existing.keys()):
+            with transaction.atomic():
+                cursor.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+                created.append(create_partition(cursor, month))
+
+        if retention_months is not None:
+            cutoff = add_months(this_month, 1 - retention_months)
+            for month, name in sorted(monthly_partitions(cursor).items()):
+                if month >= cutoff:
+                    break
+                with transaction.atomic():
+                    cursor.execute(f"SET LOCAL lock_timeout = '{LOCK_TIMEOUT}'")
+                    detach_partition(cursor, name, archive_schema=archive_schema, drop=drop)
+                detached.append(name)
+
+    return {"created": created, "detached": detached}
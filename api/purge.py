@@ -0,0 +1,206 @@
+"""
+Background deletion of restaurants and customers.
+
+DELETE on a restaurant or customer only sets deleted_at (soft_delete())
+and queues the purge_deleted task; from then on the default managers
+(models.LiveManager) hide the row and the API answers 404 for it. The
+task removes what hangs off it with raw DELETEs of at most BATCH_SIZE rows,
+each picked through the index that leads with the parent's id and each in
+its own short transaction, so neither Django's cascade collector nor a
+long lock is involved:
+
+    customer:   its orders, through record_order_deltas() so the
+                restaurant's rollups, live counters and caches drop them,
+                then the customer row
+    restaurant: its orders, rollup rows and customers (without deltas:
+                every rollup row of the restaurant goes too), then the
+                restaurant row
+
+Until then a deleted restaurant's customers and orders still show in the
+unfiltered lists. The row goes last, so a child inserted in a race makes
+that DELETE fail its foreign key check and the task retries.
+
+Progress lives in the cache under progress_key() (GET .../deletion/). A
+purge can be resumed at any point: every step deletes only what is left,
+the task is acked late, and the resume_stalled_purges beat task re-queues
+deletions whose progress has not moved for STALL_SECONDS.
+"""
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.utils import timezone
+
+from . import metrics, rollups
+from .dashboard_cache import forget_restaurants
+from .models import Customer, CustomerDailySpend, CustomerSpend, Order, Restaurant, RestaurantDailyStats
+from .signals import record_order_deltas
+
+BATCH_SIZE = 5000
+STALL_SECONDS = 600  # resume_stalled_purges runs every STALL_SECONDS / 2
+PROGRESS_TIMEOUT = 7 * 86400
+
+MODELS = {"restaurant": Restaurant, "customer": Customer}
+
+rows_deleted_total = metrics.counter(
+    "purge_rows_deleted_total",
+    "Rows removed by background purges of deleted restaurants and customers.",
+    ("table",),
+)
+
+
+def progress_key(kind: str, pk: int) -> str:
+    return f"purge:{kind}:{pk}"
+
+
+def _new_state(kind, pk):
+    return {"kind": kind, "id": pk, "status": "queued", "deleted": {}, "updated_at": time.time()}
+
+
+def _save(state):
+    state["updated_at"] = time.time()
+    cache.set(progress_key(state["kind"], state["id"]), state, PROGRESS_TIMEOUT)
+
+
+def progress(kind: str, pk: int):
+    """A deletion's progress: status queued, purging or done, and rows deleted per table. None if unknown."""
+    state = cache.get(progress_key(kind, pk))
+    if state is None and MODELS[kind].all_objects.filter(pk=pk, deleted_at__isnull=False).exists():
+        state = _new_state(kind, pk)  # progress expired or lost; the next purge picks it up
+    return state
+
+
+def soft_delete(instance) -> dict:
+    """Mark a restaurant or customer deleted and queue its purge once that commits. Returns its progress."""
+    from .tasks import purge_deleted
+
+    kind, pk = instance._meta.model_name, instance.pk
+    type(instance).all_objects.filter(pk=pk).update(deleted_at=timezone.now())
+    state = _new_state(kind, pk)
+
+    def queue():
+        _save(state)
+        purge_deleted.delay(kind, pk)
+
+    # robust: a broker outage leaves the row soft-deleted for resume_stalled() to queue
+    transaction.on_commit(queue, robust=True)
+    if kind == "restaurant":
+        transaction.on_commit(lambda: forget_restaurants({pk}), robust=True)
+    return state
+
+
+def _delete_rows(model, where, params, batch_size) -> int:
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {table} WHERE id IN (SELECT id FROM {table} WHERE {where} LIMIT %s)",
+            [*params, batch_size],
+        )
+        return cursor.rowcount
+
+
+def _delete_orders(where, params, batch_size, deltas=True) -> int:
+    # Order's primary key is (id, created_at) in the database (api/partitions.py)
+    table = Order._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            DELETE FROM {table} WHERE (id, created_at) IN (
+                SELECT id, created_at FROM {table} WHERE {where} LIMIT %s
+            )
+            RETURNING restaurant_id, customer_id, created_at, total_amount
+            """,
+            [*params, batch_size],
+        )
+        rows = cursor.fetchall()
+        if deltas and rows:
+            changes = defaultdict(lambda: [0, Decimal("0")])
+            for restaurant_id, customer_id, created_at, amount in rows:
+                change = changes[(restaurant_id, customer_id, rollups.order_day(created_at))]
+                change[0] -= 1
+                change[1] -= amount
+            record_order_deltas(
+                {key: tuple(change) for key, change in changes.items()},
+                {(restaurant_id, created_at) for restaurant_id, _, created_at, _ in rows},
+            )
+    return len(rows)
+
+
+def _delete_customers(where, params, batch_size) -> int:
+    table = Customer._meta.db_table
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f"SELECT id FROM {table} WHERE {where} LIMIT %s FOR UPDATE", [*params, batch_size])
+        ids = [pk for (pk,) in cursor.fetchall()]
+        if not ids:
+            return 0
+        # orders placed at other restaurants (normally none) go through the write hook
+        while _delete_orders("customer_id = ANY(%s)", [ids], batch_size):
+            pass
+        for model in (CustomerDailySpend, CustomerSpend):
+            cursor.execute(f"DELETE FROM {model._meta.db_table} WHERE customer_id = ANY(%s)", [ids])
+        cursor.execute(f"DELETE FROM {table} WHERE id = ANY(%s)", [ids])
+    return len(ids)
+
+
+def _steps(kind, pk):
+    # (progress label, delete one batch -> rows deleted), in order; the row itself goes last
+    if kind == "customer":
+        return [
+            ("orders", lambda n: _delete_orders("customer_id = %s", [pk], n)),
+            ("customers", lambda n: _delete_customers("id = %s AND deleted_at IS NOT NULL", [pk], n)),
+        ]
+    return [
+        ("orders", lambda n: _delete_orders("restaurant_id = %s", [pk], n, deltas=False)),
+        *(
+            (model._meta.model_name, lambda n, model=model: _delete_rows(model, "restaurant_id = %s", [pk], n))
+            for model in (CustomerSpend, CustomerDailySpend, RestaurantDailyStats)
+        ),
+        ("customers", lambda n: _delete_customers("restaurant_id = %s", [pk], n)),
+        ("restaurants", lambda n: _delete_rows(Restaurant, "id = %s AND deleted_at IS NOT NULL", [pk], n)),
+    ]
+
+
+def purge(kind: str, pk: int, batch_size: int = None):
+    """
+    Remove a soft-deleted restaurant or customer and everything under it.
+    Returns its final progress, or None when pk is not a pending deletion
+    (and was not purged recently).
+    """
+    batch_size = batch_size or BATCH_SIZE
+    if not MODELS[kind].all_objects.filter(pk=pk, deleted_at__isnull=False).exists():
+        return cache.get(progress_key(kind, pk))
+
+    state = progress(kind, pk)
+    state["status"] = "purging"
+    _save(state)
+    for label, step in _steps(kind, pk):
+        while True:
+            deleted = step(batch_size)
+            if deleted:
+                state["deleted"][label] = state["deleted"].get(label, 0) + deleted
+                rows_deleted_total.inc(deleted, table=label)
+                _save(state)  # also the heartbeat resume_stalled() looks at
+            if deleted < batch_size:
+                break
+    state["status"] = "done"
+    _save(state)
+    return state
+
+
+def resume_stalled() -> int:
+    """Re-queue pending deletions whose progress has not moved for STALL_SECONDS. Returns how many."""
+    from .tasks import purge_deleted
+
+    cutoff = time.time() - STALL_SECONDS
+    queued = 0
+    for kind, model in MODELS.items():
+        for pk, deleted_at in model.all_objects.filter(deleted_at__isnull=False).values_list("pk", "deleted_at"):
+            state = cache.get(progress_key(kind, pk))
+            if (state["updated_at"] if state else deleted_at.timestamp()) >= cutoff:
+                continue
+            _save(state or _new_state(kind, pk))  # not again on the next run while it waits in the queue
+            purge_deleted.delay(kind, pk)
+            queued += 1
+    return queued
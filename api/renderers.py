@@ -0,0 +1,14 @@
+from rest_framework import renderers
+
+
+class RawJSON(bytes):
+    """Response data that is already encoded JSON (see api/fast_serializers.py)."""
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    """DRF's JSONRenderer, except RawJSON data is sent as is instead of re-encoded."""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if isinstance(data, RawJSON):
+            return bytes(data)
+        return super().render(data, accepted_media_type, renderer_context)
@@ -0,0 +1,224 @@
+"""
+Daily rollups behind the restaurant dashboard.
+
+RestaurantDailyStats / CustomerDailySpend hold one row per (restaurant, day)
+and per (restaurant, day, customer). Single-row Order writes apply deltas
+through the signals in api/signals.py; queryset.update() and backfills
+rebuild whole days from Order instead. CustomerSpend (api/customer_spend.py)
+follows along in both cases.
+"""
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from . import customer_spend
+from .models import Order, RestaurantDailyStats, CustomerDailySpend
+
+WRITE_BATCH_SIZE = 1000
+
+
+def order_day(created_at):
+    # Rollup days follow settings.TIME_ZONE, same as TruncDate
+    return timezone.localdate(created_at)
+
+
+def day_start(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def apply_deltas(deltas):
+    """
+    deltas: {(restaurant_id, customer_id, day): (orders_count, amount)}
+    Positive deltas are upserted, negative ones only ever decrement existing
+    rows (so a cascade delete never re-creates a rollup row for a parent
+    that is going away).
+
+    Returns {(restaurant_id, day): version} for the RestaurantDailyStats rows
+    written. Versions come from a sequence under the row lock, so a later
+    commit to a row always leaves a higher one; rows that reach zero orders
+    stay, keeping theirs.
+    """
+    customer_rows = defaultdict(lambda: [0, Decimal("0")])
+    restaurant_rows = defaultdict(lambda: [0, Decimal("0")])
+    for (restaurant_id, customer_id, day), (count, amount) in deltas.items():
+        if count == 0 and not amount:
+            continue
+        row = customer_rows[(restaurant_id, customer_id, day)]
+        row[0] += count
+        row[1] += amount
+        row = restaurant_rows[(restaurant_id, day)]
+        row[0] += count
+        row[1] += amount
+
+    if not restaurant_rows:
+        return {}
+
+    stats_table = RestaurantDailyStats._meta.db_table
+    spend_table = CustomerDailySpend._meta.db_table
+    next_version = "nextval('api_restaurantdailystats_version_seq')"
+
+    versions = {}
+    with transaction.atomic(), connection.cursor() as cursor:
+        inc = [(r, d, c, a) for (r, d), (c, a) in restaurant_rows.items() if c > 0]
+        dec = [(-c, -a, r, d) for (r, d), (c, a) in restaurant_rows.items() if c <= 0]
+        if inc:
+            cursor.execute(
+                f"""
+                INSERT INTO {stats_table} AS t (restaurant_id, day, orders_count, revenue_total)
+                VALUES {", ".join(["(%s, %s, %s, %s)"] * len(inc))}
+                ON CONFLICT (restaurant_id, day) DO UPDATE SET
+                    orders_count = t.orders_count + EXCLUDED.orders_count,
+                    revenue_total = t.revenue_total + EXCLUDED.revenue_total,
+                    version = {next_version}
+                RETURNING restaurant_id, day, version
+                """,
+                [value for row in inc for value in row],
+            )
+            versions.update(((r, d), v) for r, d, v in cursor.fetchall())
+        if dec:
+            cursor.execute(
+                f"""
+                UPDATE {stats_table} AS t
+                SET orders_count = GREATEST(t.orders_count - v.orders_count, 0),
+                    revenue_total = t.revenue_total - v.amount,
+                    version = {next_version}
+                FROM (VALUES {", ".join(["(%s::integer, %s::numeric, %s::bigint, %s::date)"] * len(dec))})
+                    AS v (orders_count, amount, restaurant_id, day)
+                WHERE t.restaurant_id = v.restaurant_id AND t.day = v.day
+                RETURNING t.restaurant_id, t.day, t.version
+                """,
+                [value for row in dec for value in row],
+            )
+            versions.update(((r, d), v) for r, d, v in cursor.fetchall())
+
+        inc = [(r, cu, d, c, a) for (r, cu, d), (c, a) in customer_rows.items() if c > 0]
+        dec = [(-c, -a, r, cu, d) for (r, cu, d), (c, a) in customer_rows.items() if c <= 0]
+        if inc:
+            cursor.executemany(
+                f"""
+                INSERT INTO {spend_table} AS t (restaurant_id, customer_id, day, orders_count, total_spend)
+                VALUES (%s, %s, %s, %s, %s)
+                ON CONFLICT (restaurant_id, day, customer_id) DO UPDATE SET
+                    orders_count = t.orders_count + EXCLUDED.orders_count,
+                    total_spend = t.total_spend + EXCLUDED.total_spend
+                """,
+                inc,
+            )
+        if dec:
+            cursor.executemany(
+                f"""
+                UPDATE {spend_table}
+                SET orders_count = GREATEST(orders_count - %s, 0),
+                    total_spend = total_spend - %s
+                WHERE restaurant_id = %s AND customer_id = %s AND day = %s
+                """,
+                dec,
+            )
+            cursor.executemany(
+                f"DELETE FROM {spend_table} WHERE restaurant_id = %s AND customer_id = %s AND day = %s AND orders_count = 0",
+                [(r, cu, d) for (_, _, r, cu, d) in dec],
+            )
+
+        customer_spend.apply_deltas(cursor, customer_rows)
+    return versions
+
+
+def touched_days(orders_qs):
+    """Distinct (restaurant_id, day) pairs covered by an Order queryset."""
+    return set(
+        orders_qs.annotate(day=TruncDate("created_at"))
+        .values_list("restaurant_id", "day")
+        .distinct()
+    )
+
+
+def _aggregate(orders_qs):
+    return (
+        orders_qs.annotate(day=TruncDate("created_at"))
+        .values("day", "customer_id")
+        .annotate(orders_count=Count("id"), total_spend=Sum("total_amount"))
+        .order_by()
+    )
+
+
+def _write(restaurant_id, rows, days=()):
+    # days: rebuilt days to keep a (zero) stats row for even without orders
+    per_day = defaultdict(lambda: [0, Decimal("0")])
+    for day in days:
+        per_day[day]
+    spend = []
+    for row in rows:
+        spend.append(CustomerDailySpend(
+            restaurant_id=restaurant_id,
+            customer_id=row["customer_id"],
+            day=row["day"],
+            orders_count=row["orders_count"],
+            total_spend=row["total_spend"],
+        ))
+        totals = per_day[row["day"]]
+        totals[0] += row["orders_count"]
+        totals[1] += row["total_spend"]
+        if len(spend) >= WRITE_BATCH_SIZE:
+            CustomerDailySpend.objects.bulk_create(spend)
+            spend = []
+
+    RestaurantDailyStats.objects.bulk_create(
+        [
+            RestaurantDailyStats(restaurant_id=restaurant_id, day=day, orders_count=count, revenue_total=revenue)
+            for day, (count, revenue) in per_day.items()
+        ],
+        batch_size=WRITE_BATCH_SIZE,
+    )
+    CustomerDailySpend.objects.bulk_create(spend)
+
+
+def rebuild_days(pairs):
+    """Recompute rollups for (restaurant_id, day) pairs from Order."""
+    by_restaurant = defaultdict(set)
+    for restaurant_id, day in pairs:
+        by_restaurant[restaurant_id].add(day)
+
+    customers = set()
+    with transaction.atomic():
+        for restaurant_id, days in by_restaurant.items():
+            spend_qs = CustomerDailySpend.objects.filter(restaurant_id=restaurant_id, day__in=days)
+            customers.update((restaurant_id, c) for c in spend_qs.values_list("customer_id", flat=True))
+            RestaurantDailyStats.objects.filter(restaurant_id=restaurant_id, day__in=days).delete()
+            spend_qs.delete()
+
+            rows = []
+            for day in days:
+                orders_qs = Order.objects.filter(
+                    restaurant_id=restaurant_id,
+                    created_at__gte=day_start(day),
+                    created_at__lt=day_start(day + timedelta(days=1)),
+                )
+                rows.extend(_aggregate(orders_qs))
+            _write(restaurant_id, rows, days)
+            customers.update((restaurant_id, row["customer_id"]) for row in rows)
+        customer_spend.refresh(customers)
+
+
+def rebuild_restaurant(restaurant_id, since=None):
+    """
+    Recompute every rollup row for a restaurant (optionally only days >= since).
+    Used by the backfill_dashboard_rollups management command.
+    """
+    orders_qs = Order.objects.filter(restaurant_id=restaurant_id)
+    stats_qs = RestaurantDailyStats.objects.filter(restaurant_id=restaurant_id)
+    spend_qs = CustomerDailySpend.objects.filter(restaurant_id=restaurant_id)
+    if since is not None:
+        orders_qs = orders_qs.filter(created_at__gte=day_start(since))
+        stats_qs = stats_qs.filter(day__gte=since)
+        spend_qs = spend_qs.filter(day__gte=since)
+
+    with transaction.atomic():
+        stats_qs.delete()
+        spend_qs.delete()
+        _write(restaurant_id, _aggregate(orders_qs).iterator(chunk_size=5000))
+        customer_spend.rebuild_restaurant(restaurant_id)
@@ -1,18 +1,63 @@
+from django.db.models import Value
+from django.db.models.functions import Lower
 from rest_framework import serializers
-from .models import Restaurant, Order, Customer
+from .models import Restaurant, Order, Customer, CustomerSpend
+from .instrumentation import TimedSerializerMixin, TimedListSerializer
 
 
-class RestaurantSerializer(serializers.ModelSerializer):
+class RestaurantSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Restaurant
+        list_serializer_class = TimedListSerializer
         fields = ["id", "name", "created_at"]
 
-class CustomerSerializer(serializers.ModelSerializer):
+class CustomerSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Customer
+        list_serializer_class = TimedListSerializer
         fields = ["id", "restaurant", "email", "created_at"]
 
-class OrderSerializer(serializers.ModelSerializer):
+    def validate(self, attrs):
+        # DRF does not check expression constraints: the case-insensitive
+        # (restaurant, email) one would otherwise surface as an IntegrityError
+        restaurant = attrs.get("restaurant", getattr(self.instance, "restaurant", None))
+        email = attrs.get("email", getattr(self.instance, "email", None))
+        taken = Customer.objects.alias(email_key=Lower("email")).filter(restaurant=restaurant, email_key=Lower(Value(email)))
+        if self.instance is not None:
+            taken = taken.exclude(pk=self.instance.pk)
+        if taken.exists():
+            raise serializers.ValidationError({"email": ["A customer with this email already exists at this restaurant."]})
+        return attrs
+
+class OrderSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Order
-        fields = ["id", "restaurant", "customer", "total_amount", "created_at"]
\ No newline at end of file
+        list_serializer_class = TimedListSerializer
+        fields = ["id", "restaurant", "customer", "total_amount", "created_at"]
+
+class CustomerSpendSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    # A customer plus their spend at one restaurant, for spend-ordered lists
+    id = serializers.IntegerField(source="customer_id")
+    email = serializers.EmailField(source="customer.email")
+    created_at = serializers.DateTimeField(source="customer.created_at")
+
+    class Meta:
+        model = CustomerSpend
+        list_serializer_class = TimedListSerializer
+        fields = [
+            "id", "restaurant", "email", "created_at",
+            "lifetime_orders", "lifetime_spend",
+            "orders_7d", "spend_7d", "orders_30d", "spend_30d", "orders_90d", "spend_90d",
+        ]
+
+class OrderBulkRowSerializer(serializers.Serializer):
+    # Plain ids: FK existence is checked once per batch in api/ingest.py
+    # instead of one PrimaryKeyRelatedField lookup per row.
+    restaurant = serializers.IntegerField(min_value=1)
+    customer = serializers.IntegerField(min_value=1)
+    total_amount = serializers.DecimalField(max_digits=10, decimal_places=2)
+
+class CustomerBulkRowSerializer(serializers.Serializer):
+    # find-or-create by email (api/customers.py); restaurants are checked once per batch
+    restaurant = serializers.IntegerField(min_value=1)
+    email = serializers.EmailField(max_length=254)
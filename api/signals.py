@@ -0,0 +1,98 @@
+"""
+The single write hook for Orders.
+
+Every path that creates, changes or deletes orders ends up in
+record_order_deltas(): model save/delete (views, admin, shell) through the
+receivers below, bulk ingest directly, and OrderQuerySet.update() through
+rollups.rebuild_days() + forget_order_days().
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from . import cohorts, dashboard_cache, rollups, live_dashboard, timeseries
+from .models import Customer, Order
+
+
+def record_order_deltas(deltas, stamps):
+    # deltas: {(restaurant_id, customer_id, day): (orders_count, amount)}
+    # stamps: {(restaurant_id, created_at)} of the orders written, old and new
+    versions = rollups.apply_deltas(deltas)
+    live_dashboard.apply_deltas_on_commit(deltas, versions)
+    _forget_dashboards_on_commit({r for r, _, _ in deltas})
+
+    # Which cached series buckets and cohort weeks are closed is decided at
+    # commit: an order stamped just before a boundary may commit after it.
+    days = {(r, day) for r, _, day in deltas}
+    transaction.on_commit(lambda: timeseries.invalidate_times(stamps), robust=True)
+    transaction.on_commit(lambda: cohorts.invalidate_days(days), robust=True)
+
+
+def forget_order_days(pairs):
+    # For writes that rebuilt whole (restaurant_id, day) pairs, e.g. Order.objects.update()
+    def forget():
+        live_dashboard.forget_days(pairs)
+        timeseries.invalidate_days(pairs)
+        cohorts.invalidate_days(pairs)
+
+    transaction.on_commit(forget, robust=True)
+    _forget_dashboards_on_commit({r for r, _ in pairs})
+
+
+def _forget_dashboards_on_commit(restaurant_ids):
+    # cached dashboards for these restaurants, in Redis and every worker's L1;
+    # registered after the live deltas, which the recompute then reads
+    transaction.on_commit(lambda: dashboard_cache.forget_restaurants(restaurant_ids), robust=True)
+
+
+def _rollup_key(restaurant_id, customer_id, created_at):
+    return (restaurant_id, customer_id, rollups.order_day(created_at))
+
+
+@receiver(pre_save, sender=Order)
+def remember_previous_order(sender, instance, raw=False, **kwargs):
+    # Snapshot the stored row so post_save can move it between rollup rows
+    instance._rollup_previous = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    instance._rollup_previous = (
+        Order._base_manager.filter(pk=instance.pk)
+        .values_list("restaurant_id", "customer_id", "created_at", "total_amount")
+        .first()
+    )
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    deltas = {}
+    stamps = {(instance.restaurant_id, instance.created_at)}
+    previous = getattr(instance, "_rollup_previous", None)
+    if previous is not None:
+        restaurant_id, customer_id, created_at, amount = previous
+        deltas[_rollup_key(restaurant_id, customer_id, created_at)] = (-1, -amount)
+        stamps.add((restaurant_id, created_at))
+
+    key = _rollup_key(instance.restaurant_id, instance.customer_id, instance.created_at)
+    count, amount = deltas.get(key, (0, Decimal("0")))
+    deltas[key] = (count + 1, amount + Decimal(str(instance.total_amount)))
+    record_order_deltas(deltas, stamps)
+
+
+@receiver(post_delete, sender=Order)
+def order_deleted(sender, instance, **kwargs):
+    key = _rollup_key(instance.restaurant_id, instance.customer_id, instance.created_at)
+    record_order_deltas(
+        {key: (-1, -Decimal(str(instance.total_amount)))},
+        {(instance.restaurant_id, instance.created_at)},
+    )
+
+
+@receiver(post_save, sender=Customer)
+def customer_saved(sender, instance, created, raw=False, **kwargs):
+    # Keep the email shown in top_customers in step with customer edits
+    if not raw and not created:
+        live_dashboard.set_email(instance.restaurant_id, instance.pk, instance.email)
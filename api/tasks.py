@@ -1,37 +1,91 @@
 from celery import shared_task
-from django.db.models import Sum, Count
-from django.db.models.functions import Coalesce
-from django.core.cache import cache
 
-from .models import Order, Restaurant
+from . import customer_spend, dashboard_cache, db_routing, exports, hot_dashboards, partitions, purge
+from .dashboard import DEFAULT_WINDOWS
+from .models import Restaurant
 
 
-@shared_task(bind=True, autoretry_for=(Exception,), retry_backoff=True, max_retries=5)
-def recompute_dashboard_cache(self, restaurant_id: int, days: int = 7) -> dict:
+@shared_task(bind=True, autoretry_for=(Exception,), retry_backoff=True, max_retries=5, rate_limit="60/m")
+def recompute_dashboard_cache(self, restaurant_id: int, days: int = 7):
     """
-    Example background task:
-    - recompute dashboard totals
-    - store them in Redis cache
+    Recompute one restaurant's dashboard for a `days` window and store it
+    under the same key (and payload shape) the dashboard view reads.
+    Queued through dashboard_cache.schedule_refresh(), on the
+    dashboard_refresh queue (CELERY_TASK_ROUTES). Returns None for a
+    restaurant that no longer exists.
     """
-    restaurant = Restaurant.objects.get(id=restaurant_id)
+    dashboard_cache.refresh_started(restaurant_id, days, self.request.id)
+    with db_routing.replica():
+        try:
+            restaurant = Restaurant.objects.get(id=restaurant_id)
+        except Restaurant.DoesNotExist:
+            return None  # nothing to retry
+        return dashboard_cache.payload(dashboard_cache.recompute(restaurant, days))
 
-    orders_qs = Order.objects.filter(restaurant=restaurant)
 
-    totals = orders_qs.aggregate(
-        orders_count=Count("id"),
-        revenue_total=Coalesce(Sum("total_amount"), 0),
-    )
+@shared_task
+def warm_dashboard_cache(restaurant_ids=None, windows=DEFAULT_WINDOWS, batch_size: int = 500) -> dict:
+    """
+    Precompute the 7/30/90-day dashboards for many restaurants at once,
+    e.g. after a deploy or a Redis flush. Pass restaurant_ids=None for all.
+    """
+    with db_routing.replica():
+        written = dashboard_cache.warm_dashboards(restaurant_ids, windows=windows, batch_size=batch_size)
+    return {"keys_written": written}
+
+
+@shared_task
+def warm_hot_dashboards(top_k: int = hot_dashboards.TOP_K, batch_size: int = hot_dashboards.BATCH_SIZE,
+                        concurrency: int = hot_dashboards.CONCURRENCY) -> dict:
+    """
+    Beat task: recompute the most read dashboards before their cache
+    entries go stale (see api/hot_dashboards.py). Returns the run's stats.
+    """
+    return hot_dashboards.warm(top_k, batch_size=batch_size, concurrency=concurrency)
+
+
+@shared_task
+def maintain_order_partitions() -> dict:
+    """
+    Beat task: create the coming months' Order partitions and detach the
+    ones past ORDER_PARTITION_RETENTION_MONTHS (see api/partitions.py).
+    """
+    return partitions.maintain()
+
+
+@shared_task
+def export_orders() -> dict:
+    """
+    Append the orders created since the last export to the columnar files
+    under ORDER_EXPORT_DIR (see api/exports.py). Returns the run's stats.
+    """
+    return exports.export_orders()
+
+
+@shared_task
+def roll_customer_spend() -> dict:
+    """
+    Beat task: move the CustomerSpend windows on to today (see
+    api/customer_spend.py). Scheduled often; only the first run of a day
+    does any work.
+    """
+    if customer_spend.rolled_today():
+        return {"rows_changed": 0}
+    return {"rows_changed": customer_spend.roll_windows()}
+
+
+@shared_task(acks_late=True, reject_on_worker_lost=True, autoretry_for=(Exception,), retry_backoff=True, max_retries=5)
+def purge_deleted(kind: str, pk: int):
+    """
+    Remove a soft-deleted restaurant or customer ("restaurant"/"customer")
+    and its rows in batches (see api/purge.py). Acked late, so a purge cut
+    short by a worker crash is redelivered; resume_stalled_purges catches
+    the rest. Returns the purge's progress.
+    """
+    return purge.purge(kind, pk)
 
-    data = {
-        "restaurant": {"id": restaurant.id, "name": restaurant.name},
-        "window_days": days,
-        "totals": {
-            "orders_count": totals["orders_count"],
-            "revenue_total": str(totals["revenue_total"]),
-        },
-        "generated_by": "celery",
-    }
 
-    cache_key = f"dashboard:restaurant:{restaurant_id}:days:{days}"
-    cache.set(cache_key, data, timeout=60)
-    return data
\ No newline at end of file
+@shared_task
+def resume_stalled_purges() -> dict:
+    """Beat task: re-queue deletions whose purge stopped making progress."""
+    return {"queued": purge.resume_stalled()}
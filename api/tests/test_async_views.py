@@ -0,0 +1,68 @@
+import pytest
+from unittest.mock import patch
+from decimal import Decimal
+from django.core.cache import cache
+from rest_framework.test import APIRequestFactory
+
+from api import async_cache, instrumentation, views
+from api.tests.factories import RestaurantFactory, CustomerFactory, OrderFactory
+
+
+@pytest.mark.django_db
+def test_async_detail_gets_match_sync_views(api_client):
+    r = RestaurantFactory()
+    c = CustomerFactory(restaurant=r)
+    o = OrderFactory(restaurant=r, customer=c, total_amount=Decimal("12.50"))
+    factory = APIRequestFactory()
+
+    for path, view, pk in [
+        ("/api/restaurants/{}/", views.restaurant_detail, r.id),
+        ("/api/customers/{}/", views.customer_detail, c.id),
+        ("/api/orders/{}/", views.order_detail, o.id),
+    ]:
+        resp = api_client.get(path.format(pk))
+        expected = view(factory.get(path.format(pk)), pk=pk)
+        expected.render()
+        assert resp.status_code == 200
+        assert resp.content == expected.content
+
+    assert api_client.get("/api/orders/999999/").json() == {"detail": "Not found."}
+
+
+@pytest.mark.django_db
+def test_async_detail_hands_writes_to_sync_view(api_client):
+    r = RestaurantFactory(name="Old")
+
+    resp = api_client.put(f"/api/restaurants/{r.id}/", {"name": "New"}, format="json")
+    assert resp.status_code == 200
+    assert api_client.get(f"/api/restaurants/{r.id}/").json()["name"] == "New"
+
+
+@pytest.mark.django_db
+def test_async_dashboard_batch_matches_sync_dashboard(api_client):
+    cache.clear()
+    r = RestaurantFactory()
+    c = CustomerFactory(restaurant=r, email="a@example.com")
+    OrderFactory(restaurant=r, customer=c, total_amount=Decimal("10.00"))
+
+    single = api_client.get(f"/api/restaurants/{r.id}/dashboard/?days=30").json()
+    cache.clear()
+    batch = api_client.get(f"/api/dashboards/?ids={r.id},999999&days=30").json()
+
+    assert batch["results"] == [single]
+    assert batch["not_found"] == [999999]
+    assert single["totals"]["revenue_total"] == "10.00"
+    assert single["top_customers"][0]["email"] == "a@example.com"
+
+
+@pytest.mark.django_db
+def test_async_dashboard_closes_its_redis_client_under_wsgi(api_client):
+    # the test client, like runserver and WSGI servers, gives each async view a loop of its own
+    cache.clear()
+    r = RestaurantFactory()
+    aclose = instrumentation.InstrumentedAsyncRedis.aclose
+    with patch.object(instrumentation.InstrumentedAsyncRedis, "aclose", autospec=True, side_effect=aclose) as closed:
+        assert api_client.get(f"/api/restaurants/{r.id}/dashboard/?days=7").status_code == 200
+        assert api_client.get(f"/api/dashboards/?ids={r.id}&days=7").status_code == 200
+    assert closed.call_count == 2
+    assert not list(async_cache._clients)
@@ -0,0 +1,73 @@
+import json
+
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+
+from api.models import Restaurant, Customer, Order, RestaurantDailyStats
+
+
+@pytest.mark.django_db
+def test_generate_fake_data_skews_restaurant_sizes():
+    call_command("generate_fake_data", restaurants=5, customers=50, orders=2000, days=30, seed=1)
+
+    sizes = sorted(
+        (Order.objects.filter(restaurant=r).count() for r in Restaurant.objects.all()),
+        reverse=True,
+    )
+    assert sum(sizes) == 2000
+    assert sizes[0] > 3 * sizes[-1]
+    assert Customer.objects.count() >= 50
+    assert RestaurantDailyStats.objects.exists()
+
+
+@pytest.mark.django_db
+def test_benchmark_writes_json_report(tmp_path):
+    call_command("generate_fake_data", restaurants=3, customers=20, orders=300, days=10, seed=2)
+
+    cache.set("purge:restaurant:1", "queued")  # cold mode drops only what the scenarios cache
+    output = tmp_path / "bench.json"
+    call_command(
+        "benchmark",
+        scenarios=["dashboard", "order_list_page"],
+        iterations=3,
+        sample=2,
+        host="testserver",
+        output=str(output),
+    )
+
+    report = json.loads(output.read_text())
+    assert report["dataset"]["orders"] == 300
+    assert {(r["scenario"], r["mode"]) for r in report["results"]} == {
+        ("dashboard", "cold"), ("dashboard", "warm"),
+        ("order_list_page", "cold"), ("order_list_page", "warm"),
+    }
+    for result in report["results"]:
+        assert result["latency_ms"]["p50"] <= result["latency_ms"]["p99"]
+        assert result["status_codes"] == {"200": 3}
+    assert cache.get("purge:restaurant:1") == "queued"
+
+
+@pytest.mark.django_db(transaction=True)
+def test_benchmark_compares_sync_and_async_views(tmp_path):
+    # transaction=True: concurrent requests run in their own threads and connections
+    call_command("generate_fake_data", restaurants=2, customers=10, orders=100, days=10, seed=3)
+
+    output = tmp_path / "bench.json"
+    call_command(
+        "benchmark",
+        scenarios=["dashboard", "restaurant_detail", "order_list_page"],
+        concurrency=4,
+        iterations=8,
+        sample=2,
+        output=str(output),
+    )
+
+    report = json.loads(output.read_text())
+    assert {(r["scenario"], r["mode"]) for r in report["results"]} == {
+        ("dashboard", "sync-c4"), ("dashboard", "async-c4"),
+        ("restaurant_detail", "sync-c4"), ("restaurant_detail", "async-c4"),
+    }
+    for result in report["results"]:
+        assert result["status_codes"] == {"200": 8}
+        assert result["throughput_rps"] > 0
@@ -0,0 +1,51 @@
+import json
+from decimal import Decimal
+
+import pytest
+
+from api import ingest
+from api.models import Order, RestaurantDailyStats
+from api.tests.factories import RestaurantFactory, CustomerFactory
+
+
+@pytest.mark.django_db
+def test_bulk_create_reports_per_row_errors(api_client):
+    r = RestaurantFactory()
+    c = CustomerFactory(restaurant=r)
+
+    payload = [
+        {"restaurant": r.id, "customer": c.id, "total_amount": "10.00"},
+        {"restaurant": r.id, "customer": 999999, "total_amount": "5.00"},
+        {"restaurant": r.id, "customer": c.id, "total_amount": "not-a-number"},
+        {"restaurant": r.id, "customer": c.id, "total_amount": "2.50"},
+    ]
+    resp = api_client.post("/api/orders/bulk/", payload, format="json")
+    assert resp.status_code == 201
+
+    body = resp.json()
+    assert body["created"] == 2
+    assert [e["index"] for e in body["errors"]] == [1, 2]
+    assert "customer" in body["errors"][0]["errors"]
+    assert "total_amount" in body["errors"][1]["errors"]
+
+    assert Order.objects.filter(restaurant=r).count() == 2
+    assert RestaurantDailyStats.objects.get(restaurant=r).revenue_total == Decimal("12.50")
+
+
+@pytest.mark.django_db
+def test_bulk_create_accepts_ndjson_and_copy(api_client, monkeypatch):
+    monkeypatch.setattr(ingest, "COPY_THRESHOLD", 3)
+    r = RestaurantFactory()
+    c = CustomerFactory(restaurant=r)
+
+    body = "\n".join(
+        json.dumps({"restaurant": r.id, "customer": c.id, "total_amount": "1.00"}) for _ in range(5)
+    )
+    resp = api_client.post("/api/orders/bulk/", body, content_type="application/x-ndjson")
+    assert resp.status_code == 201
+    assert resp.json()["created"] == 5
+
+    assert Order.objects.filter(restaurant=r).count() == 5
+    stats = RestaurantDailyStats.objects.get(restaurant=r)
+    assert stats.orders_count == 5
+    assert stats.revenue_total == Decimal("5.00")
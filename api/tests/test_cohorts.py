@@ -0,0 +1,57 @@
+import pytest
+from datetime import datetime, time, timedelta
+from django.core.cache import cache
+from django.utils import timezone
+
+from api.cohorts import compute_cohorts, week_start
+from api.models import Order
+from api.tests.factories import RestaurantFactory, CustomerFactory, OrderFactory
+
+
+def order_on(restaurant, customer, day):
+    order = OrderFactory(restaurant=restaurant, customer=customer)
+    if day != timezone.localdate():
+        Order.objects.filter(pk=order.pk).update(created_at=timezone.make_aware(datetime.combine(day, time(12))))
+    return order
+
+
+@pytest.mark.django_db
+def test_cohort_retention_by_first_order_week(api_client, django_assert_num_queries, django_capture_on_commit_callbacks):
+    cache.clear()
+    r = RestaurantFactory()
+    today = timezone.localdate()
+    w0 = week_start(today)
+    w1, w2, w5 = (w0 - timedelta(weeks=n) for n in (1, 2, 5))
+    a, b, c, d, e = CustomerFactory.create_batch(5, restaurant=r)
+    for customer, days in (
+        (a, [w2, w1, today]),
+        (b, [w2, w2 + timedelta(days=1)]),
+        (c, [w1, today]),
+        (d, [w5, w1]),  # an older cohort than the window shows
+        (e, [today]),
+    ):
+        for day in days:
+            order_on(r, customer, day)
+
+    with django_assert_num_queries(2):  # closed weeks, then the current one
+        result = compute_cohorts(r, weeks=3)
+    assert result["from"] == w2.isoformat()
+    assert [(row["week"], row["customers"], row["active"], row["retention"]) for row in result["cohorts"]] == [
+        (w2.isoformat(), 2, [2, 1, 1], [100.0, 50.0, 50.0]),
+        (w1.isoformat(), 1, [1, 1], [100.0, 100.0]),
+        (w0.isoformat(), 1, [1], [100.0]),
+    ]
+
+    # closed weeks come from the cache; this week's orders still count
+    order_on(r, b, today)
+    with django_assert_num_queries(1):
+        assert compute_cohorts(r, weeks=3)["cohorts"][0]["active"] == [2, 1, 2]
+
+    # an order written into a closed week invalidates them
+    with django_capture_on_commit_callbacks(execute=True):
+        order_on(r, b, w1)
+    assert compute_cohorts(r, weeks=3)["cohorts"][0]["active"] == [2, 2, 2]
+
+    resp = api_client.get(f"/api/restaurants/{r.id}/cohorts/?weeks=3")
+    assert resp.status_code == 200 and resp.json()["current_week"] == w0.isoformat()
+    assert api_client.get(f"/api/restaurants/{r.id}/cohorts/?weeks=53").status_code == 400
@@ -0,0 +1,104 @@
+import pytest
+from datetime import timedelta
+from decimal import Decimal
+from django.core.cache import cache
+from django.db import connection
+from django.utils import timezone
+
+from api import customer_spend
+from api.dashboard import compute_dashboard
+from api.models import Order, CustomerSpend
+from api.tests.factories import RestaurantFactory, CustomerFactory, OrderFactory
+
+
+def spend_row(restaurant, customer):
+    return CustomerSpend.objects.filter(restaurant=restaurant, customer=customer).values_list(
+        "lifetime_orders", "lifetime_spend", "orders_7d", "spend_7d", "orders_30d", "spend_30d", "orders_90d", "spend_90d",
+    ).first()
+
+
+@pytest.mark.django_db
+def test_customer_spend_follows_order_writes():
+    r = RestaurantFactory()
+    c = CustomerFactory(restaurant=r)
+    o1 = OrderFactory(restaurant=r, customer=c, total_amount=Decimal("10.00"))
+    o2 = OrderFactory(restaurant=r, customer=c, total_amount=Decimal("4.00"))
+    assert spend_row(r, c) == (2, Decimal("14.00"), 2, Decimal("14.00"), 2, Decimal("14.00"), 2, Decimal("14.00"))
+
+    # queryset.update() rebuilds whole days; the order leaves the 7 and 30 day windows
+    Order.objects.filter(pk=o2.pk).update(created_at=timezone.now() - timedelta(days=40))
+    assert spend_row(r, c) == (2, Decimal("14.00"), 1, Decimal("10.00"), 1, Decimal("10.00"), 2, Decimal("14.00"))
+
+    o1.delete()
+    assert spend_row(r, c) == (1, Decimal("4.00"), 0, Decimal("0.00"), 0, Decimal("0.00"), 1, Decimal("4.00"))
+    Order.objects.get(pk=o2.pk).delete()
+    assert spend_row(r, c) is None
+
+
+@pytest.mark.django_db
+def test_dashboard_top_customers_from_customer_spend(django_capture_on_commit_callbacks):
+    cache.clear()
+    r = RestaurantFactory()
+    for i, amount in enumerate(["5.00", "30.00", "12.00", "30.00", "1.00", "8.00"]):
+        OrderFactory(restaurant=r, customer=CustomerFactory(restaurant=r, email=f"c{i}@example.com"),
+                     total_amount=Decimal(amount))
+
+    assert not customer_spend.rolled_today()
+    grouped = compute_dashboard(r, 30)["top_customers"]
+    with django_capture_on_commit_callbacks(execute=True):
+        customer_spend.roll_windows()
+    assert customer_spend.rolled_today()
+    assert compute_dashboard(r, 30)["top_customers"] == grouped
+    assert [row["total_spend"] for row in grouped] == ["30.00", "30.00", "12.00", "8.00", "5.00"]
+
+    with connection.cursor() as cursor:
+        cursor.execute("SET LOCAL enable_seqscan = off")
+        cursor.execute("SET LOCAL enable_bitmapscan = off")
+        cursor.execute("EXPLAIN " + """
+            SELECT customer_id FROM api_customerspend WHERE restaurant_id = %s AND orders_30d > 0
+            ORDER BY spend_30d DESC, customer_id LIMIT 5
+        """, [r.id])
+        plan = "\n".join(row[0] for row in cursor.fetchall())
+    assert "customer_spend_30d_idx" in plan
+    assert "Sort" not in plan
+
+
+@pytest.mark.django_db
+def test_roll_windows_drops_days_that_left_the_window(monkeypatch, django_capture_on_commit_callbacks):
+    r = RestaurantFactory()
+    c = CustomerFactory(restaurant=r)
+    OrderFactory(restaurant=r, customer=c, total_amount=Decimal("10.00"))
+
+    later = timezone.localdate() + timedelta(days=8)
+    monkeypatch.setattr(customer_spend.timezone, "localdate", lambda: later)
+    with django_capture_on_commit_callbacks(execute=True):
+        assert customer_spend.roll_windows() == 1
+    assert spend_row(r, c) == (1, Decimal("10.00"), 0, Decimal("0.00"), 1, Decimal("10.00"), 1, Decimal("10.00"))
+
+
+@pytest.mark.django_db
+def test_customer_lists_sort_by_spend(api_client):
+    r = RestaurantFactory()
+    customers = [CustomerFactory(restaurant=r, email=f"c{i}@example.com") for i in range(4)]
+    for customer, amount in zip(customers, ["5.00", "20.00", "20.00", "9.00"]):
+        OrderFactory(restaurant=r, customer=customer, total_amount=Decimal(amount))
+    CustomerFactory(restaurant=r)  # no orders: not in spend-ordered lists
+
+    seen, cursor = [], None
+    while True:
+        url = f"/api/restaurants/{r.id}/customers/?ordering=-lifetime_spend&limit=3" + (f"&cursor={cursor}" if cursor else "")
+        page = api_client.get(url).json()
+        seen += [(row["email"], row["lifetime_spend"]) for row in page["results"]]
+        cursor = page["next"]
+        if cursor is None:
+            break
+    assert seen == [
+        ("c1@example.com", "20.00"), ("c2@example.com", "20.00"), ("c3@example.com", "9.00"), ("c0@example.com", "5.00"),
+    ]
+
+    flat = api_client.get(f"/api/customers/?restaurant={r.id}&ordering=-spend_7d").json()
+    assert [row["id"] for row in flat] == [customers[1].id, customers[2].id, customers[3].id, customers[0].id]
+    assert len(api_client.get(f"/api/restaurants/{r.id}/customers/").json()) == 5
+
+    assert api_client.get("/api/customers/?ordering=-lifetime_spend").status_code == 400
+    assert api_client.get(f"/api/customers/?restaurant={r.id}&ordering=email").status_code == 400
@@ -0,0 +1,66 @@
+import pytest
+from decimal import Decimal
+from django.core.management import call_command
+from django.db import connection
+
+from api.dashboard import compute_dashboards
+from api.models import Customer, CustomerSpend, Order
+from api.tests.factories import RestaurantFactory, CustomerFactory, OrderFactory
+
+
+@pytest.mark.django_db
+def test_bulk_upsert_resolves_emails_case_insensitively(api_client, django_assert_num_queries):
+    r1, r2 = RestaurantFactory(), RestaurantFactory()
+    existing = CustomerFactory(restaurant=r1, email="Ann@Example.com")
+    payload = [
+        {"restaurant": r1.id, "email": "ann@example.COM"},
+        {"restaurant": r1.id, "email": "new@example.com"},
+        {"restaurant": r1.id, "email": "NEW@example.com"},
+        {"restaurant": r2.id, "email": "ann@example.com"},
+        {"restaurant": 999999, "email": "x@example.com"},
+        {"restaurant": r1.id, "email": "not-an-email"},
+    ]
+
+    with django_assert_num_queries(2):  # restaurant check + one upsert statement
+        resp = api_client.post("/api/customers/bulk/", payload, format="json")
+    assert resp.status_code == 200
+    body = resp.json()
+    new = Customer.objects.get(restaurant=r1, email="new@example.com")
+    other = Customer.objects.get(restaurant=r2)
+    assert [(row["index"], row["id"], row["created"]) for row in body["customers"]] == [
+        (0, existing.id, False), (1, new.id, True), (2, new.id, False), (3, other.id, True),
+    ]
+    assert [e["index"] for e in body["errors"]] == [4, 5]
+
+    again = api_client.post("/api/customers/bulk/", payload[:4], format="json").json()["customers"]
+    assert [row["id"] for row in again] == [existing.id, new.id, new.id, other.id]
+    assert not any(row["created"] for row in again)
+
+    dup = api_client.post("/api/customers/", {"restaurant": r1.id, "email": "ANN@example.com"}, format="json")
+    assert dup.status_code == 400 and "email" in dup.json()
+
+
+@pytest.mark.django_db
+def test_merge_duplicate_customers_moves_orders_and_rollups():
+    with connection.cursor() as cursor:  # duplicates from before the constraint (rolled back with the test)
+        cursor.execute("DROP INDEX uniq_live_customer_email")
+    r = RestaurantFactory()
+    kept = CustomerFactory(restaurant=r, email="ann@example.com")
+    dup = CustomerFactory(restaurant=r, email="ANN@example.com")
+    other = CustomerFactory(restaurant=r, email="bob@example.com")
+    OrderFactory(restaurant=r, customer=kept, total_amount=Decimal("10.00"))
+    OrderFactory(restaurant=r, customer=dup, total_amount=Decimal("5.00"))
+    OrderFactory(restaurant=r, customer=other, total_amount=Decimal("1.00"))
+    assert compute_dashboards([r], [7])[(r.id, 7)]["totals"]["unique_customers"] == 3
+
+    call_command("merge_duplicate_customers", batch_size=1)
+
+    assert not Customer.objects.filter(pk=dup.pk).exists()
+    assert Order.objects.filter(customer=kept).count() == 2
+    totals = compute_dashboards([r], [7])[(r.id, 7)]
+    assert totals["totals"]["unique_customers"] == 2
+    assert totals["top_customers"][0] == {
+        "customer_id": kept.id, "email": "ann@example.com", "total_spend": "15.00", "orders": 2,
+    }
+    assert CustomerSpend.objects.get(customer=kept).lifetime_spend == Decimal("15.00")
+    assert not CustomerSpend.objects.filter(customer_id=dup.pk).exists()
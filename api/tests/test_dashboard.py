@@ -3,7 +3,9 @@ from decimal import Decimal
 from django.core.cache import cache
 from django.utils import timezone
 from datetime import timedelta
+from rest_framework.renderers import JSONRenderer
 
+from api import dashboard_cache, live_dashboard, tasks
 from api.models import Order
 from api.tests.factories import (
     RestaurantFactory,
@@ -75,4 +77,110 @@ def test_dashboard_uses_cache(api_client):
     assert resp2.status_code == 200
     data2 = resp2.json()
 
-    assert data2["totals"]["revenue_total"] == data1["totals"]["revenue_total"]
\ No newline at end of file
+    assert data2["totals"]["revenue_total"] == data1["totals"]["revenue_total"]
+
+@pytest.mark.django_db
+def test_dashboard_serves_stale_entry_and_schedules_one_refresh(api_client, monkeypatch):
+    cache.clear()
+    dashboard_cache.requests_total.reset()
+
+    r = RestaurantFactory()
+    c = CustomerFactory(restaurant=r)
+    OrderFactory(restaurant=r, customer=c, total_amount=Decimal("10.00"))
+    api_client.get(f"/api/restaurants/{r.id}/dashboard/?days=7")
+
+    # push the entry past its soft TTL
+    key = f"dashboard:restaurant:{r.id}:days:7"
+    entry = cache.get(key)
+    entry["fresh_until"] = 0
+    cache.set(key, entry)
+
+    scheduled = []
+    monkeypatch.setattr(tasks.recompute_dashboard_cache, "apply_async", lambda args, **kwargs: scheduled.append(args))
+
+    for _ in range(3):
+        resp = api_client.get(f"/api/restaurants/{r.id}/dashboard/?days=7")
+        assert resp.status_code == 200
+        assert resp.json()["totals"]["revenue_total"] == "10.00"
+
+    assert scheduled == [(r.id, 7)]  # single-flight: one refresh for three stale hits
+    assert dashboard_cache.stats()["stale"] == 3
+    assert dashboard_cache.stats()["miss"] == 1
+
+
+@pytest.mark.django_db
+def test_dashboard_miss_waits_for_lock_holder(api_client, monkeypatch):
+    cache.clear()
+
+    r = RestaurantFactory()
+    monkeypatch.setattr(dashboard_cache, "LOCK_WAIT", 0.2)
+    assert dashboard_cache.acquire_lock(r.id, 7)
+
+    computed = []
+    real_read = live_dashboard.aread_dashboard
+
+    async def counting_read(*args):
+        computed.append(args)
+        return await real_read(*args)
+
+    monkeypatch.setattr(live_dashboard, "aread_dashboard", counting_read)
+
+    # lock held elsewhere and no entry appears: fall back to computing after LOCK_WAIT
+    resp = api_client.get(f"/api/restaurants/{r.id}/dashboard/?days=7")
+    assert resp.status_code == 200
+    assert len(computed) == 1
+
+
+@pytest.mark.django_db
+def test_batch_dashboard_matches_single_and_reuses_cache(api_client, django_assert_max_num_queries):
+    cache.clear()
+
+    restaurants = RestaurantFactory.create_batch(3)
+    for i, r in enumerate(restaurants):
+        c = CustomerFactory(restaurant=r)
+        OrderFactory(restaurant=r, customer=c, total_amount=Decimal("10.00") * (i + 1))
+
+    # warm one restaurant through the single endpoint
+    single = api_client.get(f"/api/restaurants/{restaurants[0].id}/dashboard/?days=30").json()
+
+    ids = ",".join(str(r.id) for r in restaurants)
+    with django_assert_max_num_queries(5):
+        resp = api_client.get(f"/api/dashboards/?ids={ids},999999&days=30")
+    assert resp.status_code == 200
+    body = resp.json()
+
+    assert [d["restaurant"]["id"] for d in body["results"]] == [r.id for r in restaurants]
+    assert body["results"][0] == single
+    assert [d["totals"]["revenue_total"] for d in body["results"]] == ["10.00", "20.00", "30.00"]
+    assert body["not_found"] == [999999]
+
+    # everything found is cached now: no queries at all
+    with django_assert_max_num_queries(0):
+        api_client.get(f"/api/dashboards/?ids={restaurants[1].id},{restaurants[2].id}&days=30")
+
+
+@pytest.mark.django_db
+def test_dashboard_hits_send_cached_json_with_etag(api_client, settings):
+    cache.clear()
+    settings.DASHBOARD_CACHE_COMPRESS_MIN_BYTES = 0
+
+    r = RestaurantFactory()
+    c = CustomerFactory(restaurant=r, email="a@example.com")
+    OrderFactory(restaurant=r, customer=c, total_amount=Decimal("10.00"))
+    url = f"/api/restaurants/{r.id}/dashboard/?days=7"
+
+    first = api_client.get(url)
+    stored = cache.get(f"dashboard:restaurant:{r.id}:days:7")
+    assert stored["codec"] == "zlib" and stored["body"] != first.content
+    entry = dashboard_cache.read_entry(stored)
+    assert entry["body"] == first.content == JSONRenderer().render(dashboard_cache.payload(entry))
+
+    hit = api_client.get(url)
+    assert hit.content == first.content
+    assert hit["Content-Type"] == "application/json"
+    assert hit["ETag"] == first["ETag"] == entry["etag"]
+
+    polled = api_client.get(url, HTTP_IF_NONE_MATCH=hit["ETag"])
+    assert polled.status_code == 304
+    assert polled.content == b""
+    assert api_client.get(url, HTTP_IF_NONE_MATCH='"stale"').status_code == 200
@@ -0,0 +1,89 @@
+import pytest
+from datetime import timedelta
+from unittest.mock import patch
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.db import router
+from django.test import RequestFactory, override_settings
+from django.utils import timezone
+from django.utils.connection import ConnectionDoesNotExist
+
+from api import cohorts, dashboard_cache, db_routing, live_dashboard, rollups, timeseries
+from api.dashboard import DASHBOARD_CACHE_TIMEOUT
+from api.db_routing import PIN_COOKIE, replica, replica_reads
+from api.models import Order
+from api.tests.factories import RestaurantFactory, CustomerFactory, OrderFactory
+
+
+@override_settings(DATABASE_REPLICAS=["replica_a"])
+def test_router_sends_only_opted_in_reads_to_replicas():
+    assert router.db_for_read(Order) == "default"
+    with replica():
+        assert router.db_for_read(Order) == "replica_a"
+        assert router.db_for_write(Order) == "default"
+    assert router.db_for_read(Order) == "default"
+
+    with override_settings(DATABASE_REPLICAS=[]), replica():
+        assert router.db_for_read(Order) == "default"
+
+
+@override_settings(DATABASE_REPLICAS=["replica_a"])
+def test_replica_reads_keep_writers_on_the_primary():
+    factory = RequestFactory()
+
+    @replica_reads
+    def view(request):
+        return router.db_for_read(Order)
+
+    @replica_reads
+    async def async_view(request):
+        return router.db_for_read(Order)
+
+    pinned = factory.get("/")
+    pinned.COOKIES[PIN_COOKIE] = "1"
+    for handler in (view, async_to_sync(async_view)):
+        assert handler(factory.get("/")) == "replica_a"
+        assert handler(pinned) == "default"
+        assert handler(factory.post("/")) == "default"
+
+
+@pytest.mark.django_db
+def test_writes_pin_the_client_to_the_primary(api_client, settings):
+    settings.DB_PRIMARY_PIN_SECONDS = 7
+
+    resp = api_client.get("/api/restaurants/")
+    assert PIN_COOKIE not in resp.cookies
+
+    resp = api_client.post("/api/restaurants/", {"name": "New"}, format="json")
+    assert resp.status_code == 201
+    assert resp.cookies[PIN_COOKIE]["max-age"] == 7
+    assert PIN_COOKIE in api_client.cookies  # sent with the client's next reads
+
+
+@pytest.mark.django_db
+@override_settings(DATABASE_REPLICAS=["replica_a"])  # not a configured database: a read sent there fails
+def test_reads_whose_results_are_kept_stay_on_the_primary():
+    cache.clear()
+    r = RestaurantFactory()
+    OrderFactory(restaurant=r, customer=CustomerFactory(restaurant=r))
+    today = timezone.localdate()
+
+    with replica():
+        assert live_dashboard.read_dashboard(r, 7)["totals"]["orders_count"] == 1  # seeds the counters
+        series = timeseries.compute_series(r, "day", rollups.day_start(today - timedelta(days=6)),
+                                           rollups.day_start(today + timedelta(days=1)))
+        assert sum(point["orders_count"] for point in series["series"]) == 1
+        assert cohorts.compute_cohorts(r, 4)["cohorts"][-1]["customers"] == 1
+
+        # dashboard payloads only while the replica is less than a fresh TTL behind
+        with patch.object(db_routing, "replica_lag", return_value=DASHBOARD_CACHE_TIMEOUT + 1):
+            payloads, missing = dashboard_cache.get_dashboards([r.id], 30)
+        assert list(payloads) == [r.id] and not missing
+        cache.clear()
+        with patch.object(db_routing, "replica_lag", return_value=0), pytest.raises(ConnectionDoesNotExist):
+            dashboard_cache.get_dashboards([r.id], 30)
+
+
+@pytest.mark.django_db
+def test_replica_lag_of_the_primary_is_zero():
+    assert db_routing.replica_lag("default") == 0
@@ -0,0 +1,69 @@
+import pytest
+from decimal import Decimal
+from rest_framework.renderers import JSONRenderer
+
+from api.fast_serializers import row_encoder
+from api.models import Restaurant, Customer, Order
+from api.serializers import RestaurantSerializer, CustomerSerializer, OrderSerializer
+from api.tests.factories import RestaurantFactory, CustomerFactory, OrderFactory
+
+
+@pytest.mark.django_db
+def test_row_encoder_output_is_byte_identical_to_serializer():
+    r = RestaurantFactory(name='Café "Ünïcode" \\ line')
+    c = CustomerFactory(restaurant=r)
+    OrderFactory(restaurant=r, customer=c, total_amount=Decimal("12.50"))
+    OrderFactory(restaurant=r, customer=c, total_amount=Decimal("0.05"))
+
+    renderer = JSONRenderer()
+    for model, serializer_class in [
+        (Restaurant, RestaurantSerializer),
+        (Customer, CustomerSerializer),
+        (Order, OrderSerializer),
+    ]:
+        queryset = model.objects.order_by("id")
+        encoder = row_encoder(serializer_class)
+        assert encoder is not None
+        expected = renderer.render(serializer_class(queryset, many=True).data)
+        assert encoder.encode(queryset.values_list(*encoder.columns)) == expected
+
+
+@pytest.mark.django_db
+def test_order_list_fast_path_matches_serializer_on_every_mode(api_client, django_assert_num_queries):
+    r = RestaurantFactory()
+    c = CustomerFactory(restaurant=r)
+    for i in range(5):
+        OrderFactory(restaurant=r, customer=c, total_amount=Decimal("10.00") + i)
+
+    renderer = JSONRenderer()
+    ordered = Order.objects.order_by("created_at", "id")
+
+    with django_assert_num_queries(1):
+        plain = api_client.get("/api/orders/")
+    assert plain.content == renderer.render(OrderSerializer(Order.objects.all(), many=True).data)
+
+    page = api_client.get("/api/orders/?limit=3")
+    expected = OrderSerializer(ordered[:3], many=True).data
+    assert page.json()["results"] == expected
+    assert page.content.startswith(b'{"next":"')
+    rest = api_client.get(f"/api/orders/?limit=3&cursor={page.json()['next']}").json()
+    assert rest == {"next": None, "results": OrderSerializer(ordered[3:], many=True).data}
+
+    stream = b"".join(api_client.get("/api/orders/?stream=json").streaming_content)
+    assert stream == renderer.render(OrderSerializer(ordered, many=True).data)
+
+
+def test_serializers_with_computed_fields_take_the_slow_path():
+    from rest_framework import serializers
+
+    class WithMethodField(serializers.ModelSerializer):
+        label = serializers.SerializerMethodField()
+
+        class Meta:
+            model = Restaurant
+            fields = ["id", "label"]
+
+        def get_label(self, obj):
+            return obj.name.upper()
+
+    assert row_encoder(WithMethodField) is None
@@ -0,0 +1,38 @@
+import pytest
+from decimal import Decimal
+from django.core.cache import cache
+
+from api import hot_dashboards
+from api.dashboard import dashboard_cache_key
+from api.tests.factories import RestaurantFactory, CustomerFactory, OrderFactory
+
+
+# transaction=True: the warmer's pool threads read through their own connections
+@pytest.mark.django_db(transaction=True)
+def test_warmer_recomputes_the_most_read_dashboards(api_client, monkeypatch):
+    cache.clear()
+    monkeypatch.setattr(hot_dashboards, "FLUSH_INTERVAL", 0)
+    hot_dashboards._take()
+
+    a, b, c = RestaurantFactory.create_batch(3)
+    for r in (a, b, c):
+        OrderFactory(restaurant=r, customer=CustomerFactory(restaurant=r), total_amount=Decimal("5.00"))
+    for _ in range(5):
+        api_client.get(f"/api/restaurants/{a.id}/dashboard/?days=7")
+    for _ in range(2):
+        api_client.get(f"/api/dashboards/?ids={a.id},{b.id}&days=30")
+        api_client.get(f"/api/dashboards/?ids={b.id}&days=30")
+    api_client.get(f"/api/restaurants/{c.id}/dashboard/?days=90")
+
+    assert [row[:2] for row in hot_dashboards.hottest(3)] == [(a.id, 7), (b.id, 30), (a.id, 30)]
+
+    # after a Redis flush only the hottest keys come back
+    cache.delete_many([dashboard_cache_key(r.id, days) for r in (a, b, c) for days in (7, 30, 90)])
+    stats = hot_dashboards.warm(top_k=3, batch_size=1, concurrency=2)
+    assert (stats["hot"], stats["due"], stats["keys_warmed"], stats["batches"]) == (3, 3, 3, 3)
+    assert cache.get(dashboard_cache_key(a.id, 7)) is not None
+    assert cache.get(dashboard_cache_key(c.id, 90)) is None
+
+    # entries that stay fresh past the next run are left alone; scores decay
+    assert hot_dashboards.warm(top_k=3)["keys_warmed"] == 0
+    assert hot_dashboards.hottest(1)[0][2] == pytest.approx(5 * hot_dashboards.DECAY ** 2)
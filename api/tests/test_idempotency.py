@@ -0,0 +1,88 @@
+import pytest
+from unittest.mock import patch
+from django.core.cache import cache
+from django.http import HttpResponse
+
+from api import idempotency
+from api.models import Order
+from api.tests.factories import RestaurantFactory, CustomerFactory
+
+
+@pytest.mark.django_db
+def test_retried_order_post_is_replayed(api_client, django_assert_num_queries):
+    cache.clear()
+    idempotency.requests_total.reset()
+    r = RestaurantFactory()
+    c = CustomerFactory(restaurant=r)
+    payload = {"restaurant": r.id, "customer": c.id, "total_amount": "12.50"}
+
+    first = api_client.post("/api/orders/", payload, format="json", HTTP_IDEMPOTENCY_KEY="pos-1-attempt")
+    assert first.status_code == 201 and idempotency.REPLAYED_HEADER not in first
+    with django_assert_num_queries(0):
+        retry = api_client.post("/api/orders/", payload, format="json", HTTP_IDEMPOTENCY_KEY="pos-1-attempt")
+    assert retry.status_code == 201 and retry[idempotency.REPLAYED_HEADER] == "true"
+    assert retry.content == first.content
+    assert Order.objects.count() == 1
+
+    changed = api_client.post("/api/orders/", {**payload, "total_amount": "99.00"}, format="json",
+                              HTTP_IDEMPOTENCY_KEY="pos-1-attempt")
+    assert changed.status_code == 422
+    assert api_client.post("/api/orders/", payload, format="json").status_code == 201  # no key, no replay
+    assert Order.objects.count() == 2
+    assert api_client.post("/api/orders/", payload, format="json", HTTP_IDEMPOTENCY_KEY="").status_code == 400
+
+    # validation errors are replayed too; only 5xx responses run again
+    invalid = {**payload, "customer": 999999}
+    assert api_client.post("/api/orders/", invalid, format="json", HTTP_IDEMPOTENCY_KEY="bad").status_code == 400
+    assert api_client.post("/api/orders/", invalid, format="json", HTTP_IDEMPOTENCY_KEY="bad")[
+        idempotency.REPLAYED_HEADER] == "true"
+
+    assert idempotency.requests_total.value(result="executed") == 2
+    assert idempotency.requests_total.value(result="replayed") == 2
+    assert idempotency.requests_total.value(result="mismatch") == 1
+
+
+@pytest.mark.django_db
+def test_concurrent_duplicate_waits_for_the_first_attempt(api_client):
+    cache.clear()
+    r = RestaurantFactory()
+    c = CustomerFactory(restaurant=r)
+    payload = {"restaurant": r.id, "customer": c.id, "total_amount": "3.00"}
+    key = "pos-2-attempt"
+    conn = idempotency._redis()
+    conn.set(idempotency.lock_key(key), "first-attempt")  # the first attempt is still running
+
+    def first_attempt_finishes(seconds):
+        cache.set(idempotency.response_key(key), {
+            "fingerprint": "fp", "status": 201, "content_type": "application/json", "body": b'{"id": 1}',
+        })
+
+    with patch.object(idempotency, "_fingerprint", return_value="fp"):
+        with patch.object(idempotency.time, "sleep", side_effect=first_attempt_finishes) as sleep:
+            resp = api_client.post("/api/orders/", payload, format="json", HTTP_IDEMPOTENCY_KEY=key)
+        assert sleep.call_count == 1
+        assert resp.status_code == 201 and resp.content == b'{"id": 1}'
+        assert not Order.objects.exists()
+
+        cache.clear()
+        conn.set(idempotency.lock_key(key), "first-attempt")
+        with patch.object(idempotency, "LOCK_WAIT", 0):
+            resp = api_client.post("/api/orders/", payload, format="json", HTTP_IDEMPOTENCY_KEY=key)
+        assert resp.status_code == 409 and resp["Retry-After"] == "1"
+
+
+def test_an_attempt_only_releases_its_own_lock(rf, settings):
+    cache.clear()
+    settings.IDEMPOTENCY_LOCK_TIMEOUT = 120
+    conn = idempotency._redis()
+    lock = idempotency.lock_key("slow-attempt")
+
+    @idempotency.idempotent
+    def view(request):
+        assert 110 < conn.ttl(lock) <= 120
+        conn.set(lock, "next-attempt")  # as if ours expired and a retry took the key
+        return HttpResponse(b"{}", status=201, content_type="application/json")
+
+    request = rf.post("/api/orders/", b"{}", content_type="application/json", HTTP_IDEMPOTENCY_KEY="slow-attempt")
+    assert view(request).status_code == 201
+    assert conn.get(lock) == b"next-attempt"
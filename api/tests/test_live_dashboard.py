@@ -0,0 +1,86 @@
+import pytest
+from decimal import Decimal
+from django.core.cache import cache
+from django.utils import timezone
+
+from api import live_dashboard
+from api.dashboard import compute_dashboard
+from api.models import Order
+from api.tests.factories import (
+    RestaurantFactory,
+    CustomerFactory,
+    OrderFactory,
+)
+
+
+@pytest.mark.django_db
+def test_live_counters_follow_order_writes(api_client, django_capture_on_commit_callbacks):
+    cache.clear()
+
+    r = RestaurantFactory()
+    customers = [CustomerFactory(restaurant=r, email=f"c{i}@example.com") for i in range(7)]
+    for i, c in enumerate(customers):
+        OrderFactory(restaurant=r, customer=c, total_amount=Decimal("10.00") + i)
+
+    # first read seeds the counters from the rollups
+    assert live_dashboard.read_dashboard(r, 30) == compute_dashboard(r, 30)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        resp = api_client.post(
+            "/api/orders/",
+            {"restaurant": r.id, "customer": customers[0].id, "total_amount": "50.00"},
+            format="json",
+        )
+        assert resp.status_code == 201
+    with django_capture_on_commit_callbacks(execute=True):
+        order = Order.objects.filter(customer=customers[6]).get()
+        api_client.delete(f"/api/orders/{order.id}/")
+
+    live = live_dashboard.read_dashboard(r, 30)
+    assert live == compute_dashboard(r, 30)
+    assert live["totals"]["orders_count"] == 7
+    assert live["totals"]["unique_customers"] == 6
+    assert live["top_customers"][0]["email"] == "c0@example.com"
+    assert live["top_customers"][0]["orders"] == 2
+
+
+@pytest.mark.django_db
+def test_deltas_on_a_day_seeded_without_spend_expire_with_it(django_capture_on_commit_callbacks):
+    cache.clear()
+    r = RestaurantFactory()
+    c = CustomerFactory(restaurant=r)
+    live_dashboard.read_dashboard(r, 1)  # today seeded with no spend rows, so no ZSETs
+
+    with django_capture_on_commit_callbacks(execute=True):
+        order = OrderFactory(restaurant=r, customer=c)
+    conn = live_dashboard._redis()
+    totals_key, spend_key, orders_key = live_dashboard._day_keys(r.id, timezone.localdate(order.created_at))
+    assert conn.exists(spend_key) and conn.exists(orders_key)
+    assert 0 < conn.pttl(spend_key) <= conn.pttl(totals_key) + 1000
+    assert 0 < conn.pttl(orders_key) <= live_dashboard.TODAY_TTL * 1000
+
+
+@pytest.mark.django_db
+def test_a_seed_that_already_includes_a_write_skips_its_delta(django_capture_on_commit_callbacks):
+    cache.clear()
+    r = RestaurantFactory()
+    c = CustomerFactory(restaurant=r)
+    OrderFactory(restaurant=r, customer=c, total_amount=Decimal("5.00"))
+    live_dashboard.read_dashboard(r, 1)
+
+    # committed, but its delta not applied yet when the day is seeded again
+    with django_capture_on_commit_callbacks() as callbacks:
+        OrderFactory(restaurant=r, customer=c, total_amount=Decimal("10.00"))
+    live_dashboard.forget_days({(r.id, timezone.localdate())})
+    live_dashboard.read_dashboard(r, 1)
+    for callback in callbacks:
+        callback()
+
+    live = live_dashboard.read_dashboard(r, 1)
+    assert live == compute_dashboard(r, 1)
+    assert live["totals"]["orders_count"] == 2
+    assert live["top_customers"][0]["total_spend"] == "15.00"
+
+    with django_capture_on_commit_callbacks(execute=True):  # later writes still count
+        OrderFactory(restaurant=r, customer=c, total_amount=Decimal("1.00"))
+    assert live_dashboard.read_dashboard(r, 1)["totals"]["orders_count"] == 3
@@ -0,0 +1,71 @@
+import time
+import pytest
+from decimal import Decimal
+from django.core.cache import cache
+from django_redis import get_redis_connection
+
+from api import dashboard_cache, local_cache
+from api.local_cache import LRUCache
+from api.tests.factories import RestaurantFactory, CustomerFactory, OrderFactory
+
+
+def test_lru_cache_bounds_and_groups():
+    lru = LRUCache(max_entries=3, max_bytes=100)
+    for key in "abc":
+        lru.set(key, key.upper(), expires=10, group=1, size=10)
+    lru.get("a", now=0)  # a is now the most recently used
+    lru.set("d", "D", expires=10, group=2, size=10)
+    assert [lru.get(key, now=0) for key in "abcd"] == ["A", None, "C", "D"]
+
+    lru.set("big", "x", expires=10, group=2, size=75)  # over the byte cap: drops the oldest
+    assert lru.get("a", now=0) is None and lru.nbytes <= 100
+    lru.set("huge", "x", expires=10, group=2, size=101)
+    assert lru.get("huge", now=0) is None
+
+    assert lru.get("d", now=10) is None  # expired
+    assert lru.evict_groups([2]) == 1
+    assert len(lru) == 1 and lru.get("c", now=0) == "C"
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return predicate()
+
+
+@pytest.mark.django_db
+def test_order_writes_evict_l1_dashboards(api_client, settings, django_capture_on_commit_callbacks):
+    settings.DASHBOARD_L1_TTL = 5
+    cache.clear()
+    dashboard_cache.tier_requests_total.reset()
+    assert _wait_for(local_cache._local().subscribed.is_set)
+
+    r = RestaurantFactory()
+    c = CustomerFactory(restaurant=r)
+    OrderFactory(restaurant=r, customer=c, total_amount=Decimal("10.00"))
+    url = f"/api/restaurants/{r.id}/dashboard/?days=7"
+
+    api_client.get(url)  # computed into Redis
+    api_client.get(url)  # Redis hit, kept in the L1
+    cache.clear()
+    assert api_client.get(url).json()["totals"]["revenue_total"] == "10.00"  # served without Redis
+    tiers = dashboard_cache.tier_stats()
+    assert (tiers["l1"]["hits"], tiers["l2"]["hits"], tiers["l2"]["misses"]) == (1, 1, 1)
+    assert tiers["l1"]["entries"] >= 1
+
+    local_cache.clear()
+    api_client.get(url)
+    api_client.get(url)  # in Redis and the L1 again
+    with django_capture_on_commit_callbacks(execute=True):
+        resp = api_client.post("/api/orders/", {"restaurant": r.id, "customer": c.id, "total_amount": "5.00"}, format="json")
+    assert resp.status_code == 201
+    assert local_cache.get((r.id, 7)) is None
+    assert api_client.get(url).json()["totals"]["revenue_total"] == "15.00"  # Redis dropped it too
+
+    # another process's write arrives over pub/sub
+    api_client.get(url)
+    api_client.get(url)
+    assert local_cache.get((r.id, 7)) is not None
+    get_redis_connection("default").publish(local_cache.CHANNEL, str(r.id))
+    assert _wait_for(lambda: local_cache.get((r.id, 7)) is None)
@@ -0,0 +1,65 @@
+import pytest
+from decimal import Decimal
+from django.core.cache import cache
+
+from api import metrics
+from api.middleware import request_duration, request_queries
+from api.tests.factories import RestaurantFactory, CustomerFactory, OrderFactory
+
+DASHBOARD_ROUTE = "api/restaurants/<int:pk>/dashboard/"
+
+
+def test_render_histogram_in_prometheus_format():
+    h = metrics.Histogram("test_seconds", "Test histogram.", ("route",), buckets=(0.1, 1.0))
+    h.observe(0.05, route="a")
+    h.observe(0.1, route="a")
+    h.observe(5, route="a")
+    metrics.REGISTRY["test_seconds"] = h
+    try:
+        text = metrics.render()
+    finally:
+        del metrics.REGISTRY["test_seconds"]
+
+    assert "# TYPE test_seconds histogram" in text
+    assert 'test_seconds_bucket{route="a",le="0.1"} 2' in text
+    assert 'test_seconds_bucket{route="a",le="1.0"} 2' in text
+    assert 'test_seconds_bucket{route="a",le="+Inf"} 3' in text
+    assert 'test_seconds_count{route="a"} 3' in text
+
+
+@pytest.mark.django_db
+def test_sampled_request_reports_server_timing(api_client, settings):
+    settings.REQUEST_METRICS_SAMPLE_RATE = 1.0
+    cache.clear()
+    request_queries.reset()
+
+    r = RestaurantFactory()
+    c = CustomerFactory(restaurant=r)
+    OrderFactory(restaurant=r, customer=c, total_amount=Decimal("10.00"))
+
+    first = api_client.get(f"/api/restaurants/{r.id}/dashboard/?days=7")
+    timing = first["Server-Timing"]
+    assert 'db;desc="' in timing
+    assert "0 hits, 1 misses" in timing  # cold cache
+    assert "total;dur=" in timing
+
+    second = api_client.get(f"/api/restaurants/{r.id}/dashboard/?days=7")
+    assert "1 hits, 0 misses" in second["Server-Timing"]
+    assert request_queries.count(route=DASHBOARD_ROUTE) == 2
+
+    text = api_client.get("/metrics").content.decode()
+    assert f'http_request_duration_seconds_count{{route="{DASHBOARD_ROUTE}",method="GET",status="200"}}' in text
+    assert f'http_request_cache_lookups_total{{route="{DASHBOARD_ROUTE}",result="hit"}}' in text
+
+
+@pytest.mark.django_db
+def test_unsampled_request_only_records_latency(api_client, settings):
+    settings.REQUEST_METRICS_SAMPLE_RATE = 0
+    request_duration.reset()
+    request_queries.reset()
+
+    resp = api_client.get("/api/restaurants/")
+    assert resp.status_code == 200
+    assert "Server-Timing" not in resp
+    assert request_duration.count(route="api/restaurants/", method="GET", status=200) == 1
+    assert request_queries.count(route="api/restaurants/") == 0
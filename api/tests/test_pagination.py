@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+from api.tests.factories import RestaurantFactory, CustomerFactory, OrderFactory
+
+
+@pytest.mark.django_db
+def test_order_list_keyset_pages_cover_every_row_once(api_client):
+    r = RestaurantFactory()
+    c = CustomerFactory(restaurant=r)
+    ids = {OrderFactory(restaurant=r, customer=c).id for _ in range(7)}
+
+    seen = []
+    cursor = None
+    pages = 0
+    while True:
+        url = "/api/orders/?limit=3" + (f"&cursor={cursor}" if cursor else "")
+        resp = api_client.get(url)
+        assert resp.status_code == 200
+        body = resp.json()
+        seen.extend(row["id"] for row in body["results"])
+        pages += 1
+        cursor = body["next"]
+        if cursor is None:
+            break
+
+    assert pages == 3
+    assert seen == sorted(ids)
+
+
+@pytest.mark.django_db
+def test_order_list_rejects_bad_cursor(api_client):
+    resp = api_client.get("/api/orders/?cursor=not-a-cursor")
+    assert resp.status_code == 400
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("fmt", ["json", "ndjson"])
+def test_customer_list_streaming_matches_plain_list(api_client, fmt):
+    r = RestaurantFactory()
+    CustomerFactory.create_batch(5, restaurant=r)
+
+    expected = api_client.get("/api/customers/").json()
+
+    resp = api_client.get(f"/api/customers/?stream={fmt}")
+    assert resp.status_code == 200
+    body = b"".join(resp.streaming_content).decode()
+    if fmt == "json":
+        rows = json.loads(body)
+    else:
+        rows = [json.loads(line) for line in body.splitlines()]
+
+    assert rows == expected
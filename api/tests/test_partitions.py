@@ -0,0 +1,97 @@
+import pytest
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+
+from api import partitions, purge
+from api.models import Customer, Order, Restaurant
+from api.tests.factories import RestaurantFactory, CustomerFactory, OrderFactory
+
+MARCH = datetime(2024, 3, 15, 12, tzinfo=dt_timezone.utc)
+
+
+@pytest.fixture
+def immediate_constraints():
+    # foreign keys checked per statement, as at the commits the test never
+    # makes; deferred checks left pending would block dropping the archive's
+    with connection.cursor() as cursor:
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+
+def _count(table):
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) FROM {table}")
+        return cursor.fetchone()[0]
+
+
+@pytest.mark.django_db
+def test_orders_are_routed_to_monthly_partitions_and_pruned():
+    r = RestaurantFactory()
+    c = CustomerFactory(restaurant=r)
+    recent = OrderFactory(restaurant=r, customer=c, total_amount=Decimal("10.00"))
+    old = OrderFactory(restaurant=r, customer=c, total_amount=Decimal("20.00"))
+    Order.objects.filter(pk=old.pk).update(created_at=MARCH)
+
+    # no March 2024 partition yet, so the row sits in the default partition
+    assert _count(partitions.DEFAULT_PARTITION) == 1
+    result = partitions.maintain(ahead=1)
+    assert "api_order_p2024_03" in result["created"]
+    assert _count(partitions.DEFAULT_PARTITION) == 0
+    assert _count("api_order_p2024_03") == 1
+    assert _count(partitions.partition_name(partitions.month_start(recent.created_at))) == 1
+
+    plan = Order.objects.filter(
+        restaurant_id=r.id,
+        created_at__gte=datetime(2024, 3, 1, tzinfo=dt_timezone.utc),
+        created_at__lt=datetime(2024, 3, 20, tzinfo=dt_timezone.utc),
+    ).explain()
+    assert "api_order_p2024_03" in plan
+    assert partitions.DEFAULT_PARTITION not in plan
+    assert plan.count("api_order_p") == 1, plan
+
+    # a repeat run has nothing to do
+    assert partitions.maintain(ahead=1) == {"created": [], "detached": []}
+
+
+@pytest.mark.django_db
+def test_order_partitions_command_archives_expired_months(immediate_constraints):
+    r = RestaurantFactory()
+    old = OrderFactory(restaurant=r, customer=CustomerFactory(restaurant=r))
+    Order.objects.filter(pk=old.pk).update(created_at=MARCH)
+    partitions.maintain(ahead=0)
+
+    with pytest.raises(CommandError):
+        call_command("order_partitions", "--retention-months", "6")
+
+    call_command("order_partitions", "--retention-months", "13", "--archive-schema", "order_archive")
+
+    with connection.cursor() as cursor:
+        assert date(2024, 3, 1) not in partitions.monthly_partitions(cursor)
+        cursor.execute("SELECT COUNT(*) FROM order_archive.api_order_p2024_03")
+        assert cursor.fetchone()[0] == 1
+    assert not Order.objects.filter(pk=old.pk).exists()
+
+
+@pytest.mark.django_db
+def test_restaurants_and_customers_with_archived_orders_can_be_purged(immediate_constraints):
+    r, other = RestaurantFactory(), RestaurantFactory()
+    c = CustomerFactory(restaurant=other)
+    orders = [
+        OrderFactory(restaurant=r, customer=CustomerFactory(restaurant=r)),
+        OrderFactory(restaurant=other, customer=c),
+    ]
+    Order.objects.filter(pk__in=[o.pk for o in orders]).update(created_at=MARCH)
+    partitions.maintain(ahead=0)
+    partitions.maintain(ahead=0, retention_months=13, archive_schema="order_archive")
+
+    with connection.cursor() as cursor:
+        purge.soft_delete(r)
+        purge.soft_delete(c)
+        assert purge.purge("restaurant", r.pk)["status"] == "done"
+        assert purge.purge("customer", c.pk)["status"] == "done"
+        cursor.execute("SELECT COUNT(*) FROM order_archive.api_order_p2024_03")
+        assert cursor.fetchone()[0] == 2  # the archive is left as it was
+    assert not Restaurant.all_objects.filter(pk=r.pk).exists()
+    assert not Customer.all_objects.filter(pk=c.pk).exists()
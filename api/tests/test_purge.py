@@ -0,0 +1,82 @@
+import pytest
+from decimal import Decimal
+from django.core.cache import cache
+from django.db import connection
+
+from api import purge, tasks
+from api.dashboard import compute_dashboards
+from api.models import Customer, CustomerDailySpend, CustomerSpend, Order, Restaurant, RestaurantDailyStats
+from api.tests.factories import RestaurantFactory, CustomerFactory, OrderFactory
+
+
+@pytest.fixture
+def purge_now(monkeypatch):
+    # run queued purges inline; foreign keys are checked per statement, as
+    # they would be at the commit the test never makes
+    monkeypatch.setattr(tasks.purge_deleted, "delay", lambda *args: tasks.purge_deleted.apply(args))
+    with connection.cursor() as cursor:
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+
+@pytest.mark.django_db
+def test_restaurant_delete_is_accepted_and_purged_in_batches(
+    api_client, django_capture_on_commit_callbacks, monkeypatch, purge_now,
+):
+    cache.clear()
+    monkeypatch.setattr(purge, "BATCH_SIZE", 2)
+    r, other = RestaurantFactory(), RestaurantFactory()
+    customers = CustomerFactory.create_batch(3, restaurant=r)
+    for customer in customers:
+        OrderFactory.create_batch(2, restaurant=r, customer=customer)
+    elsewhere = OrderFactory(restaurant=other, customer=customers[0])  # a customer's order at another restaurant
+    kept = OrderFactory(restaurant=other, customer=CustomerFactory(restaurant=other))
+
+    with django_capture_on_commit_callbacks(execute=True):
+        resp = api_client.delete(f"/api/restaurants/{r.id}/")
+    assert resp.status_code == 202
+    assert resp["Location"] == f"/api/restaurants/{r.id}/deletion/"
+
+    assert api_client.get(f"/api/restaurants/{r.id}/").status_code == 404
+    assert not Restaurant.all_objects.filter(pk=r.pk).exists()
+    assert not Customer.all_objects.filter(restaurant=r).exists()
+    assert not Order.objects.filter(restaurant=r).exists()
+    assert not Order.objects.filter(pk=elsewhere.pk).exists()
+    assert not RestaurantDailyStats.objects.filter(restaurant=r).exists()
+    assert not CustomerSpend.objects.filter(restaurant=r).exists()
+    assert list(Order.objects.filter(restaurant=other)) == [kept]
+    assert compute_dashboards([other], [7])[(other.id, 7)]["totals"]["orders_count"] == 1
+
+    progress = api_client.get(f"/api/restaurants/{r.id}/deletion/").json()
+    assert progress["status"] == "done"
+    assert progress["deleted"]["orders"] == 6 and progress["deleted"]["customers"] == 3
+    assert progress["deleted"]["restaurants"] == 1
+
+
+@pytest.mark.django_db
+def test_customer_purge_resumes_and_updates_rollups(api_client, monkeypatch, purge_now):
+    cache.clear()
+    r = RestaurantFactory()
+    gone = CustomerFactory(restaurant=r, email="ann@example.com")
+    stays = CustomerFactory(restaurant=r)
+    OrderFactory.create_batch(3, restaurant=r, customer=gone, total_amount=Decimal("5.00"))
+    OrderFactory(restaurant=r, customer=stays, total_amount=Decimal("1.00"))
+
+    # the purge is queued on commit, which never comes here: as if the broker was down
+    assert api_client.delete(f"/api/customers/{gone.id}/").status_code == 202
+    assert api_client.get(f"/api/customers/{gone.id}/").status_code == 404
+    assert api_client.get(f"/api/customers/{gone.id}/deletion/").json()["status"] == "queued"
+    # the email is free again straight away
+    resp = api_client.post("/api/customers/", {"restaurant": r.id, "email": "ANN@example.com"}, format="json")
+    assert resp.status_code == 201
+
+    assert purge.resume_stalled() == 0
+    monkeypatch.setattr(purge, "STALL_SECONDS", -1)
+    assert purge.resume_stalled() == 1
+
+    assert not Customer.all_objects.filter(pk=gone.pk).exists()
+    assert not Order.objects.filter(customer_id=gone.pk).exists()
+    assert not CustomerDailySpend.objects.filter(customer_id=gone.pk).exists()
+    totals = compute_dashboards([r], [7])[(r.id, 7)]["totals"]
+    assert (totals["orders_count"], totals["revenue_total"]) == (1, "1.00")
+    assert purge.progress("customer", gone.pk)["deleted"] == {"orders": 3, "customers": 1}
+    assert purge.purge("customer", gone.pk)["status"] == "done"  # a late duplicate run changes nothing
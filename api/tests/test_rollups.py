@@ -0,0 +1,78 @@
+import pytest
+from decimal import Decimal
+from django.core.management import call_command
+from django.utils import timezone
+from datetime import timedelta
+
+from api.models import Order, RestaurantDailyStats, CustomerDailySpend
+from api.tests.factories import (
+    RestaurantFactory,
+    CustomerFactory,
+    OrderFactory,
+)
+
+
+def rollup_snapshot(restaurant):
+    stats = set(
+        RestaurantDailyStats.objects.filter(restaurant=restaurant)
+        .values_list("day", "orders_count", "revenue_total")
+    )
+    spend = set(
+        CustomerDailySpend.objects.filter(restaurant=restaurant)
+        .values_list("day", "customer_id", "orders_count", "total_spend")
+    )
+    return stats, spend
+
+
+@pytest.mark.django_db
+def test_rollups_follow_order_create_update_delete():
+    r = RestaurantFactory()
+    c1 = CustomerFactory(restaurant=r)
+    c2 = CustomerFactory(restaurant=r)
+    today = timezone.localdate()
+
+    o1 = OrderFactory(restaurant=r, customer=c1, total_amount=Decimal("10.00"))
+    OrderFactory(restaurant=r, customer=c2, total_amount=Decimal("5.50"))
+
+    stats = RestaurantDailyStats.objects.get(restaurant=r, day=today)
+    assert stats.orders_count == 2
+    assert stats.revenue_total == Decimal("15.50")
+
+    # move o1 to another customer and amount
+    o1.customer = c2
+    o1.total_amount = Decimal("4.50")
+    o1.save()
+    assert not CustomerDailySpend.objects.filter(restaurant=r, customer=c1).exists()
+    spend = CustomerDailySpend.objects.get(restaurant=r, customer=c2, day=today)
+    assert spend.orders_count == 2
+    assert spend.total_spend == Decimal("10.00")
+
+    # queryset.update() bypasses signals, rollups are rebuilt instead
+    old_time = timezone.now() - timedelta(days=20)
+    Order.objects.filter(id=o1.id).update(created_at=old_time)
+    assert RestaurantDailyStats.objects.get(restaurant=r, day=today).orders_count == 1
+    assert RestaurantDailyStats.objects.get(restaurant=r, day=timezone.localdate(old_time)).orders_count == 1
+
+    o1.refresh_from_db()
+    o1.delete()
+    assert RestaurantDailyStats.objects.get(restaurant=r, day=timezone.localdate(old_time)).orders_count == 0
+    assert RestaurantDailyStats.objects.get(restaurant=r, day=today).revenue_total == Decimal("5.50")
+
+
+@pytest.mark.django_db
+def test_backfill_command_rebuilds_rollups():
+    r = RestaurantFactory()
+    c = CustomerFactory(restaurant=r)
+    for amount in ["1.00", "2.00", "3.00"]:
+        OrderFactory(restaurant=r, customer=c, total_amount=Decimal(amount))
+    old = OrderFactory(restaurant=r, customer=c, total_amount=Decimal("7.00"))
+    Order.objects.filter(id=old.id).update(created_at=timezone.now() - timedelta(days=40))
+
+    expected = rollup_snapshot(r)
+    RestaurantDailyStats.objects.all().delete()
+    CustomerDailySpend.objects.all().delete()
+
+    call_command("backfill_dashboard_rollups", restaurant_ids=[r.id])
+
+    assert rollup_snapshot(r) == expected
+    assert len(expected[0]) == 2
@@ -0,0 +1,78 @@
+import pytest
+from decimal import Decimal
+from django.core.cache import cache
+
+from api.dashboard_cache import payload, read_entry
+from api.tasks import recompute_dashboard_cache, warm_dashboard_cache
+from api.tests.factories import (
+    RestaurantFactory,
+    CustomerFactory,
+    OrderFactory,
+)
+
+
+@pytest.mark.django_db
+def test_recompute_task_matches_view_payload(api_client):
+    cache.clear()
+
+    r = RestaurantFactory()
+    c = CustomerFactory(restaurant=r, email="a@example.com")
+    OrderFactory(restaurant=r, customer=c, total_amount=Decimal("12.00"))
+
+    view_data = api_client.get(f"/api/restaurants/{r.id}/dashboard/?days=30").json()
+    cache.clear()
+
+    task_data = recompute_dashboard_cache(r.id, 30)
+    assert task_data == view_data
+    assert payload(read_entry(cache.get(f"dashboard:restaurant:{r.id}:days:30"))) == view_data
+
+
+@pytest.mark.django_db
+def test_warm_task_precomputes_every_window():
+    cache.clear()
+
+    restaurants = RestaurantFactory.create_batch(3)
+    for i, r in enumerate(restaurants):
+        c = CustomerFactory(restaurant=r)
+        for _ in range(i + 1):
+            OrderFactory(restaurant=r, customer=c, total_amount=Decimal("5.00"))
+
+    result = warm_dashboard_cache([r.id for r in restaurants], batch_size=2)
+    assert result == {"keys_written": 9}
+
+    for i, r in enumerate(restaurants):
+        for days in (7, 30, 90):
+            data = payload(read_entry(cache.get(f"dashboard:restaurant:{r.id}:days:{days}")))
+            assert data["window_days"] == days
+            assert data["totals"]["orders_count"] == i + 1
+            assert data["top_customers"][0]["orders"] == i + 1
+
+
+@pytest.mark.django_db
+def test_refresh_requests_coalesce_into_one_pending_task(api_client, monkeypatch):
+    cache.clear()
+    r = RestaurantFactory()
+    queued = []
+    monkeypatch.setattr(recompute_dashboard_cache, "apply_async", lambda args, **kwargs: queued.append((args, kwargs)))
+
+    first = api_client.post(f"/api/restaurants/{r.id}/dashboard/refresh/?days=7").json()
+    again = api_client.post(f"/api/restaurants/{r.id}/dashboard/refresh/?days=7").json()
+    other = api_client.post(f"/api/restaurants/{r.id}/dashboard/refresh/?days=30").json()
+    assert (first["status"], again["status"], other["status"]) == ("queued", "already_queued", "queued")
+    assert again["task_id"] == first["task_id"] != other["task_id"]
+    assert [(args, kwargs["task_id"]) for args, kwargs in queued] == [((r.id, 7), first["task_id"]), ((r.id, 30), other["task_id"])]
+    assert queued[0][1]["countdown"] > 0  # debounced
+
+    # once the queued task starts, the next request queues a new run
+    recompute_dashboard_cache.apply((r.id, 7), task_id=first["task_id"])
+    assert api_client.post(f"/api/restaurants/{r.id}/dashboard/refresh/?days=7").json()["status"] == "queued"
+
+    assert api_client.post("/api/restaurants/999999/dashboard/refresh/").status_code == 404
+
+
+@pytest.mark.django_db
+def test_recompute_task_does_not_retry_missing_restaurant(monkeypatch):
+    retries = []
+    monkeypatch.setattr(recompute_dashboard_cache, "retry", lambda *args, **kwargs: retries.append(kwargs))
+    assert recompute_dashboard_cache.apply((999999, 7)).get() is None
+    assert retries == []
@@ -0,0 +1,104 @@
+import pytest
+from unittest.mock import patch
+from datetime import timedelta
+from decimal import Decimal
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from api import timeseries
+from api.models import Order
+from api.tests.factories import (
+    RestaurantFactory,
+    CustomerFactory,
+    OrderFactory,
+)
+
+
+def backdate(order, when):
+    Order.objects.filter(id=order.id).update(created_at=when)
+
+
+@pytest.mark.django_db
+def test_daily_series_is_dense_and_aligned(api_client):
+    cache.clear()
+
+    r = RestaurantFactory()
+    c = CustomerFactory(restaurant=r)
+    today = timezone.localdate()
+    two_days_ago = timezone.now() - timedelta(days=2)
+    backdate(OrderFactory(restaurant=r, customer=c, total_amount=Decimal("4.00")), two_days_ago)
+    backdate(OrderFactory(restaurant=r, customer=c, total_amount=Decimal("6.00")), two_days_ago)
+    OrderFactory(restaurant=r, customer=c, total_amount=Decimal("1.50"))
+
+    start = today - timedelta(days=3)
+    resp = api_client.get(f"/api/restaurants/{r.id}/dashboard/?bucket=day&from={start}")
+    assert resp.status_code == 200
+    data = resp.json()
+
+    series = data["series"]
+    assert [row["orders_count"] for row in series] == [0, 2, 0, 1]
+    assert series[1]["revenue_total"] == "10.00"
+    assert series[-1]["revenue_total"] == "1.50"
+    assert series[0]["start"].startswith(start.isoformat())
+
+
+@pytest.mark.django_db
+def test_closed_buckets_are_cached_until_an_order_touches_them(api_client, django_capture_on_commit_callbacks):
+    cache.clear()
+
+    r = RestaurantFactory()
+    c = CustomerFactory(restaurant=r)
+    yesterday = timezone.now() - timedelta(days=1)
+    old = OrderFactory(restaurant=r, customer=c, total_amount=Decimal("3.00"))
+    backdate(old, yesterday)
+
+    url = f"/api/restaurants/{r.id}/dashboard/?bucket=hour&from={yesterday.date()}"
+    first = api_client.get(url).json()
+
+    # only the open hour is recomputed on the next request
+    with CaptureQueriesContext(connection) as ctx:
+        second = api_client.get(url).json()
+    assert second == first
+    order_queries = [q for q in ctx.captured_queries if '"api_order"' in q["sql"]]
+    assert len(order_queries) == 1
+
+    with django_capture_on_commit_callbacks(execute=True):
+        old.refresh_from_db()
+        old.delete()
+
+    third = api_client.get(url).json()
+    assert sum(row["orders_count"] for row in third["series"]) == 0
+
+
+@pytest.mark.django_db
+def test_late_commit_into_a_closed_bucket_invalidates_it(api_client, django_capture_on_commit_callbacks):
+    cache.clear()
+
+    r = RestaurantFactory()
+    c = CustomerFactory(restaurant=r)
+    stamped = timezone.now() - timedelta(hours=2)
+    url = f"/api/restaurants/{r.id}/dashboard/?bucket=hour&from={(stamped - timedelta(days=1)).date()}"
+    assert sum(row["orders_count"] for row in api_client.get(url).json()["series"]) == 0
+
+    # stamped two hours ago but committed now, into a bucket already closed and cached
+    with django_capture_on_commit_callbacks(execute=True):
+        with patch("django.utils.timezone.now", return_value=stamped):
+            OrderFactory(restaurant=r, customer=c)
+
+    assert sum(row["orders_count"] for row in api_client.get(url).json()["series"]) == 1
+    key = timeseries.bucket_cache_key(r.id, "hour", timeseries.align(stamped, "hour"))
+    assert 0 < cache.ttl(key) <= timeseries.CLOSED_TIMEOUT
+
+
+@pytest.mark.django_db
+def test_series_rejects_bad_range(api_client):
+    r = RestaurantFactory()
+    resp = api_client.get(f"/api/restaurants/{r.id}/dashboard/?bucket=minute")
+    assert resp.status_code == 400
+    resp = api_client.get(f"/api/restaurants/{r.id}/dashboard/?from=2026-01-10&to=2026-01-01")
+    assert resp.status_code == 400
+    for bound in ("from=2026-02-30", "to=2026-13-01T00:00"):  # well-formed, but no such date
+        resp = api_client.get(f"/api/restaurants/{r.id}/dashboard/?bucket=day&{bound}")
+        assert resp.status_code == 400 and "ISO date" in resp.json()["detail"]
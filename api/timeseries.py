@@ -0,0 +1,179 @@
+"""
+Bucketed order count / revenue series for the dashboard
+(GET /api/restaurants/<pk>/dashboard/?bucket=hour|day|week&from=...&to=...).
+
+Bucket boundaries are aligned (hour, day, Monday-start week in
+settings.TIME_ZONE), so closed buckets are identical for every request and
+are cached for CLOSED_TIMEOUT. A bucket counts as closed CLOSE_GRACE after
+its end, so an order stamped just before the boundary has committed by
+then. A request only queries the buckets it has no cached value for, plus
+the open ones, in one GROUP BY.
+Order writes invalidate the buckets holding the orders' created_at once
+they are no longer current (api/signals.py), whenever the write commits.
+"""
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.core.cache import cache
+from django.db.models import Sum, Count
+from django.db.models.functions import TruncHour, TruncDay, TruncWeek
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from . import db_routing
+from .models import Order
+
+BUCKETS = {
+    "hour": (TruncHour, timedelta(hours=1)),
+    "day": (TruncDay, timedelta(days=1)),
+    "week": (TruncWeek, timedelta(weeks=1)),
+}
+MAX_BUCKETS = 1000
+CLOSE_GRACE = timedelta(minutes=5)
+CLOSED_TIMEOUT = 7 * 86400  # writes invalidate closed buckets; this bounds a missed one and unread keys
+
+
+class SeriesError(ValueError):
+    pass
+
+
+def bucket_cache_key(restaurant_id: int, bucket: str, start) -> str:
+    return f"dashboard:series:{restaurant_id}:{bucket}:{start.isoformat()}"
+
+
+def align(value, bucket: str):
+    value = timezone.localtime(value)
+    if bucket == "hour":
+        return value.replace(minute=0, second=0, microsecond=0)
+    day = value.date()
+    if bucket == "week":
+        day -= timedelta(days=day.weekday())
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def parse_bound(raw, name):
+    try:
+        # well-formed but impossible values (2026-02-30) raise ValueError
+        value = parse_datetime(raw)
+        day = parse_date(raw) if value is None else None
+    except ValueError:
+        value = day = None
+    if value is None:
+        if day is None:
+            raise SeriesError(f"{name} must be an ISO date or datetime.")
+        value = datetime.combine(day, time.min)
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+def parse_range(params, default_days: int):
+    bucket = params.get("bucket", "day")
+    if bucket not in BUCKETS:
+        raise SeriesError("bucket must be one of hour, day, week.")
+    step = BUCKETS[bucket][1]
+
+    now = timezone.now()
+    end = parse_bound(params["to"], "to") if "to" in params else now
+    start = parse_bound(params["from"], "from") if "from" in params else end - timedelta(days=default_days)
+
+    # `from` rounds down to its bucket, `to` rounds up so the bucket holding it is included
+    start = align(start, bucket)
+    aligned_end = align(end, bucket)
+    end = aligned_end if aligned_end == end else next_bucket(aligned_end, bucket)
+    if end <= start:
+        raise SeriesError("from must be before to.")
+    if (end - start) / step > MAX_BUCKETS:
+        raise SeriesError(f"at most {MAX_BUCKETS} buckets per request.")
+    return bucket, start, end
+
+
+def next_bucket(current, bucket: str):
+    if bucket == "hour":
+        # step in UTC so DST transitions neither skip nor repeat an hour
+        return timezone.localtime(current.astimezone(dt_timezone.utc) + timedelta(hours=1))
+    days = 7 if bucket == "week" else 1
+    return timezone.make_aware(datetime.combine(timezone.localdate(current) + timedelta(days=days), time.min))
+
+
+def bucket_starts(bucket, start, end):
+    starts = []
+    current = start
+    while current < end:
+        starts.append(current)
+        current = next_bucket(current, bucket)
+    return starts
+
+
+def _query(restaurant_id, bucket, start, end):
+    trunc = BUCKETS[bucket][0]
+    rows = (
+        Order.objects.filter(restaurant_id=restaurant_id, created_at__gte=start, created_at__lt=end)
+        .annotate(bucket_start=trunc("created_at"))
+        .values("bucket_start")
+        .annotate(orders_count=Count("id"), revenue_total=Sum("total_amount"))
+        .order_by()
+    )
+    return {
+        row["bucket_start"]: {"orders_count": row["orders_count"], "revenue_total": f"{row['revenue_total']:.2f}"}
+        for row in rows
+    }
+
+
+def compute_series(restaurant, bucket, start, end) -> dict:
+    now = timezone.now()
+    starts = bucket_starts(bucket, start, end)
+    closed = [s for s in starts if next_bucket(s, bucket) + CLOSE_GRACE <= now]
+
+    keys = {s: bucket_cache_key(restaurant.id, bucket, s) for s in closed}
+    cached = cache.get_many(list(keys.values()))
+    values = {s: cached[k] for s, k in keys.items() if k in cached}
+
+    todo = [s for s in starts if s not in values]
+    if todo:
+        with db_routing.primary():  # closed buckets are cached
+            computed = _query(restaurant.id, bucket, todo[0], next_bucket(todo[-1], bucket))
+        empty = {"orders_count": 0, "revenue_total": "0.00"}
+        for s in todo:
+            values[s] = computed.get(s, empty)
+        cache.set_many(
+            {keys[s]: values[s] for s in todo if s in keys},
+            timeout=CLOSED_TIMEOUT,
+        )
+
+    return {
+        "restaurant": {"id": restaurant.id, "name": restaurant.name},
+        "bucket": bucket,
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "series": [{"start": s.isoformat(), **values[s]} for s in starts],
+    }
+
+
+def invalidate_times(stamps):
+    """Forget cached buckets holding (restaurant_id, created_at) pairs, bar the current ones (never cached)."""
+    now = timezone.now()
+    current = {bucket: align(now, bucket) for bucket in BUCKETS}
+    keys = set()
+    for restaurant_id, created_at in stamps:
+        for bucket in BUCKETS:
+            start = align(created_at, bucket)
+            if start < current[bucket]:
+                keys.add(bucket_cache_key(restaurant_id, bucket, start))
+    if keys:
+        cache.delete_many(list(keys))
+
+
+def invalidate_days(pairs):
+    """Forget cached buckets covering (restaurant_id, day) pairs."""
+    keys = []
+    for restaurant_id, day in pairs:
+        day_start = timezone.make_aware(datetime.combine(day, time.min))
+        keys.append(bucket_cache_key(restaurant_id, "day", day_start))
+        keys.append(bucket_cache_key(restaurant_id, "week", align(day_start, "week")))
+        hour = day_start
+        next_day = next_bucket(day_start, "day")
+        while hour < next_day:
+            keys.append(bucket_cache_key(restaurant_id, "hour", hour))
+            hour = next_bucket(hour, "hour")
+    if keys:
+        cache.delete_many(keys)
@@ -1,19 +1,35 @@
 from django.contrib import admin
 from django.urls import path
-from .views import (restaurant_list, customer_list, order_list, 
-                   restaurant_detail, customer_detail, order_detail,
-                   restaurant_dashboard, restaurant_dashboard_refresh)
+from . import async_views
+from .views import (restaurant_list, customer_list, customer_bulk_upsert, order_list, order_bulk_create,
+                   restaurant_orders, customer_orders, restaurant_customers, restaurant_dashboard_refresh,
+                   restaurant_deletion, customer_deletion, order_export_list, order_export_file,
+                   restaurant_cohorts)
 
+# Detail GETs and dashboard reads are async views (api/async_views.py); they
+# hand writes back to the sync DRF views in api/views.py.
 urlpatterns = [
     path("restaurants/", restaurant_list),
-    path("restaurants/<int:pk>/", restaurant_detail),
-    path("restaurants/<int:pk>/dashboard/", restaurant_dashboard),
+    path("restaurants/<int:pk>/", async_views.restaurant_detail),
+    path("restaurants/<int:pk>/dashboard/", async_views.restaurant_dashboard),
+    path("restaurants/<int:pk>/orders/", restaurant_orders),
+    path("restaurants/<int:pk>/customers/", restaurant_customers),
+    path("restaurants/<int:pk>/deletion/", restaurant_deletion),
 
     path("customers/", customer_list),
-    path("customers/<int:pk>/", customer_detail),
+    path("customers/bulk/", customer_bulk_upsert),
+    path("customers/<int:pk>/", async_views.customer_detail),
+    path("customers/<int:pk>/orders/", customer_orders),
+    path("customers/<int:pk>/deletion/", customer_deletion),
 
     path("orders/", order_list),
-    path("orders/<int:pk>/", order_detail),
+    path("orders/bulk/", order_bulk_create),
+    path("orders/<int:pk>/", async_views.order_detail),
     
     path("restaurants/<int:pk>/dashboard/refresh/", restaurant_dashboard_refresh),
+    path("restaurants/<int:pk>/cohorts/", restaurant_cohorts),
+    path("dashboards/", async_views.dashboard_batch),
+
+    path("exports/orders/", order_export_list),
+    path("exports/orders/<path:path>", order_export_file),
 ]
@@ -1,21 +1,32 @@
-from rest_framework.decorators import api_view
+from django.http import FileResponse, HttpResponse
+from django.utils.cache import get_conditional_response
+from rest_framework.decorators import api_view, parser_classes
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
 from rest_framework import status
-from .models import Restaurant, Customer, Order
-from .serializers import RestaurantSerializer, CustomerSerializer, OrderSerializer
-from django.utils import timezone
-from django.db.models.functions import Coalesce
-from datetime import timedelta
-from django.db.models import Sum, Count, Avg, DecimalField
-from django.core.cache import cache
-from .tasks import recompute_dashboard_cache
+from .models import Restaurant, Customer, CustomerSpend, Order
+from .serializers import RestaurantSerializer, CustomerSerializer, CustomerSpendSerializer, OrderSerializer
+from .pagination import list_response
+from .filters import filter_customers, filter_orders, FilterError
+from .parsers import NDJSONParser
+from .ingest import ingest_orders, MAX_BATCH_ROWS
+from .customers import upsert_customer_rows, MAX_UPSERT_ROWS
+from .dashboard_cache import get_dashboard, get_dashboards, schedule_refresh
+from .timeseries import compute_series, parse_range, SeriesError
+from .cohorts import compute_cohorts, parse_weeks, CohortError
+from . import exports, fast_serializers, hot_dashboards, metrics, purge
+from .db_routing import replica_reads
+from .idempotency import idempotent
 
+SERIES_PARAMS = {"bucket", "from", "to"}
+MAX_BATCH_DASHBOARDS = 500
+
+@replica_reads
 @api_view(["GET", "POST"])
 def restaurant_list(request):
     if request.method == "GET":
         restaurants = Restaurant.objects.all()
-        serializer = RestaurantSerializer(restaurants, many=True)
-        return Response(serializer.data)
+        return list_response(request, restaurants, RestaurantSerializer)
     
     elif request.method == "POST":
         serializer = RestaurantSerializer(data=request.data)
@@ -24,12 +35,11 @@ def restaurant_list(request):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@replica_reads
 @api_view(["GET", "POST"])
 def customer_list(request):
     if request.method == "GET":
-        customers = Customer.objects.all()
-        serializer = CustomerSerializer(customers, many=True)
-        return Response(serializer.data)
+        return _customer_list_response(request)
     
     elif request.method == "POST":
         serializer = CustomerSerializer(data=request.data)
@@ -38,23 +48,97 @@ def customer_list(request):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+def _customer_list_response(request, restaurant_id=None):
+    try:
+        restaurant_id, ordering = filter_customers(request.query_params, restaurant_id)
+    except FilterError as exc:
+        return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    if ordering is None:
+        customers = Customer.objects.all()
+        if restaurant_id is not None:
+            customers = customers.filter(restaurant_id=restaurant_id)
+        return list_response(request, customers, CustomerSerializer)
+    spend = CustomerSpend.objects.filter(restaurant_id=restaurant_id).select_related("customer")
+    return list_response(request, spend, CustomerSpendSerializer, ordering)
+
+@replica_reads
+@api_view(["GET"])
+def restaurant_customers(request, pk: int):
+    if not Restaurant.objects.filter(pk=pk).exists():
+        return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+    return _customer_list_response(request, restaurant_id=pk)
+
+@idempotent  # outermost: a replay is answered before DRF or the database
+@replica_reads
 @api_view(["GET", "POST"])
 def order_list(request):
     if request.method == "GET":
-        orders = Order.objects.select_related("restaurant", "customer") # When you fetch Orders, also fetch their related Restaurant and Customer in the same query
-        serializer = OrderSerializer(orders, many=True)
-        return Response(serializer.data)
+        return _order_list_response(request)
     
     elif request.method == "POST":
         serializer = OrderSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save()
-            for d in [7, 30, 90]:
-                cache.delete(f"dashboard:restaurant:{serializer.data['restaurant']}:days:{d}")
+            serializer.save()  # dashboard counters are updated by the Order write hook (api/signals.py)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-@api_view(["GET", "PUT", "POST"])
+def _order_list_response(request, **parent):
+    # serializer only needs the FK ids, no join required
+    try:
+        orders, ordering = filter_orders(Order.objects.all(), request.query_params, **parent)
+    except FilterError as exc:
+        return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return list_response(request, orders, OrderSerializer, ordering)
+
+@replica_reads
+@api_view(["GET"])
+def restaurant_orders(request, pk: int):
+    if not Restaurant.objects.filter(pk=pk).exists():
+        return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+    return _order_list_response(request, restaurant_id=pk)
+
+@replica_reads
+@api_view(["GET"])
+def customer_orders(request, pk: int):
+    if not Customer.objects.filter(pk=pk).exists():
+        return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+    return _order_list_response(request, customer_id=pk)
+
+@api_view(["POST"])
+@parser_classes([JSONParser, NDJSONParser])
+def order_bulk_create(request):
+    # JSON array or NDJSON stream of {"restaurant", "customer", "total_amount"}
+    payload = request.data
+    if not isinstance(payload, list):
+        return Response({"detail": "Expected a JSON array or NDJSON body."},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if len(payload) > MAX_BATCH_ROWS:
+        return Response({"detail": f"At most {MAX_BATCH_ROWS} orders per request."},
+                        status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    created, errors = ingest_orders(payload)
+    if created == 0 and errors:
+        return Response({"created": 0, "errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({"created": created, "errors": errors}, status=status.HTTP_201_CREATED)
+
+@api_view(["POST"])
+@parser_classes([JSONParser, NDJSONParser])
+def customer_bulk_upsert(request):
+    # JSON array or NDJSON stream of {"restaurant", "email"} -> customer ids, creating missing customers
+    payload = request.data
+    if not isinstance(payload, list):
+        return Response({"detail": "Expected a JSON array or NDJSON body."},
+                        status=status.HTTP_400_BAD_REQUEST)
+    if len(payload) > MAX_UPSERT_ROWS:
+        return Response({"detail": f"At most {MAX_UPSERT_ROWS} customers per request."},
+                        status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    results, errors = upsert_customer_rows(payload)
+    if not results and errors:
+        return Response({"customers": [], "errors": errors}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({"customers": results, "errors": errors})
+
+@api_view(["GET", "PUT", "DELETE"])
 def restaurant_detail(request, pk: int):
     try:
         restaurant = Restaurant.objects.get(pk=pk)
@@ -73,8 +157,7 @@ def restaurant_detail(request, pk: int):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
     elif request.method == "DELETE":
-        restaurant.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        return _deletion_accepted(request, purge.soft_delete(restaurant))
 
 @api_view(["GET", "PUT", "DELETE"])
 def customer_detail(request, pk: int):
@@ -95,8 +178,25 @@ def customer_detail(request, pk: int):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     elif request.method == "DELETE":
-        customer.delete()
-        return Response(status=status.HTTP_204_NO_CONTENT)
+        return _deletion_accepted(request, purge.soft_delete(customer))
+
+def _deletion_accepted(request, progress):
+    # orders and other children are purged in the background (api/purge.py)
+    return Response(progress, status=status.HTTP_202_ACCEPTED, headers={"Location": f"{request.path}deletion/"})
+
+def _deletion_response(kind, pk):
+    progress = purge.progress(kind, pk)
+    if progress is None:
+        return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+    return Response(progress)
+
+@api_view(["GET"])
+def restaurant_deletion(request, pk: int):
+    return _deletion_response("restaurant", pk)
+
+@api_view(["GET"])
+def customer_deletion(request, pk: int):
+    return _deletion_response("customer", pk)
 
 @api_view(["GET", "PUT", "DELETE"])
 def order_detail(request, pk: int):
@@ -120,6 +220,7 @@ def order_detail(request, pk: int):
         order.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+@replica_reads
 @api_view(["GET"])
 def restaurant_dashboard(request, pk: int):
     #validate restaurant exists
@@ -136,69 +237,77 @@ def restaurant_dashboard(request, pk: int):
         return Response({"detail": "days must be an integer between 1 and 365."},
                         status=status.HTTP_400_BAD_REQUEST)
 
-    since = timezone.now() - timedelta(days=days)
-    
-    cache_key = f"dashboard:restaurant:{pk}:days:{days}"
+    if SERIES_PARAMS.intersection(request.query_params):
+        try:
+            bucket, start, end = parse_range(request.query_params, default_days=days)
+        except SeriesError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(compute_series(restaurant, bucket, start, end))
 
-    cached = cache.get(cache_key)
-    if cached is not None:
-        return Response(cached)
-    
-    orders_qs = Order.objects.filter(restaurant=restaurant, created_at__gte=since)
-
-    # Aggregate totals
-    totals = orders_qs.aggregate(
-    orders_count=Count("id"),
-    revenue_total=Coalesce(
-        Sum("total_amount"),
-        0,
-        output_field=DecimalField(max_digits=10, decimal_places=2),
-    ),
-    avg_order_value=Coalesce(
-        Avg("total_amount"),
-        0,
-        output_field=DecimalField(max_digits=10, decimal_places=2),
-    ),
-    unique_customers=Count("customer_id", distinct=True),
-)
-
-    # Top customers by spend (limit 5)
-    top_customers = (
-    orders_qs.values("customer_id", "customer__email")
-    .annotate(
-        total_spend=Coalesce(
-            Sum("total_amount"),
-            0,
-            output_field=DecimalField(max_digits=10, decimal_places=2),
-            ),
-        orders=Count("id"),
-        )
-    .order_by("-total_spend")[:5]
-    )   
-
-    data = {
-        "restaurant": {"id": restaurant.id, "name": restaurant.name},
-        "window_days": days,
-        "since": since.isoformat(),
-        "totals": {
-            "orders_count": totals["orders_count"],
-            "revenue_total": f"{totals['revenue_total']:.2f}",  # Decimal -> string for JSON
-            "avg_order_value": f"{totals['avg_order_value']:.2f}",  # Decimal -> string for JSON
-            "unique_customers": totals["unique_customers"],
-        },
-        "top_customers": [
-            {
-                "customer_id": row["customer_id"],
-                "email": row["customer__email"],
-                "total_spend": f"{row['total_spend']:.2f}",
-                "orders": row["orders"],
-            }
-            for row in top_customers
-        ],
-    }
-
-    cache.set(cache_key, data, timeout=60)  # cache for 60s
-    return Response(data)
+    if hot_dashboards.record_access([restaurant.id], days):
+        hot_dashboards.flush()
+
+    # Served from cache with single-flight recompute and stale-while-revalidate;
+    # a recompute reads the live Redis counters kept up to date on order writes.
+    return dashboard_response(request, get_dashboard(restaurant, days))
+
+
+@replica_reads
+@api_view(["GET"])
+def restaurant_cohorts(request, pk: int):
+    try:
+        restaurant = Restaurant.objects.only("id", "name").get(pk=pk)
+    except Restaurant.DoesNotExist:
+        return Response({"detail": "Not found."}, status=status.HTTP_404_NOT_FOUND)
+    try:
+        weeks = parse_weeks(request.query_params)
+    except CohortError as exc:
+        return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(compute_cohorts(restaurant, weeks))
+
+def dashboard_response(request, entry):
+    """A cached dashboard entry's JSON body as is, or a 304 if the client already has it."""
+    response = get_conditional_response(request, etag=entry["etag"])
+    if response is None:
+        response = HttpResponse(entry["body"], content_type="application/json")
+    response.headers["ETag"] = entry["etag"]
+    return response
+
+
+def dashboard_batch_response(ids, payloads, missing):
+    # the batch envelope around the cached bodies, as JSONRenderer would write it
+    results = b",".join(payloads[pk] for pk in ids if pk in payloads)
+    return HttpResponse(
+        b'{"results":[' + results + b'],"not_found":' + fast_serializers.dumps(missing) + b"}",
+        content_type="application/json",
+    )
+
+
+@replica_reads
+@api_view(["GET"])
+def dashboard_batch(request):
+    # ?ids=1,2,3&days=30 -> one cache round trip, one grouped computation for the misses
+    try:
+        ids = [int(pk) for pk in request.query_params.get("ids", "").split(",") if pk.strip()]
+        if not ids or len(ids) > MAX_BATCH_DASHBOARDS:
+            raise ValueError()
+    except ValueError:
+        return Response({"detail": f"ids must be a comma-separated list of 1 to {MAX_BATCH_DASHBOARDS} integers."},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        days = int(request.query_params.get("days", 7))
+        if days <= 0 or days > 365:
+            raise ValueError()
+    except ValueError:
+        return Response({"detail": "days must be an integer between 1 and 365."},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    ids = list(dict.fromkeys(ids))  # de-duplicate, keep order
+    if hot_dashboards.record_access(ids, days):
+        hot_dashboards.flush()
+    payloads, missing = get_dashboards(ids, days)
+    return dashboard_batch_response(ids, payloads, missing)
 
 
 @api_view(["POST"])
@@ -212,10 +321,36 @@ def restaurant_dashboard_refresh(request, pk: int):
         return Response({"detail": "days must be an integer between 1 and 365."},
                         status=status.HTTP_400_BAD_REQUEST)
 
-    # enqueue background job
-    job = recompute_dashboard_cache.delay(pk, days)
+    if not Restaurant.objects.filter(pk=pk).exists():
+        return Response("NOT FOUND", status=status.HTTP_404_NOT_FOUND)
+
+    # one pending job per (pk, days): repeat requests get the queued job's id
+    task_id, queued = schedule_refresh(pk, days)
 
     return Response(
-        {"status": "queued", "task_id": job.id, "restaurant_id": pk, "days": days},
+        {"status": "queued" if queued else "already_queued", "task_id": task_id, "restaurant_id": pk, "days": days},
         status=status.HTTP_202_ACCEPTED,
-    )
\ No newline at end of file
+    )
+
+
+@api_view(["GET"])
+def order_export_list(request):
+    # columnar files written by the export_orders command / task (api/exports.py)
+    files = exports.list_files()
+    for entry in files:
+        entry["url"] = f"{request.path}{entry['path']}"
+    return Response({"watermark": exports.read_watermark(), "files": files})
+
+
+def order_export_file(request, path: str):
+    # plain Django view: the file is streamed from disk as is
+    found = exports.resolve(path)
+    if found is None:
+        return HttpResponse(status=status.HTTP_404_NOT_FOUND)
+    file_path, content_type = found
+    return FileResponse(open(file_path, "rb"), as_attachment=True, content_type=content_type)
+
+
+def prometheus_metrics(request):
+    # plain Django view: Prometheus wants its own text format, not DRF content negotiation
+    return HttpResponse(metrics.render(), content_type=metrics.CONTENT_TYPE)
@@ -43,6 +43,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "api.middleware.RequestMetricsMiddleware",  # first, so its timing covers the whole stack
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -50,6 +51,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    "api.middleware.PrimaryPinMiddleware",  # read-your-writes for replica reads
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -75,34 +77,152 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
+# The primary comes from DB_* variables. DB_REPLICAS lists read replicas as
+# "host[:port][/name],..." (port and name default to the primary's), e.g.
+# DB_REPLICAS=localhost/test_crm_replica to try routing against a second
+# local database. api/db_routing.py decides which reads may use them.
+#
+# Each process keeps a psycopg 3 connection pool per alias (DB_POOL=0 falls
+# back to persistent connections kept for DB_CONN_MAX_AGE seconds).
+DB_POOL = os.environ.get("DB_POOL", "1") == "1"
+
+
+def _database(host, port, name):
+    database = {
         "ENGINE": "django.db.backends.postgresql",
-        "NAME": "test_crm",
-        "USER": "crm_user",
-        "PASSWORD": "crm_pass",
-        "HOST": "localhost",
-        "PORT": "5432",
+        "NAME": name,
+        "USER": os.environ.get("DB_USER", "crm_user"),
+        "PASSWORD": os.environ.get("DB_PASSWORD", "crm_pass"),
+        "HOST": host,
+        "PORT": port,
+        "OPTIONS": {},
     }
+    if DB_POOL:
+        database["OPTIONS"]["pool"] = {
+            "min_size": int(os.environ.get("DB_POOL_MIN_SIZE", "2")),
+            "max_size": int(os.environ.get("DB_POOL_MAX_SIZE", "10")),
+            "timeout": float(os.environ.get("DB_POOL_TIMEOUT", "10")),  # wait for a free connection
+            "max_lifetime": float(os.environ.get("DB_POOL_MAX_LIFETIME", "1800")),
+        }
+    else:
+        database["CONN_MAX_AGE"] = int(os.environ.get("DB_CONN_MAX_AGE", "60"))
+        database["CONN_HEALTH_CHECKS"] = True
+    return database
+
+
+DATABASES = {
+    "default": _database(
+        os.environ.get("DB_HOST", "localhost"),
+        os.environ.get("DB_PORT", "5432"),
+        os.environ.get("DB_NAME", "test_crm"),
+    ),
 }
+for _index, _replica in enumerate(filter(None, os.environ.get("DB_REPLICAS", "").split(","))):
+    _address, _, _name = _replica.strip().partition("/")
+    _host, _, _port = _address.partition(":")
+    DATABASES[f"replica_{_index}"] = _database(
+        _host or DATABASES["default"]["HOST"],
+        _port or DATABASES["default"]["PORT"],
+        _name or DATABASES["default"]["NAME"],
+    )
+    # tests read replicas through the test database, not a copy of it
+    DATABASES[f"replica_{_index}"]["TEST"] = {"MIRROR": "default"}
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ["api.db_routing.PrimaryReplicaRouter"]
+# How long a client's reads stay on the primary after it writes
+DB_PRIMARY_PIN_SECONDS = int(os.environ.get("DB_PRIMARY_PIN_SECONDS", "10"))
 
 CACHES = {
     "default": {
         "BACKEND": "django_redis.cache.RedisCache",
         "LOCATION": "redis://127.0.0.1:6379/1",  # use DB 1 for cache
         "OPTIONS": {
-            "CLIENT_CLASS": "django_redis.client.DefaultClient",
+            "CLIENT_CLASS": "api.instrumentation.InstrumentedCacheClient",
+            "REDIS_CLIENT_CLASS": "api.instrumentation.InstrumentedRedis",
         },
         "TIMEOUT": 60,  # default TTL (seconds)
     }
 }
 
+# In-process L1 in front of the Redis dashboard cache (api/local_cache.py):
+# seconds an entry is served without asking Redis (0 turns it off), and
+# per-process caps on entries and pickled bytes.
+DASHBOARD_L1_TTL = float(os.environ.get("DASHBOARD_L1_TTL", "5"))
+DASHBOARD_L1_MAX_ENTRIES = int(os.environ.get("DASHBOARD_L1_MAX_ENTRIES", "10000"))
+DASHBOARD_L1_MAX_BYTES = int(os.environ.get("DASHBOARD_L1_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Dashboard cache entries hold pre-rendered JSON; bodies of at least this
+# many bytes are stored compressed ("zlib", "lz4" if installed, or "" for none).
+DASHBOARD_CACHE_COMPRESSION = os.environ.get("DASHBOARD_CACHE_COMPRESSION", "zlib")
+DASHBOARD_CACHE_COMPRESS_MIN_BYTES = int(os.environ.get("DASHBOARD_CACHE_COMPRESS_MIN_BYTES", "1024"))
+
+REST_FRAMEWORK = {
+    "DEFAULT_RENDERER_CLASSES": [
+        "api.renderers.JSONRenderer",  # passes pre-encoded list responses through
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+}
+
+# Fraction of requests that record SQL / cache / Redis / serializer costs
+# and return them in a Server-Timing header (latency is recorded for all).
+REQUEST_METRICS_SAMPLE_RATE = float(os.environ.get("REQUEST_METRICS_SAMPLE_RATE", "0.01"))
+
+# Monthly Order partitions (api/partitions.py): months created ahead of
+# time, and how many months stay attached (unset keeps everything).
+# Expired months are detached into the archive schema, not dropped.
+ORDER_PARTITIONS_AHEAD = 3
+ORDER_PARTITION_RETENTION_MONTHS = (
+    int(os.environ["ORDER_PARTITION_RETENTION_MONTHS"]) if os.environ.get("ORDER_PARTITION_RETENTION_MONTHS") else None
+)
+ORDER_PARTITION_ARCHIVE_SCHEMA = "archive"
+
+# Columnar Order exports for offline analytics (api/exports.py):
+# "parquet" or "arrow" (Arrow IPC) files under ORDER_EXPORT_DIR,
+# which the workers running the export and the web servers serving
+# /api/exports/orders/ must share. Orders younger than the lag wait for the
+# next run, so late commits and replica lag do not slip past the watermark.
+ORDER_EXPORT_DIR = Path(os.environ.get("ORDER_EXPORT_DIR", BASE_DIR / "exports" / "orders"))
+ORDER_EXPORT_FORMAT = os.environ.get("ORDER_EXPORT_FORMAT", "parquet")
+ORDER_EXPORT_LAG_SECONDS = int(os.environ.get("ORDER_EXPORT_LAG_SECONDS", "300"))
+
+# Seconds the response to an Idempotency-Key'd order POST is kept for
+# retries (api/idempotency.py).
+IDEMPOTENCY_KEY_TTL = int(os.environ.get("IDEMPOTENCY_KEY_TTL", str(24 * 60 * 60)))
+# Seconds an attempt holds its key's in-flight lock. Keep it at least the
+# web server's request timeout: a retry after it expires runs the view again.
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.environ.get("IDEMPOTENCY_LOCK_TIMEOUT", "300"))
+
 CELERY_BROKER_URL = "redis://127.0.0.1:6379/0"   # Redis DB 0 for broker
 CELERY_RESULT_BACKEND = "redis://127.0.0.1:6379/0"  # optional but useful for dev
 CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_TIMEZONE = "America/Edmonton"
+# Dashboard refreshes get their own queue (and the task a rate limit), so a
+# refresh burst cannot hold up other work: run a worker with
+# -Q celery,dashboard_refresh (or a dedicated one for dashboard_refresh).
+CELERY_TASK_ROUTES = {
+    "api.tasks.recompute_dashboard_cache": {"queue": "dashboard_refresh"},
+}
+CELERY_BEAT_SCHEDULE = {
+    "maintain-order-partitions": {
+        "task": "api.tasks.maintain_order_partitions",
+        "schedule": 24 * 60 * 60,  # daily; partitions exist months ahead
+    },
+    "warm-hot-dashboards": {
+        "task": "api.tasks.warm_hot_dashboards",
+        "schedule": 30,  # hot_dashboards.WARM_INTERVAL; entries stay fresh for 60s
+    },
+    "roll-customer-spend": {
+        "task": "api.tasks.roll_customer_spend",
+        "schedule": 10 * 60,  # does its work once a day, just after midnight
+    },
+    "resume-stalled-purges": {
+        "task": "api.tasks.resume_stalled_purges",
+        "schedule": 5 * 60,  # purge.STALL_SECONDS / 2
+    },
+}
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -146,6 +266,9 @@ if os.environ.get("PYTEST_RUNNING") == "1":
     CELERY_TASK_ALWAYS_EAGER = True
     CELERY_TASK_EAGER_PROPAGATES = True
 
+    # Tests clear Redis between cases; the L1 is turned on where it is tested
+    DASHBOARD_L1_TTL = 0
+
     # Faster password hasher in tests
     PASSWORD_HASHERS = [
         "django.contrib.auth.hashers.MD5PasswordHasher",